@@ -0,0 +1,130 @@
+"""
+ANN Index Benchmark - Recall vs Latency per Index Type
+Compares the VectorStore base index modes against exact (flat) search
+
+Usage:
+    python benchmarks/ann_benchmark.py                      # synthetic 384-dim corpus
+    python benchmarks/ann_benchmark.py --db faiss_index     # vectors from an existing store
+    python benchmarks/ann_benchmark.py --min-recall 0.95    # flag modes below a recall@k target
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from index_factory import (  # noqa: E402
+    INDEX_TYPES, RESCORE_FACTOR, build_index, needs_rescoring, search_index, search_parameters
+)
+
+NPROBE_SWEEP = (1, 4, 16, 64)
+EF_SEARCH_SWEEP = (16, 64, 256)
+
+
+def load_vectors(args):
+    """Float vectors from a store's vectors.f32, or a synthetic clustered corpus"""
+    if args.db:
+        path = os.path.join(args.db, "vectors.f32")
+        with open(path + ".json", "r", encoding="utf-8") as f:
+            dim = json.load(f)["dim"]
+        vectors = np.fromfile(path, dtype=np.float32).reshape(-1, dim)
+        vectors = vectors[np.linalg.norm(vectors, axis=1) > 0]  # Skip rows of deleted chunks
+        return vectors[:args.count] if args.count else vectors
+
+    rng = np.random.default_rng(args.seed)
+    centers = rng.standard_normal((max(args.count // 100, 1), args.dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), args.count)]
+    vectors += 0.3 * rng.standard_normal(vectors.shape).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def run_queries(index, index_type, queries, k, params, vectors=None):
+    """Search one query at a time, as the app does; returns (ids, mean latency ms)
+
+    With vectors, k * RESCORE_FACTOR candidates are rescored with exact L2 like VectorStore does.
+    """
+    results = []
+    started = time.perf_counter()
+    for query in queries:
+        _, ids = search_index(index, index_type, query[None, :], k * RESCORE_FACTOR if vectors is not None else k, params)
+        ids = ids[0][ids[0] != -1]
+        if vectors is not None:
+            distances = np.sum((vectors[ids - 1] - query) ** 2, axis=1)
+            ids = ids[np.argsort(distances)]
+        results.append(ids[:k])
+    latency_ms = (time.perf_counter() - started) / len(queries) * 1000
+    return results, latency_ms
+
+
+def recall_at_k(found, truth):
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="Store directory to read vectors.f32 from")
+    parser.add_argument("--count", type=int, default=50000, help="Corpus size (synthetic, or cap for --db)")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-recall", type=float, help="Mark rows whose recall@k falls below this")
+    args = parser.parse_args()
+
+    vectors = load_vectors(args)
+    ids = np.arange(1, len(vectors) + 1, dtype=np.int64)
+    rng = np.random.default_rng(args.seed + 1)
+    queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+
+    print(f"Corpus: {len(vectors)} x {vectors.shape[1]}, {args.queries} queries, k={args.k}\n")
+    print(f"{'index':<10} {'knob':<24} {'build s':>8} {'MB':>8} {'recall@k':>9} {'ms/query':>9}")
+
+    truth = None
+    below = []
+    for index_type in INDEX_TYPES:
+        started = time.perf_counter()
+        index, built_type = build_index(index_type, vectors, ids)
+        build_seconds = time.perf_counter() - started
+        if built_type != index_type:
+            print(f"{index_type:<10} skipped: corpus below training threshold (built {built_type})")
+            continue
+
+        serialize = faiss.serialize_index_binary if isinstance(index, faiss.IndexBinary) else faiss.serialize_index
+        size_mb = len(serialize(index)) / 1e6
+
+        if index_type == "hnsw":
+            sweep = [(f"efSearch={ef}", search_parameters(index_type, ef_search=ef)) for ef in EF_SEARCH_SWEEP]
+        elif index_type.startswith("ivf"):
+            sweep = [(f"nprobe={n}", search_parameters(index_type, nprobe=n)) for n in NPROBE_SWEEP]
+        else:
+            sweep = [("exact", None)]
+
+        # Compact modes are measured both raw and with float rescoring (what VectorStore serves)
+        rescore_options = (False, True) if needs_rescoring(index_type) else (False,)
+        for label, params in sweep:
+            for rescore in rescore_options:
+                row_label = label + (" +rescore" if rescore else "")
+                found, latency_ms = run_queries(index, index_type, queries, args.k, params, vectors if rescore else None)
+                if truth is None:
+                    truth = found  # Flat runs first and is the ground truth
+                recall = recall_at_k(found, truth)
+                flag = ""
+                if args.min_recall is not None and recall < args.min_recall:
+                    flag = "  < min"
+                    below.append(f"{index_type} {row_label}")
+                print(f"{index_type:<10} {row_label:<24} {build_seconds:>8.2f} {size_mb:>8.1f} "
+                      f"{recall:>9.3f} {latency_ms:>9.3f}{flag}")
+
+    if args.min_recall is not None:
+        print(f"\n{len(below)} configurations below recall@{args.k} {args.min_recall}: {', '.join(below) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Embedding Backend Benchmark - Sentences/sec per Backend on This Machine
+Compares torch, ONNX Runtime and int8-quantized encoders against the torch reference
+
+Usage:
+    python benchmarks/embedding_benchmark.py
+    python benchmarks/embedding_benchmark.py --backends torch int8 --threads 4 --batch-sizes 16 64
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from embedding_backends import BACKENDS, GUARD_SENTENCES, encode, load_model  # noqa: E402
+
+WORDS = ("pump pressure valve warranty install update error manual reset password revenue "
+         "quarter bolt torque sensor firmware battery display network cable filter").split()
+
+
+def make_sentences(count, seed):
+    """Chunk-like sentences of 20-200 words, so batches have realistic padding"""
+    rng = np.random.default_rng(seed)
+    return [" ".join(rng.choice(WORDS, size=rng.integers(20, 200))) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--sentences", type=int, default=512)
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 32, 128])
+    parser.add_argument("--threads", type=int, default=0, help="CPU threads (0 = library default)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sentences = make_sentences(args.sentences, args.seed)
+    probe = GUARD_SENTENCES + sentences[:64]
+
+    reference = load_model(args.model, "torch", args.threads or None)
+    reference_vectors = encode(reference, probe, 32)
+
+    print(f"Model: {args.model}, {len(sentences)} sentences, threads={args.threads or 'default'}\n")
+    print(f"{'backend':<8} {'batch':>6} {'load s':>7} {'sent/s':>9} {'min cos':>8} {'mean cos':>9}")
+
+    for backend in args.backends:
+        started = time.perf_counter()
+        try:
+            model = reference if backend == "torch" else load_model(args.model, backend, args.threads or None)
+        except Exception as e:
+            print(f"{backend:<8} unavailable: {e}")
+            continue
+        load_seconds = time.perf_counter() - started
+
+        cosines = np.sum(encode(model, probe, 32) * reference_vectors, axis=1)
+
+        for batch_size in args.batch_sizes:
+            encode(model, sentences[:batch_size], batch_size)  # Warm-up
+            started = time.perf_counter()
+            encode(model, sentences, batch_size)
+            rate = len(sentences) / (time.perf_counter() - started)
+            print(f"{backend:<8} {batch_size:>6} {load_seconds:>7.1f} {rate:>9.1f} "
+                  f"{cosines.min():>8.4f} {cosines.mean():>9.4f}")
+
+
+if __name__ == "__main__":
+    main()
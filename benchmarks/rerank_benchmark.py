@@ -0,0 +1,129 @@
+"""
+Rerank Benchmark - Top-3 Precision Gained vs Latency Added
+Retrieves candidates from an existing store and compares their order before and after the cross-encoder
+
+Usage:
+    python benchmarks/rerank_benchmark.py --db faiss_index                    # known-item queries from the store
+    python benchmarks/rerank_benchmark.py --db faiss_index --qrels qrels.jsonl
+    python benchmarks/rerank_benchmark.py --db faiss_index --candidates 10 20 40
+
+A qrels file has one {"question": "...", "answers": ["...", ...]} per line; a
+chunk counts as relevant when it contains one of the answers (case-insensitive).
+Without one, queries are sentences sampled from stored chunks with a third of
+their words dropped, and only the chunk a sentence came from is relevant.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from context_packer import split_sentences  # noqa: E402
+from reranker import DEFAULT_RERANK_MODEL, CrossEncoderReranker  # noqa: E402
+from vector_store import VectorStore  # noqa: E402
+
+TOP_N = 3
+MIN_QUERY_WORDS = 8
+
+
+def load_qrels(path):
+    """[(question, is_relevant(doc))] from a JSONL qrels file"""
+    queries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            answers = [answer.lower() for answer in entry["answers"]]
+            queries.append((entry["question"],
+                            lambda doc, answers=answers: any(a in doc.page_content.lower() for a in answers)))
+    return queries
+
+
+def sample_known_items(store, count, seed):
+    """[(question, is_relevant(doc))]: partial sentences whose source chunk is the one relevant result"""
+    rng = np.random.default_rng(seed)
+    ids = store.docstore.ids_up_to(store.docstore.max_id())
+    docs = store.docstore.get([int(i) for i in rng.choice(ids, min(count * 3, len(ids)), replace=False)])
+
+    queries = []
+    for doc_id, doc in docs.items():
+        sentences = [s for s in split_sentences(doc.page_content) if len(s.split()) >= MIN_QUERY_WORDS]
+        if not sentences:
+            continue
+        words = sentences[rng.integers(len(sentences))].split()
+        keep = np.sort(rng.choice(len(words), max(len(words) * 2 // 3, MIN_QUERY_WORDS // 2), replace=False))
+        queries.append((" ".join(words[i] for i in keep),
+                        lambda doc, doc_id=doc_id: doc.metadata.get("chunk_id") == doc_id))
+        if len(queries) == count:
+            break
+    return queries
+
+
+def precision_at(docs, is_relevant, n=TOP_N):
+    return sum(1 for doc in docs[:n] if is_relevant(doc)) / n
+
+
+def hit_at(docs, is_relevant, n=TOP_N):
+    return float(any(is_relevant(doc) for doc in docs[:n]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="faiss_index", help="Store directory to retrieve from")
+    parser.add_argument("--qrels", help="JSONL of questions and answer strings")
+    parser.add_argument("--queries", type=int, default=100, help="Known-item queries to sample without --qrels")
+    parser.add_argument("--candidates", nargs="+", type=int, default=[10, 20, 40])
+    parser.add_argument("--model", default=DEFAULT_RERANK_MODEL)
+    parser.add_argument("--threads", type=int, default=0, help="CPU threads (0 = library default)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    store = VectorStore(args.db)
+    if store.is_empty():
+        sys.exit(f"No documents in {args.db}")
+    queries = load_qrels(args.qrels) if args.qrels else sample_known_items(store, args.queries, args.seed)
+    questions = [question for question, _ in queries]
+
+    # No latency budget, so every query is reranked
+    reranker = CrossEncoderReranker(args.model, latency_budget_ms=float("inf"), threads=args.threads or None)
+    reranker.warm_up()
+    query_vectors = store.embeddings.embed_queries(questions)
+
+    print(f"Store: {args.db}, {len(queries)} {'qrels' if args.qrels else 'known-item'} queries, model={args.model}\n")
+    print(f"{'candidates':>10} {'search ms':>10} {'P@3':>6} {'hit@3':>6} {'rerank P@3':>11} {'hit@3':>6} "
+          f"{'cold ms':>8} {'p95 ms':>7} {'cached ms':>10}")
+
+    for candidates in args.candidates:
+        search_ms, cold_ms, cached_ms = [], [], []
+        before, after = [], []
+        reranker._scores.clear()  # Cold cache per row
+        for (question, is_relevant), query_vector in zip(queries, query_vectors):
+            started = time.perf_counter()
+            docs = store.search(question, k=candidates, query_vector=query_vector)
+            search_ms.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            reranked = reranker.rerank(question, docs, TOP_N)
+            cold_ms.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            reranker.rerank(question, docs, TOP_N)
+            cached_ms.append((time.perf_counter() - started) * 1000)
+
+            before.append((precision_at(docs, is_relevant), hit_at(docs, is_relevant)))
+            after.append((precision_at(reranked, is_relevant), hit_at(reranked, is_relevant)))
+
+        before, after = np.mean(before, axis=0), np.mean(after, axis=0)
+        print(f"{candidates:>10} {np.mean(search_ms):>10.2f} {before[0]:>6.3f} {before[1]:>6.3f} "
+              f"{after[0]:>11.3f} {after[1]:>6.3f} {np.mean(cold_ms):>8.2f} "
+              f"{np.percentile(cold_ms, 95):>7.2f} {np.mean(cached_ms):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Semantic Answer Cache - Reuse Answers for Near-Identical Questions
+Matches by query-embedding similarity, but only when retrieval returns the same chunks
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIMILARITY_THRESHOLD = 0.95  # Cosine similarity between normalized query embeddings
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_TTL_SECONDS = 3600
+
+
+class CachedAnswer:
+    """One cached answer and what it was built from"""
+
+    __slots__ = ("question", "chunk_ids", "sources", "answer_sources", "answer", "created_at")
+
+    def __init__(self, question, chunk_ids, sources, answer_sources, answer):
+        self.question = question
+        self.chunk_ids = chunk_ids
+        self.sources = sources
+        self.answer_sources = answer_sources
+        self.answer = answer
+        self.created_at = time.time()
+
+
+class SemanticAnswerCache:
+    """
+    LRU + TTL cache of final answers keyed by query embedding
+
+    An entry is reused only when a new question is similar enough AND the
+    current search returns exactly the chunk ids the answer was built from,
+    so a changed index never serves an answer with stale context.
+    """
+
+    def __init__(self, similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._vectors: Dict[int, np.ndarray] = {}
+        self._matrix = None  # Stacked vectors for one matmul per lookup, rebuilt when entries change
+        self._matrix_keys: List[int] = []
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def _rebuild_matrix(self):
+        self._matrix_keys = list(self._entries)
+        if self._matrix_keys:
+            self._matrix = np.stack([self._vectors[key] for key in self._matrix_keys])
+        else:
+            self._matrix = None
+
+    def _remove(self, key: int):
+        self._entries.pop(key, None)
+        self._vectors.pop(key, None)
+        self._matrix = None
+
+    def lookup(self, query_vector, chunk_ids: Iterable[int]) -> Optional[CachedAnswer]:
+        """Return a cached answer for a similar question with the same retrieved chunks"""
+        query = np.asarray(query_vector, dtype=np.float32)
+        chunk_ids = tuple(chunk_ids)
+
+        with self._lock:
+            if not self._entries:
+                self.misses += 1
+                return None
+            if self._matrix is None:
+                self._rebuild_matrix()
+
+            similarities = self._matrix @ query
+            now = time.time()
+
+            for index in np.argsort(-similarities):
+                if similarities[index] < self.similarity_threshold:
+                    break
+
+                key = self._matrix_keys[index]
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if now - entry.created_at > self.ttl_seconds:
+                    self._remove(key)
+                    continue
+                if entry.chunk_ids != chunk_ids:
+                    continue
+
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+            self.misses += 1
+            return None
+
+    def store(self, question: str, query_vector, chunk_ids: Iterable[int], sources: Iterable[str],
+              answer_sources: List[str], answer: str):
+        """Cache a final answer with the chunks and sources it depends on"""
+        with self._lock:
+            key = self._next_key
+            self._next_key += 1
+            self._entries[key] = CachedAnswer(question, tuple(chunk_ids), frozenset(sources), answer_sources, answer)
+            self._vectors[key] = np.asarray(query_vector, dtype=np.float32)
+            self._matrix = None
+
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def invalidate_sources(self, sources: Optional[Iterable[str]] = None):
+        """Drop entries that depend on any of sources (all entries when sources is None)"""
+        with self._lock:
+            if sources is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self._vectors.clear()
+                self._matrix = None
+            else:
+                sources = set(sources)
+                stale = [key for key, entry in self._entries.items() if entry.sources & sources]
+                for key in stale:
+                    self._remove(key)
+                removed = len(stale)
+
+        if removed:
+            logger.info(f"Invalidated {removed} cached answers")
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "similarity_threshold": self.similarity_threshold,
+            "ttl_seconds": self.ttl_seconds,
+        }
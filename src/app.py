@@ -1,12 +1,15 @@
 import os
+import json
 import secrets
 import logging
+import multiprocessing
 
 # Set USER_AGENT to avoid warnings during web scraping
 os.environ.setdefault('USER_AGENT', 'RAG-LangChain-App/1.0 (Document Processing Bot)')
 
-from flask import Flask, request, render_template, redirect, url_for, session, flash, get_flashed_messages, jsonify
-from rag_engine import RagEngine
+from flask import Flask, Response, request, render_template, redirect, url_for, session, flash, get_flashed_messages, jsonify, stream_with_context
+from lazy_engine import LazyRagEngine, EngineNotReady
+from ingest_jobs import IngestJobQueue, DEFAULT_INGEST_WORKERS
 
 # Configure basic logging
 logging.basicConfig(
@@ -19,19 +22,54 @@ app = Flask(__name__)
 # Use environment variable or generate a random secret key
 app.secret_key = os.environ.get('SECRET_KEY', secrets.token_hex(16))
 
-logger.info("Creating RAG engine instance...")
 # Use absolute path for FAISS index to avoid working directory issues
 faiss_index_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "faiss_index")
 logger.info(f"Using FAISS index path: {faiss_index_path}")
 
-# Create RAG engine with simple chat history
-rag_engine = RagEngine(
+# Create RAG engine with simple chat history. It loads (model, index, LangChain) on a
+# background thread, so health checks and pages are served right away; set
+# EAGER_INIT=1 to load before serving instead
+rag_engine = LazyRagEngine(
     db_path=faiss_index_path,
     enable_chat_history=True,
-    max_history=10  # Keep last 10 exchanges for context
+    max_history=10,  # Keep last 10 exchanges per session for context
+    max_sessions=int(os.environ.get('CHAT_MAX_SESSIONS', '10000')),  # Conversations kept in memory
+    session_ttl=float(os.environ.get('CHAT_SESSION_TTL', '86400')),  # Idle seconds before a conversation is dropped
+    chat_db_path=os.environ.get('CHAT_HISTORY_DB') or None,  # SQLite file persisting conversations, if set
+    index_type=os.environ.get('INDEX_TYPE', 'flat'),  # flat, hnsw, ivf_flat, ivf_pq, sq8, sq4 or binary
+    search_mode=os.environ.get('SEARCH_MODE', 'hybrid'),  # hybrid (dense + BM25), dense or sparse
+    retrieval_service=os.environ.get('RETRIEVAL_SERVICE'),  # Socket of retrieval_service.py, if running one
+    embedding_backend=os.environ.get('EMBED_BACKEND', 'torch'),  # torch, onnx or int8
+    embedding_threads=int(os.environ.get('EMBED_THREADS', '0')) or None,  # CPU threads for encode
+    encode_batch_size=int(os.environ.get('ENCODE_BATCH_SIZE', '32')),  # Texts per model forward pass
+    embed_processes=int(os.environ.get('EMBED_PROCESSES', '0')),  # CPU processes for large ingests
+    pdf_processes=int(os.environ.get('PDF_PROCESSES', '0')),  # CPU processes for parsing large PDFs
+    context_tokens=int(os.environ.get('CONTEXT_TOKENS', '800')),  # Token budget for document context per prompt
+    rerank_model=os.environ.get('RERANK_MODEL') or None,  # Cross-encoder reranking, off unless set
+    rerank_candidates=int(os.environ.get('RERANK_CANDIDATES', '20')),  # Candidates the reranker reorders
+    rerank_budget_ms=float(os.environ.get('RERANK_BUDGET_MS', '150')),  # Skip reranking when slower than this
+    async_workers=int(os.environ.get('ASYNC_WORKERS', '4'))  # Threads for blocking steps of async questions (asgi.py)
 )
+# PDF and encode worker processes are spawned, which re-imports this module in each
+# of them; only the serving process loads the engine (and starts those pools). The
+# process name is already set while a spawned child re-imports, parent_process() isn't
+if multiprocessing.current_process().name == 'MainProcess':
+    rag_engine.start(background=os.environ.get('EAGER_INIT', '0') != '1')
 
-logger.info("RAG engine created successfully")
+# Ingests run in the background so uploads don't hold a request worker
+ingest_jobs = IngestJobQueue(max_workers=int(os.environ.get('INGEST_WORKERS', DEFAULT_INGEST_WORKERS)))
+
+# Site crawls: link hops followed from the submitted URL
+crawl_depth = int(os.environ.get('CRAWL_DEPTH', '2'))
+
+# Bulk question endpoint limits
+MAX_BULK_QUESTIONS = 10000
+MAX_BULK_K = 20  # Chunks retrieved per bulk question at most
+BULK_PROGRESS_BATCH = 100  # Questions answered between progress updates of a bulk job
+bulk_concurrency = int(os.environ.get('BULK_QUERY_CONCURRENCY', '8'))  # Concurrent LLM calls per bulk job
+
+# Bulk questions are answered in the background too, on their own pool so they don't hold up ingests
+question_jobs = IngestJobQueue(max_workers=int(os.environ.get('BULK_QUERY_JOBS', '1')))
 
 # Store sources in memory for demo (use DB for production)
 sources = []
@@ -39,14 +77,21 @@ sources = []
 @app.before_request
 def setup_session():
     """Initialize session data"""
-    # Legacy chat_history for backward compatibility
-    if 'chat_history' not in session:
-        session['chat_history'] = []
+    # The cookie only carries an id; the conversation itself lives in the engine's session store
+    if 'sid' not in session:
+        session['sid'] = secrets.token_hex(16)
+    # Drop the answer list older versions kept in the cookie
+    session.pop('chat_history', None)
 
 def sync_sources_with_vector_store():
     """Rebuild the sources list from the vector store to reflect current state."""
     global sources
     
+    if not rag_engine.ready:
+        # Still warming up - render the page now rather than waiting for the index
+        sources = []
+        return
+    
     try:
         # Get all unique sources from the vector store
         source_paths = rag_engine.vector_store.list_sources()
@@ -71,6 +116,22 @@ def sync_sources_with_vector_store():
         # Initialize empty sources to prevent errors
         sources = []
 
+@app.errorhandler(EngineNotReady)
+def engine_not_ready(e):
+    """Requests that need the engine while it is still loading get a retryable 503"""
+    return {"success": False, "message": str(e), "status": rag_engine.status()}, 503
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness check - answers as soon as the process is up"""
+    return {"status": "ok"}
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness check - 200 once the model and index are loaded, 503 until then"""
+    status = rag_engine.status()
+    return status, 200 if status["ready"] else 503
+
 @app.route('/remove_source', methods=['POST'])
 def remove_source():
     """Remove a source from the list and vector store"""
@@ -132,23 +193,29 @@ def home():
             url = request.form['url'].strip()
             if not url.startswith(('http://', 'https://')):
                 error = "URL must start with http:// or https://"
+            elif request.form.get('crawl'):
+                # Re-crawling a site is allowed: only new or changed pages are re-embedded
+                if ingest_jobs.find_active(url):
+                    flash(f"This site is already being crawled: {url}", "warning")
+                else:
+                    job = ingest_jobs.submit(
+                        'site', url,
+                        lambda target, progress: rag_engine.ingest_site(target, progress, max_depth=crawl_depth)
+                    )
+                    flash(f"Site is being crawled in the background (job {job.id}).", "success")
+                return redirect(url_for('home'))
             else:
-                # Check if URL already exists in vector store
-                existing_sources = rag_engine.vector_store.list_sources()
-                if url in existing_sources:
-                    flash(f"URL already exists in the knowledge base: {url}", "warning")
-                    logger.warning(f"Attempted to add duplicate URL: {url}")
+                # A URL already in the knowledge base is refreshed: only changed chunks are re-embedded
+                if ingest_jobs.find_active(url):
+                    flash(f"URL is already being ingested: {url}", "warning")
+                    logger.warning(f"Attempted to add URL that is being ingested: {url}")
                     return redirect(url_for('home'))
                 else:
-                    try:
-                        chunks = rag_engine.ingest_web(url)
-                        sync_sources_with_vector_store()  # Sync after adding content
-                        flash(f"Web content ingested! {len(chunks)} chunks added.", "success")
-                        logger.info(f"Successfully ingested URL: {url}")
-                        return redirect(url_for('home'))  # Redirect to prevent resubmission
-                    except Exception as e:
-                        error = f"Error ingesting URL: {str(e)}"
-                        logger.error(f"Error ingesting URL {url}: {str(e)}", exc_info=True)
+                    refresh = url in rag_engine.vector_store.list_sources()
+                    job = ingest_jobs.submit('web', url, rag_engine.ingest_web)
+                    action = "refreshed" if refresh else "ingested"
+                    flash(f"Web content is being {action} in the background (job {job.id}).", "success")
+                    return redirect(url_for('home'))  # Redirect to prevent resubmission
         
         # Handle PDF ingestion
         elif 'pdf' in request.files and request.files['pdf'].filename:
@@ -160,40 +227,34 @@ def home():
                 uploads_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
                 file_path = os.path.join(uploads_dir, pdf_file.filename)
                 
-                # Check if PDF already exists in vector store
-                existing_sources = rag_engine.vector_store.list_sources()
-                if file_path in existing_sources:
-                    flash(f"PDF already exists in the knowledge base: {pdf_file.filename}", "warning")
-                    logger.warning(f"Attempted to add duplicate PDF: {pdf_file.filename}")
+                # Re-uploading a PDF refreshes it; chunks identical to stored ones (e.g. a renamed
+                # copy) are never embedded or stored twice
+                if ingest_jobs.find_active(file_path):
+                    flash(f"PDF is already being ingested: {pdf_file.filename}", "warning")
+                    logger.warning(f"Attempted to add PDF that is being ingested: {pdf_file.filename}")
                     return redirect(url_for('home'))
                 else:
                     try:
+                        refresh = file_path in rag_engine.vector_store.list_sources()
                         os.makedirs(uploads_dir, exist_ok=True)
                         pdf_file.save(file_path)
                         
-                        chunks = rag_engine.ingest_pdf(file_path)
-                        sync_sources_with_vector_store()  # Sync after adding content
-                        flash(f"PDF ingested! {len(chunks)} chunks added.", "success")
-                        logger.info(f"Successfully ingested PDF: {pdf_file.filename}")
+                        job = ingest_jobs.submit('pdf', file_path, rag_engine.ingest_pdf)
+                        action = "refreshed" if refresh else "ingested"
+                        flash(f"PDF is being {action} in the background (job {job.id}).", "success")
                         return redirect(url_for('home'))  # Redirect to prevent resubmission
                     except Exception as e:
-                        error = f"Error ingesting PDF: {str(e)}"
-                        logger.error(f"Error ingesting PDF {pdf_file.filename}: {str(e)}", exc_info=True)
+                        error = f"Error saving PDF: {str(e)}"
+                        logger.error(f"Error saving PDF {pdf_file.filename}: {str(e)}", exc_info=True)
         
         # Handle questions
         elif 'question' in request.form and request.form['question'].strip():
             question = request.form['question'].strip()
             try:
                 logger.info(f"Processing question: {question}")
-                answer = rag_engine.query(question)
+                answer = rag_engine.query(question, session_id=session['sid'])
                 logger.info(f"Successfully processed question, got answer of length: {len(answer)}")
                 
-                # Maintain backward compatibility with session chat_history
-                if 'chat_history' not in session:
-                    session['chat_history'] = []
-                session['chat_history'].append({'question': question, 'answer': answer})
-                session.modified = True
-                
             except Exception as e:
                 error_msg = f"Error processing question: {str(e)}"
                 logger.error(error_msg, exc_info=True)
@@ -204,9 +265,9 @@ def home():
     # Always refresh sources from vector store to ensure current state
     sync_sources_with_vector_store()
         
-    # Get chat history from RAG engine
+    # Get this session's chat history from the RAG engine
     try:
-        chat_history = rag_engine.get_chat_history()
+        chat_history = rag_engine.get_chat_history(session['sid']) if rag_engine.ready else []
         # Convert to format expected by template
         formatted_history = []
         for exchange in chat_history:
@@ -214,9 +275,9 @@ def home():
                 'question': exchange['question'], 
                 'answer': exchange['answer']
             })
-    except:
-        # Fallback to session-based chat history
-        formatted_history = session.get('chat_history', [])
+    except Exception as e:
+        logger.error(f"Error loading chat history: {e}")
+        formatted_history = []
     
     # Get any flash messages to display
     messages = get_flashed_messages(with_categories=True)
@@ -241,20 +302,16 @@ def api_question():
         
     try:
         logger.info(f"API processing question: {question}")
-        answer = rag_engine.query(question)
+        answer = rag_engine.query(question, session_id=session['sid'])
         logger.info(f"API successfully processed question, got answer of length: {len(answer)}")
         
-        # Maintain backward compatibility with session chat history
-        if 'chat_history' not in session:
-            session['chat_history'] = []
-        session['chat_history'].append({'question': question, 'answer': answer})
-        session.modified = True
-        
         return {
             "success": True,
             "answer": answer,
             "question": question
         }
+    except EngineNotReady:
+        raise
     except Exception as e:
         error_msg = f"Error processing question: {str(e)}"
         logger.error(error_msg, exc_info=True)
@@ -262,16 +319,79 @@ def api_question():
         logger.error(f"API Error type: {type(e).__name__}")
         return {"success": False, "message": error_msg}, 500
 
+@app.route('/api/questions', methods=['POST'])
+def api_questions():
+    """Bulk API endpoint: queue a list of independent questions and return a job id to poll"""
+    data = request.get_json(silent=True) or {}
+    questions = data.get('questions')
+    
+    if not isinstance(questions, list) or not questions:
+        return {"success": False, "message": "A non-empty 'questions' list is required"}, 400
+    if len(questions) > MAX_BULK_QUESTIONS:
+        return {"success": False, "message": f"At most {MAX_BULK_QUESTIONS} questions per request"}, 400
+    try:
+        k = int(data.get('k', 5))
+    except (TypeError, ValueError):
+        return {"success": False, "message": "'k' must be an integer"}, 400
+    k = min(max(k, 1), MAX_BULK_K)
+    
+    questions = [str(question).strip() for question in questions]
+    engine = rag_engine.get()  # Wait for warm-up (or 503) before queueing
+    
+    def answer_questions(target, progress):
+        # Answered in slices appended to a list the job owns, so pollers see the results so far
+        results = []
+        progress(result=results)
+        for start in range(0, len(questions), BULK_PROGRESS_BATCH):
+            batch = questions[start:start + BULK_PROGRESS_BATCH]
+            answers = engine.query_many(batch, k=k, max_concurrency=bulk_concurrency)
+            results.extend([{"question": q, "answer": a} for q, a in zip(batch, answers)])
+        return 0
+    
+    logger.info(f"API queueing {len(questions)} bulk questions")
+    job = question_jobs.submit('questions', f"{len(questions)} questions", answer_questions)
+    return {
+        "success": True,
+        "job_id": job.id,
+        "status_url": url_for('get_questions_job', job_id=job.id)
+    }, 202
+
+@app.route('/api/questions/<job_id>', methods=['GET'])
+def get_questions_job(job_id):
+    """Report status and the answers so far of one bulk question job"""
+    job = question_jobs.get(job_id)
+    if job is None:
+        return {"success": False, "message": "Unknown job id"}, 404
+    return {"success": True, "job": job.to_dict()}
+
+@app.route('/api/question/stream', methods=['GET', 'POST'])
+def api_question_stream():
+    """Server-Sent Events endpoint streaming answer tokens as they are generated"""
+    data = request.get_json(silent=True) or {}
+    question = (data.get('question') or request.args.get('question', '')).strip()
+    
+    if not question:
+        return {"success": False, "message": "Question is required"}, 400
+    
+    logger.info(f"API streaming question: {question}")
+    engine = rag_engine.get()  # Wait for warm-up (or 503) before the stream starts
+    session_id = session['sid']
+    
+    def events():
+        # Each event is "event: <token|answer|error>" with a JSON data payload
+        for event, payload in engine.query_stream(question, session_id=session_id):
+            yield f"event: {event}\ndata: {json.dumps({'text': payload})}\n\n"
+    
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/clear_chat', methods=['POST'])
 def clear_chat():
     """AJAX endpoint to clear chat history for the session."""
-    # Clear RAG engine chat history
-    rag_engine.clear_chat_history()
-    
-    # Also clear session-based history for backward compatibility
-    session['chat_history'] = []
-    session.modified = True
-    
+    rag_engine.clear_chat_history(session['sid'])
     return {"success": True}
 
 # Simple Chat History API Endpoints
@@ -280,7 +400,7 @@ def clear_chat():
 def get_chat_history():
     """Get chat history"""
     try:
-        history = rag_engine.get_chat_history()
+        history = rag_engine.get_chat_history(session['sid'])
         return {"success": True, "history": history}
     except Exception as e:
         logger.error(f"Error getting chat history: {e}")
@@ -290,12 +410,75 @@ def get_chat_history():
 def get_chat_stats():
     """Get chat statistics"""
     try:
-        stats = rag_engine.get_chat_stats()
+        stats = rag_engine.get_chat_stats(session['sid'])
         return {"success": True, "stats": stats}
     except Exception as e:
         logger.error(f"Error getting chat stats: {e}")
         return {"success": False, "message": str(e)}, 500
 
+@app.route('/api/ingest', methods=['GET'])
+def list_ingest_jobs():
+    """List tracked ingestion jobs"""
+    return {"success": True, "jobs": [job.to_dict() for job in ingest_jobs.list_jobs()]}
+
+@app.route('/api/ingest/<job_id>', methods=['GET'])
+def get_ingest_job(job_id):
+    """Report progress of one ingestion job"""
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        return {"success": False, "message": "Unknown job id"}, 404
+    return {"success": True, "job": job.to_dict()}
+
+@app.route('/api/answer_cache/stats', methods=['GET'])
+def get_answer_cache_stats():
+    """Get semantic answer cache statistics"""
+    try:
+        stats = rag_engine.get_answer_cache_stats()
+        return {"success": True, "stats": stats}
+    except Exception as e:
+        logger.error(f"Error getting answer cache stats: {e}")
+        return {"success": False, "message": str(e)}, 500
+
+@app.route('/api/llm/stats', methods=['GET'])
+def get_llm_stats():
+    """Get LLM latency and retry statistics"""
+    try:
+        stats = rag_engine.get_llm_stats()
+        return {"success": True, "stats": stats}
+    except Exception as e:
+        logger.error(f"Error getting LLM stats: {e}")
+        return {"success": False, "message": str(e)}, 500
+
+@app.route('/api/context/stats', methods=['GET'])
+def get_context_stats():
+    """Get prompt token accounting"""
+    try:
+        stats = rag_engine.get_context_stats()
+        return {"success": True, "stats": stats}
+    except Exception as e:
+        logger.error(f"Error getting context stats: {e}")
+        return {"success": False, "message": str(e)}, 500
+
+@app.route('/api/rerank/stats', methods=['GET'])
+def get_rerank_stats():
+    """Get reranker latency and cache statistics"""
+    try:
+        stats = rag_engine.get_rerank_stats()
+        return {"success": True, "stats": stats}
+    except Exception as e:
+        logger.error(f"Error getting rerank stats: {e}")
+        return {"success": False, "message": str(e)}, 500
+
+@app.route('/api/embeddings/stats', methods=['GET'])
+def get_embedding_stats():
+    """Get embedding cache statistics"""
+    try:
+        stats = rag_engine.get_embedding_stats()
+        return {"success": True, "stats": stats}
+    except Exception as e:
+        logger.error(f"Error getting embedding stats: {e}")
+        return {"success": False, "message": str(e)}, 500
+
 if __name__ == '__main__':
     logger.info("Starting RAG LangChain Web App with Simple Chat History")
     # Use debug=False to prevent reloading on every request/refresh
@@ -0,0 +1,144 @@
+"""
+ASGI Entry Point - Async Question Endpoints in Front of the Flask App
+Questions waiting on the LLM hold no thread, so one process serves hundreds of them at once
+
+Usage:
+    cd src && uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import secrets
+
+from a2wsgi import WSGIMiddleware
+from itsdangerous import BadSignature
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+from app import app as flask_app, rag_engine
+from lazy_engine import EngineNotReady
+
+logger = logging.getLogger(__name__)
+
+WSGI_THREADS = 16  # Threads serving the remaining Flask routes (pages, uploads, stats)
+
+# Conversations are keyed by the sid in Flask's signed session cookie, so both apps share them
+_session_serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+_session_cookie = flask_app.config["SESSION_COOKIE_NAME"]
+_session_max_age = int(flask_app.permanent_session_lifetime.total_seconds())
+
+
+def _session_id(request):
+    """(sid, cookie value to set or None) - a new sid is issued like Flask's setup_session does"""
+    data = {}
+    cookie = request.cookies.get(_session_cookie)
+    if cookie:
+        try:
+            data = dict(_session_serializer.loads(cookie, max_age=_session_max_age))
+        except BadSignature:
+            data = {}
+    if "sid" in data:
+        return data["sid"], None
+    data["sid"] = secrets.token_hex(16)
+    data.pop("chat_history", None)
+    return data["sid"], _session_serializer.dumps(data)
+
+
+def _with_session_cookie(response, cookie):
+    if cookie is not None:
+        response.set_cookie(_session_cookie, cookie, httponly=True,
+                            samesite=(flask_app.config["SESSION_COOKIE_SAMESITE"] or "lax").lower())
+    return response
+
+
+async def _engine():
+    """The loaded RagEngine; waiting for warm-up happens off the event loop"""
+    if rag_engine.ready:
+        return rag_engine.get()
+    return await asyncio.to_thread(rag_engine.get)
+
+
+def _not_ready(e):
+    return JSONResponse({"success": False, "message": str(e), "status": rag_engine.status()}, status_code=503)
+
+
+async def _question(request):
+    """JSON body or query string question, or None if absent, blank or not a string"""
+    data = {}
+    if request.method == "POST":
+        try:
+            data = await request.json()
+        except ValueError:
+            data = {}
+    question = (data.get("question") if isinstance(data, dict) else None) or request.query_params.get("question", "")
+    if not isinstance(question, str):
+        return None  # Answered with a 400, like any other missing question
+    return question.strip() or None
+
+
+async def api_question(request):
+    """Async counterpart of Flask's /api/question"""
+    question = await _question(request)
+    if not question:
+        return JSONResponse({"success": False, "message": "Question is required"}, status_code=400)
+
+    session_id, cookie = _session_id(request)
+    try:
+        engine = await _engine()
+        logger.info(f"API processing question: {question}")
+        answer = await engine.aquery(question, session_id=session_id)
+        response = JSONResponse({"success": True, "answer": answer, "question": question})
+    except EngineNotReady as e:
+        return _not_ready(e)
+    except Exception as e:
+        error_msg = f"Error processing question: {str(e)}"
+        logger.error(error_msg, exc_info=True)
+        response = JSONResponse({"success": False, "message": error_msg}, status_code=500)
+    return _with_session_cookie(response, cookie)
+
+
+async def api_question_stream(request):
+    """Async counterpart of Flask's /api/question/stream (Server-Sent Events)"""
+    question = await _question(request)
+    if not question:
+        return JSONResponse({"success": False, "message": "Question is required"}, status_code=400)
+
+    session_id, cookie = _session_id(request)
+    try:
+        engine = await _engine()  # Wait for warm-up (or 503) before the stream starts
+    except EngineNotReady as e:
+        return _not_ready(e)
+    logger.info(f"API streaming question: {question}")
+
+    async def events():
+        # Each event is "event: <token|answer|error>" with a JSON data payload
+        async for event, payload in engine.aquery_stream(question, session_id=session_id):
+            yield f"event: {event}\ndata: {json.dumps({'text': payload})}\n\n"
+
+    response = StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    return _with_session_cookie(response, cookie)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    yield
+    if rag_engine.ready:
+        await rag_engine.llm.aclose()
+
+
+app = Starlette(
+    routes=[
+        Route("/api/question", api_question, methods=["POST"]),
+        Route("/api/question/stream", api_question_stream, methods=["GET", "POST"]),
+        # Everything else (pages, uploads, bulk questions, stats) is the Flask app on a thread pool
+        Mount("/", app=WSGIMiddleware(flask_app, workers=WSGI_THREADS)),
+    ],
+    lifespan=lifespan,
+)
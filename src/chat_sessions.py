@@ -0,0 +1,237 @@
+"""
+Chat Session Store - Per-Session Conversation History
+Bounded LRU of session histories with idle expiry and an optional SQLite spill
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from langchain_chat_history import SimpleLangChainHistory
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SESSIONS = 10000  # Sessions kept in memory; least recently used ones are dropped first
+DEFAULT_IDLE_TTL = 24 * 3600  # Seconds of inactivity after which a session is forgotten
+DEFAULT_FLUSH_INTERVAL = 1.0  # Seconds between SQLite write batches
+DEFAULT_FLUSH_BATCH = 500  # ...or sooner, once this many writes are queued
+PURGE_INTERVAL = 600  # Seconds between sweeps of expired sessions from SQLite
+
+
+class _Session:
+    """One conversation: its bounded history plus bookkeeping"""
+
+    __slots__ = ("history", "next_seq", "last_access")
+
+    def __init__(self, history: SimpleLangChainHistory, next_seq: int, last_access: float):
+        self.history = history
+        self.next_seq = next_seq
+        self.last_access = last_access
+
+
+class ChatSessionStore:
+    """
+    Session id -> chat history, for any number of concurrent conversations
+
+    Lookups and appends are O(1): sessions live in an OrderedDict kept in
+    access order, so both LRU eviction and idle expiry pop from its front.
+    With db_path, exchanges are also written to SQLite by a background
+    thread in batches, and a session evicted from memory (or from before a
+    restart) is reloaded from there on its next request.
+    """
+
+    def __init__(self, max_history: int = 10, max_sessions: int = DEFAULT_MAX_SESSIONS,
+                 idle_ttl: float = DEFAULT_IDLE_TTL, db_path: Optional[str] = None,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, flush_batch: int = DEFAULT_FLUSH_BATCH):
+        self.max_history = max_history
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._evictions = 0
+        self._expirations = 0
+
+        # Writes waiting for the flusher: ("add", row) / ("clear", session_id)
+        self._pending: List[tuple] = []
+        self._pending_sessions = set()
+        self._pending_lock = threading.Condition(threading.Lock())
+        self._flush_lock = threading.Lock()
+        self._conn = None
+        if db_path:
+            self._open_db()
+            threading.Thread(target=self._flush_loop, name="chat-history-flush", daemon=True).start()
+
+    def _open_db(self):
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chat_exchanges (
+                session_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                sources TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (session_id, seq)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_created ON chat_exchanges(created_at)")
+        self._conn.commit()
+
+    # Sessions
+
+    def _expire(self, now: float):
+        """Drop idle sessions from the front of the access-ordered dict (caller holds _lock)"""
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_access < self.idle_ttl:
+                break
+            del self._sessions[session_id]
+            self._expirations += 1
+
+    def _load(self, session_id: str) -> _Session:
+        """Rebuild a session from SQLite (an empty one without persistence)"""
+        history = SimpleLangChainHistory(max_history=self.max_history)
+        next_seq = 0
+        if self._conn is not None:
+            if session_id in self._pending_sessions:
+                self.flush()  # Its latest exchanges may still be queued
+            cutoff = time.time() - self.idle_ttl
+            with self._flush_lock:
+                rows = self._conn.execute(
+                    "SELECT seq, question, answer, sources, created_at FROM chat_exchanges "
+                    "WHERE session_id = ? AND created_at >= ? ORDER BY seq DESC LIMIT ?",
+                    (session_id, cutoff, self.max_history),
+                ).fetchall()
+            for seq, question, answer, sources, created_at in reversed(rows):
+                history.add_exchange(question, answer, json.loads(sources), timestamp=created_at)
+            if rows:
+                next_seq = rows[0][0] + 1
+        return _Session(history, next_seq, time.monotonic())
+
+    def _session(self, session_id: str) -> _Session:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_access = now
+                self._sessions.move_to_end(session_id)
+                return session
+
+        session = self._load(session_id)
+        with self._lock:
+            # Another request for the same session may have loaded it meanwhile
+            existing = self._sessions.get(session_id)
+            if existing is not None:
+                return existing
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._evictions += 1
+        return session
+
+    def get(self, session_id: str) -> SimpleLangChainHistory:
+        """History of session_id (created on first use); read-only use - record via add_exchange"""
+        return self._session(session_id).history
+
+    def add_exchange(self, session_id: str, question: str, answer: str, sources: Optional[List[str]] = None):
+        session = self._session(session_id)
+        session.history.add_exchange(question, answer, sources)
+        if self._conn is not None:
+            with self._lock:
+                seq, session.next_seq = session.next_seq, session.next_seq + 1
+            self._queue(("add", (session_id, seq, question, answer, json.dumps(sources or []), time.time())))
+
+    def clear(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        if self._conn is not None:
+            self._queue(("clear", session_id))
+
+    # SQLite spill
+
+    def _queue(self, write: tuple):
+        with self._pending_lock:
+            self._pending.append(write)
+            self._pending_sessions.add(write[1][0] if write[0] == "add" else write[1])
+            if len(self._pending) >= self.flush_batch:
+                self._pending_lock.notify()
+
+    def flush(self):
+        """Write every queued exchange in one transaction"""
+        with self._pending_lock:
+            writes, self._pending = self._pending, []
+        if not writes:
+            return
+
+        trims = {}
+        with self._flush_lock:
+            try:
+                with self._conn:
+                    for kind, payload in writes:
+                        if kind == "add":
+                            self._conn.execute("INSERT OR REPLACE INTO chat_exchanges VALUES (?, ?, ?, ?, ?, ?)", payload)
+                            trims[payload[0]] = payload[1]
+                        else:
+                            self._conn.execute("DELETE FROM chat_exchanges WHERE session_id = ?", (payload,))
+                            trims.pop(payload, None)
+                    # Keep each session's table rows to its ring buffer's size
+                    self._conn.executemany(
+                        "DELETE FROM chat_exchanges WHERE session_id = ? AND seq <= ?",
+                        [(session_id, last_seq - self.max_history) for session_id, last_seq in trims.items()],
+                    )
+            except sqlite3.Error as e:
+                logger.error(f"Error writing chat history: {str(e)}")
+        with self._pending_lock:
+            self._pending_sessions = {
+                write[1][0] if write[0] == "add" else write[1] for write in self._pending
+            }
+
+    def _purge_expired(self):
+        with self._flush_lock:
+            try:
+                with self._conn:
+                    self._conn.execute(
+                        "DELETE FROM chat_exchanges WHERE session_id IN ("
+                        "SELECT session_id FROM chat_exchanges GROUP BY session_id HAVING MAX(created_at) < ?)",
+                        (time.time() - self.idle_ttl,),
+                    )
+            except sqlite3.Error as e:
+                logger.error(f"Error purging expired chat history: {str(e)}")
+
+    def _flush_loop(self):
+        last_purge = time.monotonic()
+        while True:
+            with self._pending_lock:
+                self._pending_lock.wait_for(lambda: len(self._pending) >= self.flush_batch, self.flush_interval)
+            self.flush()
+            if time.monotonic() - last_purge >= PURGE_INTERVAL:
+                self._purge_expired()
+                last_purge = time.monotonic()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            active = len(self._sessions)
+        with self._pending_lock:
+            pending = len(self._pending)
+        return {
+            "active_sessions": active,
+            "max_sessions": self.max_sessions,
+            "idle_ttl_seconds": self.idle_ttl,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+            "persistent": self._conn is not None,
+            "pending_writes": pending,
+        }
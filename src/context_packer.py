@@ -0,0 +1,231 @@
+"""
+Context Packer - Token-Budgeted Prompt Context
+Drops near-duplicate chunks, trims the rest to their relevant sentences and fills a token budget
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import tiktoken
+except ImportError:  # Optional - token counts fall back to an estimate
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTEXT_TOKENS = 800  # Document-context budget per prompt (three full chunks were ~800)
+DEFAULT_MMR_LAMBDA = 0.7  # Relevance vs. novelty when ordering chunks (1.0 = relevance only)
+DEFAULT_DUPLICATE_THRESHOLD = 0.92  # Chunks this similar to an already chosen one are dropped
+DEFAULT_MIN_SENTENCE_SCORE = 0.15  # Sentences less similar to the question are left out
+TOKENIZER_ENCODING = "cl100k_base"  # Close enough to the LLM's BPE for budgeting
+MAX_SENTENCE_CHARS = 400  # Longer unpunctuated runs (PDF tables, lists) are split further
+ACCOUNTING_WINDOW = 1000  # Recent packs kept for token accounting
+
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+ESTIMATE_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+_encoder = None
+_encoder_loaded = False
+
+
+def _get_encoder():
+    """The tiktoken encoder, loaded once; None when tiktoken or its encoding file is unavailable"""
+    global _encoder, _encoder_loaded
+    if not _encoder_loaded:
+        if tiktoken is not None:
+            try:
+                _encoder = tiktoken.get_encoding(TOKENIZER_ENCODING)
+            except Exception as e:
+                logger.warning(f"Could not load tiktoken encoding {TOKENIZER_ENCODING}, estimating tokens: {str(e)}")
+        _encoder_loaded = True
+    return _encoder
+
+
+def count_tokens(text: str) -> int:
+    """BPE token count of text (an estimate that errs high without tiktoken)"""
+    if not text:
+        return 0
+    encoder = _get_encoder()
+    if encoder is not None:
+        return len(encoder.encode_ordinary(text))
+    # Roughly one token per short word or punctuation mark, more for long words
+    return sum(1 + (len(piece) - 1) // 6 for piece in ESTIMATE_PATTERN.findall(text))
+
+
+def split_sentences(text: str) -> List[str]:
+    sentences = []
+    for part in SENTENCE_BREAK.split(text):
+        part = " ".join(part.split())
+        while len(part) > MAX_SENTENCE_CHARS:
+            cut = part.rfind(" ", 0, MAX_SENTENCE_CHARS)
+            cut = cut if cut > 0 else MAX_SENTENCE_CHARS
+            sentences.append(part[:cut])
+            part = part[cut:].lstrip()
+        if part:
+            sentences.append(part)
+    return sentences
+
+
+class PackedContext:
+    """Prompt context text, the documents it draws on (best first) and its token accounting"""
+
+    __slots__ = ("text", "documents", "stats")
+
+    def __init__(self, text: str, documents: List[Any], stats: Dict[str, Any]):
+        self.text = text
+        self.documents = documents
+        self.stats = stats
+
+
+class ContextPacker:
+    """
+    Builds the document context of a prompt within a token budget
+
+    Every sentence of the retrieved chunks is embedded in one batch. Cached
+    vectors are reused, but new ones stay in the cache's memory tier, so
+    prompt sentences never grow the on-disk cache. Chunks are
+    ordered by maximal marginal relevance and near-duplicates are dropped;
+    the budget is then filled greedily with the sentences most similar to
+    the question, and each chunk keeps its chosen sentences in their
+    original order.
+    """
+
+    def __init__(self, embeddings, token_budget: int = DEFAULT_CONTEXT_TOKENS,
+                 mmr_lambda: float = DEFAULT_MMR_LAMBDA, duplicate_threshold: float = DEFAULT_DUPLICATE_THRESHOLD,
+                 min_sentence_score: float = DEFAULT_MIN_SENTENCE_SCORE):
+        self.embeddings = embeddings
+        self.token_budget = token_budget
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_threshold = duplicate_threshold
+        self.min_sentence_score = min_sentence_score
+
+    def _mmr_order(self, query: np.ndarray, chunk_vectors: np.ndarray):
+        """Chunk indices in MMR order, plus the indices dropped as near-duplicates"""
+        relevance = chunk_vectors @ query
+        similarity = chunk_vectors @ chunk_vectors.T
+        remaining = list(range(len(chunk_vectors)))
+        order, duplicates = [], []
+        while remaining:
+            if order:
+                redundancy = similarity[np.ix_(remaining, order)].max(axis=1)
+            else:
+                redundancy = np.zeros(len(remaining), dtype=np.float32)
+            for position in reversed(range(len(remaining))):
+                if redundancy[position] >= self.duplicate_threshold:
+                    duplicates.append(remaining.pop(position))
+                    redundancy = np.delete(redundancy, position)
+            if not remaining:
+                break
+            scores = self.mmr_lambda * relevance[remaining] - (1 - self.mmr_lambda) * redundancy
+            order.append(remaining.pop(int(np.argmax(scores))))
+        return order, duplicates
+
+    def _score(self, query_vector, sentences: List[List[str]]):
+        """(per-chunk sentence scores, chunk order, duplicate chunks)"""
+        flat = [sentence for chunk in sentences for sentence in chunk]
+        vectors = np.asarray(self.embeddings.embed_queries(flat, persist=False), dtype=np.float32)
+        query = np.asarray(query_vector, dtype=np.float32)
+        flat_scores = vectors @ query
+
+        # A chunk's vector is the normalized mean of its sentences', which is all MMR needs
+        chunk_scores, chunk_vectors, start = [], [], 0
+        for chunk in sentences:
+            chunk_scores.append(flat_scores[start:start + len(chunk)])
+            mean = vectors[start:start + len(chunk)].mean(axis=0)
+            chunk_vectors.append(mean / (np.linalg.norm(mean) or 1.0))
+            start += len(chunk)
+        order, duplicates = self._mmr_order(query, np.stack(chunk_vectors))
+        return chunk_scores, order, duplicates
+
+    def pack(self, query_vector, documents: List[Any], token_budget: Optional[int] = None) -> PackedContext:
+        """Pack documents (retrieval order) into at most token_budget tokens of context"""
+        started = time.perf_counter()
+        budget = token_budget or self.token_budget
+        indexed = [(i, split_sentences(doc.page_content)) for i, doc in enumerate(documents)]
+        indexed = [(i, chunk) for i, chunk in indexed if chunk]
+        documents = [documents[i] for i, _ in indexed]
+        sentences = [chunk for _, chunk in indexed]
+
+        chunk_scores, order, duplicates, min_score = None, list(range(len(sentences))), [], self.min_sentence_score
+        if sentences:
+            try:
+                chunk_scores, order, duplicates = self._score(query_vector, sentences)
+            except Exception as e:
+                logger.error(f"Error scoring context sentences, packing in retrieval order: {str(e)}")
+        if chunk_scores is None:
+            # Retrieval order, earlier sentences first
+            chunk_scores = [np.linspace(-rank, -rank - 0.5, len(chunk)) for rank, chunk in enumerate(sentences)]
+            min_score = -np.inf
+
+        # Greedy fill: best sentences of the kept chunks first, skipping ones that don't fit
+        tokens = [[count_tokens(sentence) for sentence in chunk] for chunk in sentences]
+        candidates = sorted(
+            ((chunk_scores[c][s], c, s) for c in order for s in range(len(sentences[c]))),
+            key=lambda item: item[0], reverse=True
+        )
+        kept, remaining = {}, budget
+        for score, c, s in candidates:
+            if score < min_score and kept:
+                break
+            cost = tokens[c][s] + 1  # Plus the space or paragraph break joining it
+            if cost <= remaining:
+                kept.setdefault(c, []).append(s)
+                remaining -= cost
+
+        used = [c for c in order if c in kept]
+        text = "\n\n".join(" ".join(sentences[c][s] for s in sorted(kept[c])) for c in used)
+        context_tokens = count_tokens(text)
+        stats = {
+            "token_budget": budget,
+            "context_tokens": context_tokens,
+            "retrieved_tokens": sum(sum(chunk) for chunk in tokens),
+            "retrieved_chunks": len(sentences),
+            "duplicate_chunks": len(duplicates),
+            "used_chunks": len(used),
+            "sentences_kept": sum(len(kept[c]) for c in used),
+            "sentences_total": sum(len(chunk) for chunk in sentences),
+            "pack_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+        return PackedContext(text, [documents[c] for c in used], stats)
+
+
+class ContextAccounting:
+    """Thread-safe window of per-query token counts, for tuning the budget"""
+
+    def __init__(self, window: int = ACCOUNTING_WINDOW):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self.queries = 0
+
+    def record(self, stats: Dict[str, Any]):
+        with self._lock:
+            self._recent.append(stats)
+            self.queries += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            recent = list(self._recent)
+            queries = self.queries
+
+        def mean(key):
+            values = [stats[key] for stats in recent if key in stats]
+            return round(sum(values) / len(values), 2) if values else None
+
+        return {
+            "queries": queries,
+            "window": len(recent),
+            "tokenizer": "tiktoken" if _get_encoder() is not None else "estimate",
+            "mean_prompt_tokens": mean("prompt_tokens"),
+            "mean_context_tokens": mean("context_tokens"),
+            "mean_conversation_tokens": mean("conversation_tokens"),
+            "mean_retrieved_tokens": mean("retrieved_tokens"),
+            "mean_duplicate_chunks": mean("duplicate_chunks"),
+            "mean_pack_ms": mean("pack_ms"),
+            "last": recent[-1] if recent else None,
+        }
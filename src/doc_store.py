@@ -0,0 +1,257 @@
+"""
+SQLite Document Store - Pickle-Free Chunk Storage
+Chunk text and metadata are read lazily, only for the hits a search returns
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+SQLITE_MAX_PARAMS = 500  # Stay well below SQLite's bound-parameter limit
+
+
+def content_hash(text: str) -> str:
+    """Identity of a chunk's content; whitespace differences don't count"""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+class SQLiteDocStore:
+    """
+    Chunk store backed by a single SQLite file
+
+    Row ids double as FAISS vector ids, so a search result maps straight to
+    its row without any in-memory id table. Each distinct chunk text is
+    stored once; chunk_refs records every source it appeared in (with that
+    source's metadata), and a chunk is only deleted once no source refers to
+    it. When the source a chunk's own metadata names is released, the chunk
+    takes over the metadata of a source that still refers to it.
+    """
+
+    def __init__(self, path: str):
+        """Open (or create) the store at path"""
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source TEXT,
+                text TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks(source)")
+        self._migrate_hashes()
+        self._conn.commit()
+
+    def _migrate_hashes(self):
+        """Add content hashes and per-source refs to stores created before they existed"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(chunks)")}
+        if "content_hash" not in columns:
+            self._conn.execute("ALTER TABLE chunks ADD COLUMN content_hash TEXT")
+            rows = self._conn.execute("SELECT id, text FROM chunks").fetchall()
+            self._conn.executemany(
+                "UPDATE chunks SET content_hash = ? WHERE id = ?", [(content_hash(text), doc_id) for doc_id, text in rows]
+            )
+            if rows:
+                logger.info(f"Hashed {len(rows)} existing chunks")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_hash ON chunks(content_hash)")
+
+        has_refs = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chunk_refs'"
+        ).fetchone()
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunk_refs (
+                source TEXT NOT NULL,
+                chunk_id INTEGER NOT NULL,
+                metadata TEXT,
+                PRIMARY KEY (source, chunk_id)
+            )
+            """
+        )
+        ref_columns = {row[1] for row in self._conn.execute("PRAGMA table_info(chunk_refs)")}
+        if "metadata" not in ref_columns:
+            self._conn.execute("ALTER TABLE chunk_refs ADD COLUMN metadata TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_refs_chunk ON chunk_refs(chunk_id)")
+        if not has_refs:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO chunk_refs (source, chunk_id, metadata) "
+                "SELECT source, id, metadata FROM chunks WHERE source IS NOT NULL"
+            )
+
+    @staticmethod
+    def _batches(ids: List[int]) -> Iterable[List[int]]:
+        for start in range(0, len(ids), SQLITE_MAX_PARAMS):
+            yield ids[start:start + SQLITE_MAX_PARAMS]
+
+    def add(self, texts: List[str], metadatas: List[Dict[str, Any]], hashes: Optional[List[str]] = None) -> List[int]:
+        """Insert chunks (and their source refs) in one transaction and return their ids"""
+        hashes = hashes or [content_hash(text) for text in texts]
+        ids = []
+        with self._lock, self._conn:
+            for text, metadata, text_hash in zip(texts, metadatas, hashes):
+                metadata_json = json.dumps(metadata, default=str)
+                cursor = self._conn.execute(
+                    "INSERT INTO chunks (source, text, metadata, content_hash) VALUES (?, ?, ?, ?)",
+                    (metadata.get("source"), text, metadata_json, text_hash),
+                )
+                ids.append(cursor.lastrowid)
+                if metadata.get("source") is not None:
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO chunk_refs (source, chunk_id, metadata) VALUES (?, ?, ?)",
+                        (metadata["source"], cursor.lastrowid, metadata_json),
+                    )
+        return ids
+
+    def find_hashes(self, hashes: Iterable[str]) -> Dict[str, int]:
+        """Map each already-stored content hash to its chunk id"""
+        found = {}
+        with self._lock:
+            for batch in self._batches(list(set(hashes))):
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT content_hash, id FROM chunks WHERE content_hash IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def add_refs(self, source: str, refs: Dict[int, Dict[str, Any]]):
+        """Record that source also contains the (already stored) chunks in refs, with its own metadata for each"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO chunk_refs (source, chunk_id, metadata) VALUES (?, ?, ?)",
+                [(source, doc_id, json.dumps(metadata, default=str)) for doc_id, metadata in refs.items()]
+            )
+
+    def hashes_for_source(self, source: str) -> Dict[str, int]:
+        """Content hash -> chunk id for every chunk source refers to"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT c.content_hash, c.id FROM chunk_refs r JOIN chunks c ON c.id = r.chunk_id WHERE r.source = ?",
+                (source,),
+            ).fetchall()
+        return dict(rows)
+
+    def release(self, source: str, ids: Optional[List[int]] = None) -> List[int]:
+        """Drop source's refs (to ids, or all of them) and delete chunks nothing refers to any more.
+
+        Returns the ids of the deleted chunks.
+        """
+        with self._lock, self._conn:
+            if ids is None:
+                ids = [row[0] for row in self._conn.execute(
+                    "SELECT chunk_id FROM chunk_refs WHERE source = ?", (source,)
+                ).fetchall()]
+            orphans = []
+            for batch in self._batches(list(ids)):
+                placeholders = ",".join("?" * len(batch))
+                self._conn.execute(
+                    f"DELETE FROM chunk_refs WHERE source = ? AND chunk_id IN ({placeholders})", [source] + batch
+                )
+                orphans += [row[0] for row in self._conn.execute(
+                    f"SELECT id FROM chunks WHERE id IN ({placeholders}) "
+                    f"AND NOT EXISTS (SELECT 1 FROM chunk_refs r WHERE r.chunk_id = chunks.id)", batch
+                ).fetchall()]
+                self._reassign(source, batch)
+            for batch in self._batches(orphans):
+                placeholders = ",".join("?" * len(batch))
+                self._conn.execute(f"DELETE FROM chunks WHERE id IN ({placeholders})", batch)
+        return orphans
+
+    def _reassign(self, source: str, ids: List[int]):
+        """Point chunks whose metadata names source at a source that still refers to them (caller holds _lock)"""
+        placeholders = ",".join("?" * len(ids))
+        rows = self._conn.execute(
+            f"SELECT c.id, c.metadata, r.source, r.metadata FROM chunks c "
+            f"JOIN chunk_refs r ON r.rowid = (SELECT MIN(rowid) FROM chunk_refs WHERE chunk_id = c.id) "
+            f"WHERE c.id IN ({placeholders}) AND c.source = ?", list(ids) + [source]
+        ).fetchall()
+        updates = []
+        for doc_id, metadata, ref_source, ref_metadata in rows:
+            if ref_metadata is None:
+                # Refs recorded before they carried metadata: keep the rest, swap the source
+                ref_metadata = json.dumps({**json.loads(metadata), "source": ref_source}, default=str)
+            updates.append((ref_source, ref_metadata, doc_id))
+        self._conn.executemany("UPDATE chunks SET source = ?, metadata = ? WHERE id = ?", updates)
+
+    def get(self, ids: List[int]) -> Dict[int, Document]:
+        """Fetch documents by id; ids that no longer exist are left out"""
+        docs = {}
+        with self._lock:
+            for batch in self._batches(list(ids)):
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT id, text, metadata FROM chunks WHERE id IN ({placeholders})", batch
+                ).fetchall()
+                for doc_id, text, metadata in rows:
+                    docs[doc_id] = Document(page_content=text, metadata=json.loads(metadata))
+        return docs
+
+    def ids_for_source(self, source: str) -> List[int]:
+        """All chunk ids recorded for a source"""
+        with self._lock:
+            rows = self._conn.execute("SELECT chunk_id FROM chunk_refs WHERE source = ?", (source,)).fetchall()
+        return [row[0] for row in rows]
+
+    def delete(self, ids: List[int]):
+        """Delete chunks (and any refs to them) by id"""
+        with self._lock, self._conn:
+            for batch in self._batches(list(ids)):
+                placeholders = ",".join("?" * len(batch))
+                self._conn.execute(f"DELETE FROM chunks WHERE id IN ({placeholders})", batch)
+                self._conn.execute(f"DELETE FROM chunk_refs WHERE chunk_id IN ({placeholders})", batch)
+
+    def sources(self) -> List[str]:
+        """Distinct sources, served from the refs' primary key"""
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT source FROM chunk_refs").fetchall()
+        return [row[0] for row in rows]
+
+    def ids_up_to(self, max_id: int) -> List[int]:
+        """All chunk ids <= max_id, in id order"""
+        with self._lock:
+            rows = self._conn.execute("SELECT id FROM chunks WHERE id <= ? ORDER BY id", (max_id,)).fetchall()
+        return [row[0] for row in rows]
+
+    def iter_texts(self, after_id: int = 0, batch_size: int = 1000) -> Iterable[List[Tuple[int, str]]]:
+        """Yield batches of (id, text) for chunks with id > after_id, in id order"""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, text FROM chunks WHERE id > ? ORDER BY id LIMIT ?", (after_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            yield rows
+            after_id = rows[-1][0]
+
+    def max_id(self) -> int:
+        """Largest chunk id currently stored (0 when empty)"""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM chunks").fetchone()[0]
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM chunks LIMIT 1").fetchone() is None
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def clear(self):
+        """Remove every chunk"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.execute("DELETE FROM chunk_refs")
@@ -0,0 +1,95 @@
+"""
+Embedding Backends - PyTorch, ONNX Runtime and int8-Quantized Encoders
+All backends load the same sentence-transformers model; faster ones are checked against torch
+"""
+
+import logging
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "int8")
+
+# A faster backend is only used if its embeddings stay this close (1 - cosine) to torch's
+DEFAULT_COSINE_TOLERANCE = 0.02
+
+# Probe sentences for the tolerance check - a mix of prose, identifiers and short queries
+GUARD_SENTENCES = [
+    "What does the warranty cover for water damage?",
+    "Error 0x80070005 appears when installing the update.",
+    "The XR-200 pump must be primed before first use.",
+    "Shiva is often depicted with a third eye on his forehead.",
+    "Quarterly revenue grew by twelve percent compared to last year.",
+    "hello",
+    "How do I reset my password if I no longer have access to my email account?",
+    "Tighten the bolts to 35 Nm in a star pattern.",
+]
+
+
+def load_model(model_name: str, backend: str = "torch", threads: Optional[int] = None):
+    """Load model_name as a SentenceTransformer running on the given CPU backend."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "onnx":
+        # Needs sentence-transformers >= 3.2 with optimum[onnxruntime]; exports on first load
+        model_kwargs = {"provider": "CPUExecutionProvider"}
+        if threads:
+            import onnxruntime
+            session_options = onnxruntime.SessionOptions()
+            session_options.intra_op_num_threads = threads
+            model_kwargs["session_options"] = session_options
+        return SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+
+    import torch
+    if threads:
+        torch.set_num_threads(threads)
+
+    model = SentenceTransformer(model_name, device="cpu")
+    if backend == "int8":
+        # Dynamic quantization: Linear weights stored as int8, activations quantized per batch
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def encode(model, texts: List[str], batch_size: int) -> np.ndarray:
+    return np.asarray(model.encode(texts, batch_size=batch_size, normalize_embeddings=True), dtype=np.float32)
+
+
+def cosine_agreement(model, reference, texts: List[str] = GUARD_SENTENCES, batch_size: int = 32) -> float:
+    """Smallest cosine similarity between the two models' embeddings of texts."""
+    vectors = encode(model, texts, batch_size)
+    reference_vectors = encode(reference, texts, batch_size)
+    return float(np.min(np.sum(vectors * reference_vectors, axis=1)))
+
+
+def load_checked_model(model_name: str, backend: str = "torch", threads: Optional[int] = None,
+                       tolerance: float = DEFAULT_COSINE_TOLERANCE):
+    """
+    Load a backend and verify it against the torch reference.
+    Returns (model, backend actually used); falls back to torch if the check
+    fails or the backend can't be loaded.
+    """
+    if backend == "torch":
+        return load_model(model_name, "torch", threads), "torch"
+
+    try:
+        model = load_model(model_name, backend, threads)
+        reference = load_model(model_name, "torch", threads)
+        agreement = cosine_agreement(model, reference)
+        del reference
+    except Exception as e:
+        logger.error(f"Could not load {backend} embedding backend, using torch: {str(e)}")
+        return load_model(model_name, "torch", threads), "torch"
+
+    if agreement < 1 - tolerance:
+        logger.warning(f"{backend} embeddings drift from torch (min cosine {agreement:.4f} < "
+                       f"{1 - tolerance:.4f}), using torch")
+        return load_model(model_name, "torch", threads), "torch"
+
+    logger.info(f"Using {backend} embedding backend (min cosine vs torch {agreement:.4f})")
+    return model, backend
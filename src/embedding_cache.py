@@ -0,0 +1,198 @@
+"""
+Persistent Embedding Cache - Content-Addressed & Memory-Mapped
+Avoids re-encoding text the embedding model has already seen
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Any
+
+import numpy as np
+
+from store_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LRU_SIZE = 10000  # Vectors kept in the in-memory tier
+KEY_SIZE = 16  # Bytes per blake2b digest in keys.bin
+LOCK_FILE = ".lock"
+
+
+class EmbeddingCache:
+    """
+    Disk-backed embedding cache keyed by (model name, normalized text hash)
+
+    Vectors live in an append-only float32 matrix (vectors.f32) that is read
+    through a memory map; keys.bin holds the matching 16-byte digests in row
+    order. Recently used vectors are also kept in an in-memory LRU tier.
+
+    Every process sharing the directory appends under an exclusive file
+    lock, after reading the keys the others appended, so a row number is
+    always the file's own row count rather than a per-process guess.
+    """
+
+    def __init__(self, cache_dir: str, namespace: str, lru_size: int = DEFAULT_LRU_SIZE):
+        """Open (or create) the cache for one embedding model"""
+        self.namespace = namespace
+        self.cache_dir = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", namespace))
+        self.lru_size = lru_size
+
+        self._keys_file = os.path.join(self.cache_dir, "keys.bin")
+        self._vectors_file = os.path.join(self.cache_dir, "vectors.f32")
+        self._meta_file = os.path.join(self.cache_dir, "meta.json")
+        self._file_lock = FileLock(os.path.join(self.cache_dir, LOCK_FILE))
+
+        self._rows: Dict[bytes, int] = {}  # digest -> row in vectors.f32
+        self._synced = 0  # Rows of keys.bin already read into _rows
+        self._dim: Optional[int] = None
+        self._matrix = None  # Memory map over vectors.f32, remapped as the file grows
+        self._lru: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        self._load()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Collapse whitespace so trivially reformatted text shares an entry"""
+        return " ".join(text.split())
+
+    def key(self, text: str) -> bytes:
+        """Content address for a text under this cache's model"""
+        payload = f"{self.namespace}\0{self.normalize(text)}".encode("utf-8")
+        return hashlib.blake2b(payload, digest_size=KEY_SIZE).digest()
+
+    def _load(self):
+        """Read the key index; vectors stay on disk until they are requested"""
+        try:
+            if self._load_dim() is None:
+                return
+            self._sync()
+            logger.info(f"Embedding cache loaded with {len(self._rows)} vectors from {self.cache_dir}")
+        except Exception as e:
+            logger.error(f"Failed to load embedding cache, starting empty: {str(e)}")
+            self._rows = {}
+            self._synced = 0
+
+    def _load_dim(self) -> Optional[int]:
+        if self._dim is None and os.path.exists(self._meta_file):
+            with open(self._meta_file, "r", encoding="utf-8") as f:
+                self._dim = json.load(f)["dim"]
+        return self._dim
+
+    def _complete_rows(self) -> int:
+        """Rows with both a key and a vector on disk"""
+        if not os.path.exists(self._keys_file) or not os.path.exists(self._vectors_file):
+            return 0
+        return min(os.path.getsize(self._keys_file) // KEY_SIZE,
+                   os.path.getsize(self._vectors_file) // (self._dim * 4))
+
+    def _sync(self) -> int:
+        """Index keys appended since the last sync (by any process); returns the complete row count"""
+        count = self._complete_rows()
+        if count > self._synced:
+            with open(self._keys_file, "rb") as f:
+                f.seek(self._synced * KEY_SIZE)
+                keys = f.read((count - self._synced) * KEY_SIZE)
+            for i in range(count - self._synced):
+                self._rows.setdefault(keys[i * KEY_SIZE:(i + 1) * KEY_SIZE], self._synced + i)
+            self._synced = count
+        return count
+
+    def _read_row(self, row: int) -> np.ndarray:
+        if self._matrix is None or row >= self._matrix.shape[0]:
+            # Sized from the file itself, never from this process's key count
+            rows = os.path.getsize(self._vectors_file) // (self._dim * 4)
+            self._matrix = np.memmap(self._vectors_file, dtype=np.float32, mode="r", shape=(rows, self._dim))
+        return np.array(self._matrix[row])
+
+    def _remember(self, key: bytes, vector: np.ndarray):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def get_many(self, texts: List[str]) -> Tuple[List[Optional[np.ndarray]], List[bytes]]:
+        """Look up texts; returns (vectors with None for misses, keys)"""
+        keys = [self.key(text) for text in texts]
+        vectors: List[Optional[np.ndarray]] = []
+
+        with self._lock:
+            for key in keys:
+                vector = self._lru.get(key)
+                if vector is None and key in self._rows:
+                    vector = self._read_row(self._rows[key])
+
+                if vector is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    self._remember(key, vector)
+                vectors.append(vector)
+
+        return vectors, keys
+
+    def put_many(self, keys: List[bytes], vectors: np.ndarray, persist: bool = True):
+        """Append newly encoded vectors to the cache (to the in-memory tier only unless persist)"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(keys):
+            return
+
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector)
+            if not persist:
+                return
+
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with self._file_lock.exclusive():
+                    if self._load_dim() is None:
+                        self._dim = int(vectors.shape[1])
+                        tmp_file = self._meta_file + ".tmp"
+                        with open(tmp_file, "w", encoding="utf-8") as f:
+                            json.dump({"namespace": self.namespace, "dim": self._dim}, f)
+                        os.replace(tmp_file, self._meta_file)
+
+                    # Pick up other processes' rows, then append after the last complete one
+                    count = self._sync()
+                    new_rows = {}
+                    for key, vector in zip(keys, vectors):
+                        if key not in self._rows and key not in new_rows:
+                            new_rows[key] = vector
+                    if not new_rows:
+                        return
+
+                    # Vectors first, keys last - a key on disk always has its vector. Partial
+                    # rows left by a crash are cut off first so the two files stay aligned
+                    for file_path, row_size in ((self._vectors_file, self._dim * 4), (self._keys_file, KEY_SIZE)):
+                        with open(file_path, "ab") as f:
+                            f.truncate(count * row_size)
+                    with open(self._vectors_file, "ab") as f:
+                        f.write(np.stack(list(new_rows.values())).tobytes())
+                    with open(self._keys_file, "ab") as f:
+                        f.write(b"".join(new_rows))
+
+                    for row, key in enumerate(new_rows, start=count):
+                        self._rows[key] = row
+                    self._synced = count + len(new_rows)
+            except Exception as e:
+                logger.error(f"Failed to write embedding cache: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters since startup"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "entries": len(self._rows),
+            "memory_entries": len(self._lru),
+        }
@@ -1,8 +1,24 @@
 import os
 import re
+import json
+import asyncio
+import time
+import random
+import logging
+import threading
 import requests
+from collections import deque
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
+try:
+    import httpx
+except ImportError:  # Optional - only the async methods (agenerate, agenerate_stream) need it
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -13,12 +29,214 @@ QWEN_MODEL = "qwen/qwen3-32b"  # Updated to available Qwen model
 DEFAULT_MAX_TOKENS = 1024  # Hardcoded default
 DEFAULT_TEMPERATURE = 0.1  # Hardcoded default
 
+# HTTP client defaults - one keep-alive pool per GroqLLM instance
+DEFAULT_POOL_SIZE = 10  # Max pooled connections to the API host
+DEFAULT_CONNECT_TIMEOUT = 5.0  # Seconds to establish a connection
+DEFAULT_READ_TIMEOUT = 60.0  # Seconds to wait between bytes from the API
+DEFAULT_MAX_RETRIES = 3  # Retries after the first attempt
+BACKOFF_BASE = 0.5  # Seconds; doubled per retry, with full jitter
+BACKOFF_MAX = 20.0  # Cap on computed backoff
+RETRY_AFTER_MAX = 60.0  # Cap on server-requested Retry-After waits
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+LATENCY_WINDOW = 1000  # Recent calls kept for latency percentiles
+DEFAULT_ASYNC_POOL_SIZE = 256  # Max connections of the async client - one per in-flight question
+
+class ThinkTagFilter:
+    """
+    Incrementally removes <think>...</think> blocks from streamed text.
+    Tags may be split across chunks, so any tail that could be the start of
+    a tag is held back until the next chunk decides it.
+    """
+    OPEN_TAG = "<think>"
+    CLOSE_TAG = "</think>"
+
+    def __init__(self):
+        self._buffer = ""
+        self._inside = False
+
+    @staticmethod
+    def _partial_tag_length(text, tag):
+        """Length of the longest suffix of text that is a proper prefix of tag."""
+        for length in range(min(len(tag) - 1, len(text)), 0, -1):
+            if text.endswith(tag[:length]):
+                return length
+        return 0
+
+    def feed(self, text):
+        """Add a chunk and return the text that is now known to be visible."""
+        self._buffer += text
+        visible = []
+        
+        while True:
+            if self._inside:
+                end = self._buffer.find(self.CLOSE_TAG)
+                if end == -1:
+                    # Thinking text is dropped; only keep what may begin the close tag
+                    keep = self._partial_tag_length(self._buffer, self.CLOSE_TAG)
+                    self._buffer = self._buffer[len(self._buffer) - keep:]
+                    break
+                self._buffer = self._buffer[end + len(self.CLOSE_TAG):]
+                self._inside = False
+            else:
+                start = self._buffer.find(self.OPEN_TAG)
+                if start == -1:
+                    keep = self._partial_tag_length(self._buffer, self.OPEN_TAG)
+                    visible.append(self._buffer[:len(self._buffer) - keep])
+                    self._buffer = self._buffer[len(self._buffer) - keep:]
+                    break
+                visible.append(self._buffer[:start])
+                self._buffer = self._buffer[start + len(self.OPEN_TAG):]
+                self._inside = True
+        
+        return "".join(visible)
+
+    def flush(self):
+        """Return any held-back visible text at the end of the stream."""
+        remaining = "" if self._inside else self._buffer
+        self._buffer = ""
+        return remaining
+
+class CompletionStream:
+    """
+    Turns the server-sent event lines of a streamed completion into visible
+    text: <think> blocks removed, leading whitespace trimmed. Shared by the
+    sync and async clients.
+    """
+
+    def __init__(self):
+        self._filter = ThinkTagFilter()
+        self._started = False
+        self.done = False
+
+    def feed_line(self, line):
+        """Visible text carried by one line ("data: {...}"); sets done on "data: [DONE]"."""
+        if not line or not line.startswith("data:"):
+            return ""
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            self.done = True
+            return ""
+        
+        delta = json.loads(data)["choices"][0].get("delta", {}).get("content") or ""
+        return self._visible(self._filter.feed(delta))
+
+    def flush(self):
+        return self._visible(self._filter.flush())
+
+    def _visible(self, text):
+        if not self._started:
+            text = text.lstrip()
+            self._started = bool(text)
+        return text
+
+class LLMMetrics:
+    """Thread-safe per-call latency and retry counters."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+
+    def record_call(self, latency, success):
+        with self._lock:
+            self.calls += 1
+            if success:
+                self._latencies.append(latency)
+            else:
+                self.failures += 1
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            calls, failures, retries = self.calls, self.failures, self.retries
+        
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(int(p * len(latencies)), len(latencies) - 1)], 3)
+        
+        return {
+            "calls": calls,
+            "failures": failures,
+            "retries": retries,
+            "latency_p50": percentile(0.50),
+            "latency_p95": percentile(0.95),
+            "latency_p99": percentile(0.99),
+        }
+
 class GroqLLM:
-    def __init__(self, api_key: str = None, model: str = None):
+    def __init__(self, api_key: str = None, model: str = None, api_url: str = None,
+                 pool_size: int = DEFAULT_POOL_SIZE, connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT, max_retries: int = DEFAULT_MAX_RETRIES,
+                 async_pool_size: int = DEFAULT_ASYNC_POOL_SIZE):
         self.api_key = api_key or GROQ_API_KEY
         self.model = model or QWEN_MODEL
+        self.api_url = api_url or GROQ_API_URL  # Override to point at a local stub server
+        
+        # Persistent session so connections (and TLS handshakes) are reused across questions
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.metrics = LLMMetrics()
+        
+        # httpx client for the async methods, created inside the event loop on first use
+        self.async_pool_size = async_pool_size
+        self._async_client = None
 
-    def generate(self, prompt: str, max_tokens: int = None, temperature: float = None):
+    @staticmethod
+    def _retry_after_seconds(value):
+        """Parse a Retry-After header (delta-seconds or HTTP date)."""
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+    def _backoff_delay(self, attempt, retry_after=None):
+        """Honour Retry-After when given, else exponential backoff with full jitter."""
+        requested = self._retry_after_seconds(retry_after)
+        if requested is not None:
+            return min(requested, RETRY_AFTER_MAX)
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+    def _post(self, headers, payload, stream=False):
+        """POST to the API, retrying connection errors, timeouts, 429 and 5xx responses."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(
+                    self.api_url, headers=headers, json=payload, timeout=self.timeout, stream=stream
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff_delay(attempt)
+                logger.warning(f"LLM request failed ({type(e).__name__}), retrying in {delay:.2f}s")
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    return response
+                delay = self._backoff_delay(attempt, response.headers.get("Retry-After"))
+                logger.warning(f"LLM request returned {response.status_code}, retrying in {delay:.2f}s")
+                response.close()
+            
+            self.metrics.record_retry()
+            time.sleep(delay)
+
+    def _build_request(self, prompt, max_tokens, temperature, stream=False):
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
@@ -31,9 +249,22 @@ class GroqLLM:
             "max_tokens": max_tokens or DEFAULT_MAX_TOKENS,
             "temperature": temperature or DEFAULT_TEMPERATURE
         }
-        response = requests.post(GROQ_API_URL, headers=headers, json=payload)
-        response.raise_for_status()
-        data = response.json()
+        if stream:
+            payload["stream"] = True
+        return headers, payload
+
+    def generate(self, prompt: str, max_tokens: int = None, temperature: float = None):
+        headers, payload = self._build_request(prompt, max_tokens, temperature)
+        started_at = time.monotonic()
+        success = False
+        try:
+            response = self._post(headers, payload)
+            response.raise_for_status()
+            data = response.json()
+            success = True
+        finally:
+            self.metrics.record_call(time.monotonic() - started_at, success)
+        
         content = data["choices"][0]["message"]["content"]
         
         # Remove thinking tags from reasoning models
@@ -41,6 +272,126 @@ class GroqLLM:
         
         return content
     
+    def generate_stream(self, prompt: str, max_tokens: int = None, temperature: float = None):
+        """
+        Yield the completion as text deltas (OpenAI-compatible "stream": true).
+        <think> blocks are removed on the fly and leading whitespace is trimmed,
+        matching what generate() returns once all deltas are joined.
+        """
+        headers, payload = self._build_request(prompt, max_tokens, temperature, stream=True)
+        started_at = time.monotonic()
+        success = False
+        
+        try:
+            yield from self._stream_response(headers, payload)
+            success = True
+        finally:
+            self.metrics.record_call(time.monotonic() - started_at, success)
+    
+    def _stream_response(self, headers, payload):
+        stream = CompletionStream()
+        with self._post(headers, payload, stream=True) as response:
+            response.raise_for_status()
+            
+            # Server-sent events: "data: {...}" lines, terminated by "data: [DONE]"
+            for line in response.iter_lines(decode_unicode=True):
+                text = stream.feed_line(line)
+                if text:
+                    yield text
+                if stream.done:
+                    break
+            
+            tail = stream.flush()
+            if tail:
+                yield tail
+    
+    # Async client - same retries, metrics and output as the sync methods, without holding a thread
+    
+    def _get_async_client(self):
+        if httpx is None:
+            raise RuntimeError("The async GroqLLM methods need httpx (pip install httpx)")
+        if self._async_client is None:
+            connect_timeout, read_timeout = self.timeout
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                limits=httpx.Limits(max_connections=self.async_pool_size,
+                                    max_keepalive_connections=self.async_pool_size)
+            )
+        return self._async_client
+    
+    async def _apost(self, headers, payload, stream=False):
+        """Async _post: the response is left open when stream=True (caller closes it)."""
+        client = self._get_async_client()
+        for attempt in range(self.max_retries + 1):
+            try:
+                request = client.build_request("POST", self.api_url, headers=headers, json=payload)
+                response = await client.send(request, stream=stream)
+            except httpx.TransportError as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff_delay(attempt)
+                logger.warning(f"LLM request failed ({type(e).__name__}), retrying in {delay:.2f}s")
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    return response
+                delay = self._backoff_delay(attempt, response.headers.get("Retry-After"))
+                logger.warning(f"LLM request returned {response.status_code}, retrying in {delay:.2f}s")
+                await response.aclose()
+            
+            self.metrics.record_retry()
+            await asyncio.sleep(delay)
+    
+    async def agenerate(self, prompt: str, max_tokens: int = None, temperature: float = None):
+        """Async generate(): awaits the completion instead of blocking a thread on it."""
+        headers, payload = self._build_request(prompt, max_tokens, temperature)
+        started_at = time.monotonic()
+        success = False
+        try:
+            response = await self._apost(headers, payload)
+            response.raise_for_status()
+            data = response.json()
+            success = True
+        finally:
+            self.metrics.record_call(time.monotonic() - started_at, success)
+        
+        return self._remove_thinking_tags(data["choices"][0]["message"]["content"])
+    
+    async def agenerate_stream(self, prompt: str, max_tokens: int = None, temperature: float = None):
+        """Async generate_stream(): an async iterator of visible text deltas."""
+        headers, payload = self._build_request(prompt, max_tokens, temperature, stream=True)
+        started_at = time.monotonic()
+        success = False
+        
+        try:
+            stream = CompletionStream()
+            response = await self._apost(headers, payload, stream=True)
+            try:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    text = stream.feed_line(line)
+                    if text:
+                        yield text
+                    if stream.done:
+                        break
+                tail = stream.flush()
+                if tail:
+                    yield tail
+            finally:
+                await response.aclose()
+            success = True
+        finally:
+            self.metrics.record_call(time.monotonic() - started_at, success)
+    
+    async def aclose(self):
+        """Close the async client's connections (call from the event loop that used it)."""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+    
+    def get_metrics(self):
+        """Return call, retry and latency statistics."""
+        return self.metrics.snapshot()
+    
     def _remove_thinking_tags(self, content):
         """
         Remove <think>...</think> tags and their content from the response.
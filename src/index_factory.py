@@ -0,0 +1,153 @@
+"""
+FAISS Index Factory - Exact and Approximate Index Modes
+Builds, trains and tunes the index types VectorStore can use for its base index
+"""
+
+import math
+from typing import Optional
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq", "sq8", "sq4", "binary")
+
+# Compact codes for low-memory deployments (384 dims): sq8 = 384 bytes/vector (4x smaller),
+# sq4 = 192 bytes (8x), binary = 48 bytes of sign bits (32x). Their candidates - and
+# IVF-PQ's - are rescored against the full-precision vectors on disk
+RESCORED_TYPES = ("ivf_pq", "sq8", "sq4", "binary")
+RESCORE_FACTOR = 4  # Candidates fetched per result before rescoring
+
+# IVF indexes are only trained once the corpus is big enough for k-means to be meaningful;
+# below this the base index stays exact (flat)
+IVF_TRAIN_THRESHOLD = 10000
+IVF_MIN_NLIST = 16
+IVF_MAX_NLIST = 65536
+
+HNSW_M = 32  # Graph neighbours per node
+HNSW_EF_CONSTRUCTION = 80
+PQ_M = 16  # Sub-quantizers (384 dims -> 24 dims each)
+PQ_NBITS = 8
+
+# Per-query defaults, overridable on every search
+DEFAULT_NPROBE = 16
+DEFAULT_EF_SEARCH = 64
+
+
+def effective_index_type(index_type: str, count: int) -> str:
+    """Index type to actually build for a corpus of count vectors"""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+    if index_type.startswith("ivf") and count < IVF_TRAIN_THRESHOLD:
+        return "flat"
+    return index_type
+
+
+def supports_incremental(index_type: str) -> bool:
+    """Whether a compaction can update the index in place (remove_ids + add)"""
+    # HNSW graphs can't delete vectors, so they are rebuilt from the float vectors
+    return index_type != "hnsw"
+
+
+def is_binary(index_type: str) -> bool:
+    return index_type == "binary"
+
+
+def needs_rescoring(index_type: str) -> bool:
+    """Whether the index's distances are approximate enough to rescore with float vectors"""
+    return index_type in RESCORED_TYPES
+
+
+def binary_codes(vectors: np.ndarray) -> np.ndarray:
+    """Sign-binarize vectors into packed bits (dim / 8 bytes each)"""
+    return np.packbits(np.asarray(vectors) > 0, axis=1)
+
+
+def default_nlist(count: int) -> int:
+    return int(min(max(4 * math.sqrt(max(count, 1)), IVF_MIN_NLIST), IVF_MAX_NLIST))
+
+
+def new_index(index_type: str, dim: int, nlist: Optional[int] = None):
+    """Create an empty (untrained) index whose ids are docstore row ids"""
+    if index_type == "flat":
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+    if index_type == "hnsw":
+        hnsw = faiss.IndexHNSWFlat(dim, HNSW_M)
+        hnsw.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        return faiss.IndexIDMap2(hnsw)
+    if index_type == "sq8":
+        return faiss.IndexIDMap2(faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2))
+    if index_type == "sq4":
+        return faiss.IndexIDMap2(faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_4bit, faiss.METRIC_L2))
+    if index_type == "binary":
+        # Hamming distance over sign bits
+        return faiss.IndexBinaryIDMap2(faiss.IndexBinaryFlat(dim))
+
+    # IVF indexes keep their own ids, so they need no IDMap wrapper
+    quantizer = faiss.IndexFlatL2(dim)
+    nlist = nlist or IVF_MIN_NLIST
+    if index_type == "ivf_flat":
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_L2)
+    else:
+        pq_m = next(m for m in (PQ_M, 8, 4, 2, 1) if dim % m == 0)
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, PQ_NBITS)
+    return index
+
+
+def build_index(index_type: str, vectors: np.ndarray, ids: np.ndarray):
+    """Build (and train, for IVF) an index over vectors with the given ids"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    ids = np.asarray(ids, dtype=np.int64)
+    index_type = effective_index_type(index_type, len(ids))
+
+    index = new_index(index_type, vectors.shape[1], default_nlist(len(ids)))
+    if not index.is_trained:
+        index.train(vectors)
+    if len(ids):
+        add_vectors(index, index_type, vectors, ids)
+    return index, index_type
+
+
+def add_vectors(index, index_type: str, vectors: np.ndarray, ids: np.ndarray):
+    """Add float vectors to an index, encoding them first for binary indexes"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index.add_with_ids(binary_codes(vectors) if is_binary(index_type) else vectors, np.asarray(ids, dtype=np.int64))
+
+
+def search_index(index, index_type: str, queries: np.ndarray, k: int, params=None):
+    """Search with float queries whatever the index type; returns (distances, ids)"""
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    if is_binary(index_type):
+        return index.search(binary_codes(queries), k)
+    if params is not None:
+        return index.search(queries, k, params=params)
+    return index.search(queries, k)
+
+
+def read_index(path: str, index_type: str, mmap: bool = False):
+    """Read an index file; mmap maps it read-only where the faiss build supports that"""
+    reader = faiss.read_index_binary if is_binary(index_type) else faiss.read_index
+    if mmap:
+        # IO_FLAG_MMAP_IFC extends mmap to flat indexes on faiss builds that have it
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+        try:
+            return reader(path, flags)
+        except RuntimeError:
+            # Older faiss builds can't map every index type - fall back to a regular read
+            pass
+    return reader(path)
+
+
+def write_index(index, path: str):
+    if isinstance(index, faiss.IndexBinary):
+        faiss.write_index_binary(index, path)
+    else:
+        faiss.write_index(index, path)
+
+
+def search_parameters(index_type: str, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """Per-query search knobs for the given index type (None for exact search)"""
+    if index_type == "hnsw":
+        return faiss.SearchParametersHNSW(efSearch=ef_search or DEFAULT_EF_SEARCH)
+    if index_type.startswith("ivf"):
+        return faiss.SearchParametersIVF(nprobe=nprobe or DEFAULT_NPROBE)
+    return None
@@ -0,0 +1,136 @@
+"""
+Background Ingestion Jobs - Bounded Worker Pool with Progress Tracking
+Uploads return a job id immediately; ingests run off the request thread
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INGEST_WORKERS = 2
+MAX_TRACKED_JOBS = 200  # Finished jobs beyond this are forgotten, oldest first
+
+
+class IngestJob:
+    """Status and progress of one ingest"""
+
+    def __init__(self, kind: str, target: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.target = target
+        self.status = "queued"
+        self.pages_parsed = 0
+        self.total_pages: Optional[int] = None
+        self.chunks_embedded = 0
+        self.result: Optional[Any] = None  # Output of jobs that aren't ingests (bulk question answers)
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def update(self, **progress):
+        """Progress callback handed to RagEngine ingest methods"""
+        for key, value in progress.items():
+            setattr(self, key, value)
+
+    def eta_seconds(self) -> Optional[float]:
+        """Estimate time left from the page rate so far (needs a known page count)"""
+        if self.status != "running" or not self.total_pages or not self.pages_parsed:
+            return None
+        elapsed = time.time() - self.started_at
+        remaining_pages = max(self.total_pages - self.pages_parsed, 0)
+        return round(elapsed / self.pages_parsed * remaining_pages, 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "target": self.target,
+            "status": self.status,
+            "pages_parsed": self.pages_parsed,
+            "total_pages": self.total_pages,
+            "chunks_embedded": self.chunks_embedded,
+            "eta_seconds": self.eta_seconds(),
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestJobQueue:
+    """
+    Runs ingests on a bounded thread pool and keeps their status for polling
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_INGEST_WORKERS, max_tracked: int = MAX_TRACKED_JOBS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_tracked = max_tracked
+        logger.info(f"Ingest job queue started with {max_workers} workers")
+
+    def submit(self, kind: str, target: str, ingest_fn: Callable[..., int],
+               on_done: Optional[Callable[[IngestJob], None]] = None) -> IngestJob:
+        """Queue ingest_fn(target, progress=...) and return its job immediately"""
+        job = IngestJob(kind, target)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim()
+
+        self._executor.submit(self._run, job, ingest_fn, on_done)
+        logger.info(f"Queued {kind} ingest job {job.id} for {target}")
+        return job
+
+    def _run(self, job: IngestJob, ingest_fn: Callable[..., int], on_done):
+        job.update(status="running", started_at=time.time())
+        try:
+            chunk_count = ingest_fn(job.target, progress=job.update)
+            job.update(status="done", chunks_embedded=chunk_count)
+            logger.info(f"Ingest job {job.id} finished: {chunk_count} chunks from {job.target}")
+        except Exception as e:
+            job.update(status="failed", error=str(e))
+            logger.error(f"Ingest job {job.id} failed for {job.target}: {str(e)}", exc_info=True)
+        finally:
+            job.finished_at = time.time()
+
+        if on_done:
+            try:
+                on_done(job)
+            except Exception as e:
+                logger.error(f"Ingest job {job.id} completion hook failed: {str(e)}")
+
+    def _trim(self):
+        """Drop the oldest finished jobs once too many are tracked"""
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.max_tracked:
+                break
+            if not self._jobs[job_id].active:
+                del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[IngestJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def find_active(self, target: str) -> Optional[IngestJob]:
+        """Return a queued or running job for target, if any"""
+        with self._lock:
+            for job in self._jobs.values():
+                if job.target == target and job.active:
+                    return job
+        return None
@@ -1,98 +1,84 @@
 """
 Simple LangChain Chat History - Lightweight & Efficient
-Minimal LangChain memory implementation for conversational context
+Fixed-size exchange ring buffer with an incrementally maintained conversation context
 """
 
 import logging
-from typing import List, Dict, Any
+import time
+from collections import deque
 from datetime import datetime
-
-from langchain.memory import ConversationBufferWindowMemory
-from langchain_core.messages import HumanMessage, AIMessage
-from langchain_core.chat_history import InMemoryChatMessageHistory
+from itertools import islice
+from typing import List, Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
+CONTEXT_ANSWER_CHARS = 150  # Answers are cut to this length in the prompt context
+DEFAULT_CONTEXT_EXCHANGES = 3  # Exchanges in the context RagEngine asks for on every question
+
+
+class _Exchange:
+    """One Q&A turn; slotted so a full buffer costs a few small objects"""
+
+    __slots__ = ("question", "answer", "sources", "timestamp", "context")
+
+    def __init__(self, question: str, answer: str, sources: List[str], timestamp: float):
+        self.question = question
+        self.answer = answer
+        self.sources = sources
+        self.timestamp = timestamp
+        # Rendered once, with the answer truncated, for get_conversation_context
+        short = answer[:CONTEXT_ANSWER_CHARS] + "..." if len(answer) > CONTEXT_ANSWER_CHARS else answer
+        self.context = f"Q: {question}\nA: {short}"
+
+
 class SimpleLangChainHistory:
     """
-    Lightweight LangChain chat history for conversational RAG
+    Lightweight chat history for conversational RAG
     Simple, efficient, and minimal - just what you need
     """
     
     def __init__(self, max_history: int = 10):
-        """Initialize with LangChain memory components"""
+        """Initialize an empty ring buffer of max_history exchanges"""
         self.max_history = max_history
-        
-        # Use LangChain's in-memory chat history
-        self.chat_memory = InMemoryChatMessageHistory()
-        
-        # Window memory keeps only recent exchanges
-        self.memory = ConversationBufferWindowMemory(
-            chat_memory=self.chat_memory,
-            k=max_history,
-            return_messages=True,
-            memory_key="history"
-        )
-        
-        self.sources_tracking = {}  # Track sources per exchange
-        logger.info(f"LangChain chat history initialized (max: {max_history})")
+        self._exchanges = deque(maxlen=max_history)  # Oldest exchanges fall off the front
+        self._total = 0
+        self._context = None  # Cached context for DEFAULT_CONTEXT_EXCHANGES, rebuilt on add
+        logger.debug(f"Chat history initialized (max: {max_history})")
     
-    def add_exchange(self, question: str, answer: str, sources: List[str] = None):
-        """Add Q&A exchange - LangChain handles the memory management"""
-        # Store in LangChain memory
-        self.memory.save_context(
-            {"input": question},
-            {"output": answer}
-        )
-        
-        # Track sources separately (simple approach)
-        exchange_id = len(self.chat_memory.messages) // 2
-        if sources:
-            self.sources_tracking[exchange_id] = sources
-        
-        logger.debug(f"Added exchange {exchange_id}")
+    def add_exchange(self, question: str, answer: str, sources: List[str] = None, timestamp: Optional[float] = None):
+        """Add a Q&A exchange; the oldest one is evicted once the buffer is full"""
+        self._exchanges.append(_Exchange(question, answer, list(sources or []), timestamp or time.time()))
+        self._total += 1
+        self._context = self._render(DEFAULT_CONTEXT_EXCHANGES)
+        logger.debug(f"Added exchange {self._total}")
     
-    def get_conversation_context(self, include_last_n: int = 3) -> str:
-        """Get conversation context - LangChain formats it nicely"""
-        # Load memory variables
-        memory_vars = self.memory.load_memory_variables({})
-        messages = memory_vars.get("history", [])
-        
-        if not messages:
-            return ""
-        
-        # Take recent exchanges
-        recent = messages[-(include_last_n * 2):] if include_last_n else messages
-        
-        if len(recent) < 2:
+    def _recent(self, limit: int) -> List[_Exchange]:
+        """The last limit exchanges, oldest first, without walking the rest"""
+        if not limit or limit >= len(self._exchanges):
+            return list(self._exchanges)
+        recent = list(islice(reversed(self._exchanges), limit))
+        recent.reverse()
+        return recent
+    
+    def _render(self, include_last_n: int) -> str:
+        recent = self._recent(include_last_n)
+        if not recent:
             return ""
-        
-        context = ["Previous conversation:"]
-        
-        # Process in pairs (Human, AI)
-        for i in range(0, len(recent), 2):
-            if i + 1 < len(recent):
-                q = recent[i].content
-                a = recent[i + 1].content
-                
-                # Keep answers short for context
-                a_short = a[:150] + "..." if len(a) > 150 else a
-                context.append(f"Q: {q}")
-                context.append(f"A: {a_short}")
-        
-        return "\n".join(context) + "\n---"
+        return "\n".join(["Previous conversation:"] + [exchange.context for exchange in recent]) + "\n---"
+    
+    def get_conversation_context(self, include_last_n: int = DEFAULT_CONTEXT_EXCHANGES) -> str:
+        """Get conversation context - prebuilt for the default size, so it costs the same at any history length"""
+        if include_last_n == DEFAULT_CONTEXT_EXCHANGES and self._context is not None:
+            return self._context
+        return self._render(include_last_n)
     
     def get_recent_questions(self, limit: int = 3) -> List[str]:
         """Get recent questions"""
-        memory_vars = self.memory.load_memory_variables({})
-        messages = memory_vars.get("history", [])
-        
-        questions = [msg.content for msg in messages if isinstance(msg, HumanMessage)]
-        return questions[-limit:] if limit else questions
+        return [exchange.question for exchange in self._recent(limit)]
     
     def is_follow_up_question(self, question: str) -> bool:
-        """Simple follow-up detection with LangChain context"""
-        if not self.chat_memory.messages:
+        """Simple follow-up detection from the buffered conversation"""
+        if not self._exchanges:
             return False
         
         # Quick heuristics
@@ -103,34 +89,29 @@ class SimpleLangChainHistory:
     
     def get_history(self) -> List[Dict[str, Any]]:
         """Get history as dict list for UI"""
-        memory_vars = self.memory.load_memory_variables({})
-        messages = memory_vars.get("history", [])
-        
-        history = []
-        for i in range(0, len(messages), 2):
-            if i + 1 < len(messages):
-                exchange_id = i // 2
-                history.append({
-                    "question": messages[i].content,
-                    "answer": messages[i + 1].content,
-                    "timestamp": datetime.now().isoformat(),
-                    "sources": self.sources_tracking.get(exchange_id, [])
-                })
-        
-        return history
+        return [
+            {
+                "question": exchange.question,
+                "answer": exchange.answer,
+                "timestamp": datetime.fromtimestamp(exchange.timestamp).isoformat(),
+                "sources": exchange.sources
+            }
+            for exchange in self._exchanges
+        ]
     
     def clear_history(self):
         """Clear everything"""
-        self.memory.clear()
-        self.sources_tracking.clear()
+        self._exchanges.clear()
+        self._context = None
         logger.info("Chat history cleared")
     
     def get_stats(self) -> Dict[str, Any]:
         """Simple stats"""
-        total = len(self.chat_memory.messages) // 2
+        total = len(self._exchanges)
         return {
             "total_exchanges": total,
+            "exchanges_added": self._total,
             "max_history": self.max_history,
             "has_context": total > 0,
-            "memory_type": "LangChain Window"
+            "memory_type": "Ring buffer"
         }
@@ -0,0 +1,107 @@
+"""
+Lazy RAG Engine - Background Warm-Up Behind a Stand-In Object
+The web app serves health checks and pages while the model and index load
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# How long a request needing the engine waits for warm-up before giving up
+DEFAULT_WAIT_SECONDS = 60.0
+
+
+class EngineNotReady(Exception):
+    """Raised when the engine is still loading (or failed to load) past the wait timeout."""
+
+
+class LazyRagEngine:
+    """
+    Builds RagEngine on a background thread
+
+    rag_engine, its model and its index are only imported and loaded by
+    start(); attribute access waits (up to wait_timeout) for the engine and
+    then delegates to it, so existing call sites work unchanged.
+    """
+
+    def __init__(self, wait_timeout=DEFAULT_WAIT_SECONDS, **engine_kwargs):
+        self.wait_timeout = wait_timeout
+        self._engine_kwargs = engine_kwargs
+        self._engine = None
+        self._error = None
+        self._ready = threading.Event()
+        self._started_at = None
+        self._load_seconds = None
+        self._start_lock = threading.Lock()
+
+    def start(self, background=True):
+        """Begin loading; background=False loads on the calling thread (eager mode)."""
+        with self._start_lock:
+            if self._started_at is not None:
+                return
+            self._started_at = time.monotonic()
+
+        if background:
+            threading.Thread(target=self._load, name="rag-engine-warmup", daemon=True).start()
+        else:
+            self._load()
+
+    def _load(self):
+        try:
+            from rag_engine import RagEngine  # Pulls in LangChain, torch and faiss
+
+            engine = RagEngine(**self._engine_kwargs)
+            engine.warm_up()
+            self._engine = engine
+            self._load_seconds = time.monotonic() - self._started_at
+            logger.info(f"RAG engine ready after {self._load_seconds:.1f}s")
+        except Exception as e:
+            self._error = e
+            logger.error(f"RAG engine failed to load: {str(e)}", exc_info=True)
+        finally:
+            self._ready.set()
+
+    @property
+    def ready(self):
+        return self._engine is not None
+
+    def status(self):
+        """Readiness report for health checks."""
+        if self._engine is not None:
+            state = "ready"
+        elif self._error is not None:
+            state = "failed"
+        elif self._started_at is not None:
+            state = "loading"
+        else:
+            state = "not_started"
+
+        status = {"ready": state == "ready", "state": state}
+        if self._load_seconds is not None:
+            status["load_seconds"] = round(self._load_seconds, 2)
+        elif self._started_at is not None:
+            status["elapsed_seconds"] = round(time.monotonic() - self._started_at, 2)
+        if self._error is not None:
+            status["error"] = str(self._error)
+        return status
+
+    def get(self, timeout=None):
+        """Return the engine, waiting for warm-up up to timeout (default wait_timeout)."""
+        if self._engine is not None:
+            return self._engine
+
+        self.start()
+        self._ready.wait(self.wait_timeout if timeout is None else timeout)
+        if self._engine is None:
+            if self._error is not None:
+                raise EngineNotReady(f"RAG engine failed to load: {self._error}")
+            raise EngineNotReady("RAG engine is still loading")
+        return self._engine
+
+    def __getattr__(self, name):
+        # Only reached for attributes not defined above, i.e. RagEngine's own
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.get(), name)
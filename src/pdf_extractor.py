@@ -1,18 +1,39 @@
 from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
+from pypdf import PdfReader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import multiprocessing
+
+# Parallel parsing: PDFs with at least this many pages are split into page ranges
+# parsed by worker processes; smaller ones aren't worth the process start-up
+PARALLEL_MIN_PAGES = 64
+PAGES_PER_TASK = 16
+RANGES_IN_FLIGHT_PER_PROCESS = 2  # Parsed-but-unconsumed pages stay bounded by this window
+
+
+def _extract_page_range(file_path, start, end):
+    """Parse pages [start, end) in a worker process and return their texts in order."""
+    reader = PdfReader(file_path)
+    return [reader.pages[number].extract_text() for number in range(start, end)]
 
 
 class PdfExtractor:
     """Handles extraction of text from PDF documents and splitting into chunks."""
-    
-    def __init__(self, file_path):
+
+    def __init__(self, file_path, processes=0):
         """Initialize with the path to the PDF file.
         
         Args:
             file_path: Path to the PDF file
+            processes: Worker processes for parsing large PDFs (0 or 1 parses in-process)
         """
         self.file_path = file_path
+        self.processes = processes
         self.loader = PyPDFLoader(file_path)
+        self._page_count = None
+        self._splitters = {}
 
     def load_documents(self):
         """Load the PDF and convert to LangChain documents.
@@ -20,20 +41,81 @@ class PdfExtractor:
         Returns:
             List of Document objects
         """
-        return self.loader.load()
+        return list(self.iter_documents())
+
+    def iter_documents(self):
+        """Yield documents one at a time as pages are parsed, in page order.
+        
+        Large PDFs are parsed by a process pool one page range at a time, with
+        only a few ranges in flight, so memory is bounded by that window.
+        
+        Yields:
+            Document objects as each page is parsed
+        """
+        if self.processes > 1 and self.page_count() >= PARALLEL_MIN_PAGES:
+            yield from self._iter_parallel()
+        else:
+            yield from self.loader.lazy_load()
+
+    def _iter_parallel(self):
+        total_pages = self.page_count()
+        ranges = iter([
+            (start, min(start + PAGES_PER_TASK, total_pages)) for start in range(0, total_pages, PAGES_PER_TASK)
+        ])
+        
+        # Spawned workers don't inherit the parent's threads (FAISS, Flask) or their locks
+        pool = ProcessPoolExecutor(max_workers=self.processes, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            pending = deque()
+        
+            def submit_next():
+                page_range = next(ranges, None)
+                if page_range is not None:
+                    pending.append((page_range[0], pool.submit(_extract_page_range, self.file_path, *page_range)))
+        
+            for _ in range(self.processes * RANGES_IN_FLIGHT_PER_PROCESS):
+                submit_next()
+        
+            while pending:
+                start, future = pending.popleft()
+                texts = future.result()
+                submit_next()
+                for offset, text in enumerate(texts):
+                    yield Document(
+                        page_content=text,
+                        metadata={"source": self.file_path, "page": start + offset, "total_pages": total_pages}
+                    )
+        finally:
+            # Also reached when the consumer stops early - don't parse the rest
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def page_count(self):
+        """Return the number of pages without extracting any text.
+        
+        Returns:
+            Page count of the PDF
+        """
+        if self._page_count is None:
+            self._page_count = len(PdfReader(self.file_path).pages)
+        return self._page_count
 
     def split_documents(self, docs, chunk_size=1089, chunk_overlap=108):
         """Split documents into chunks for better processing.
         
+        Called once per page while streaming, so the splitter is built once and reused.
+        
         Args:
             docs: List of Document objects
             chunk_size: Maximum size of each chunk
             chunk_overlap: Overlap between chunks
-            
+        
         Returns:
             List of split Document objects
         """
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size, chunk_overlap=chunk_overlap
-        )
-        return splitter.split_documents(docs)
\ No newline at end of file
+        splitter = self._splitters.get((chunk_size, chunk_overlap))
+        if splitter is None:
+            splitter = RecursiveCharacterTextSplitter(
+                chunk_size=chunk_size, chunk_overlap=chunk_overlap
+            )
+            self._splitters[(chunk_size, chunk_overlap)] = splitter
+        return splitter.split_documents(docs)
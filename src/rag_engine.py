@@ -1,28 +1,104 @@
-from pdf_extractor import PdfExtractor
-from web_extractor import WebExtractor
 from groq_llm import GroqLLM
-from langchain_chat_history import SimpleLangChainHistory
-from vector_store import VectorStore
+from chat_sessions import ChatSessionStore, DEFAULT_MAX_SESSIONS, DEFAULT_IDLE_TTL
+from answer_cache import SemanticAnswerCache, DEFAULT_SIMILARITY_THRESHOLD, DEFAULT_MAX_ENTRIES, DEFAULT_TTL_SECONDS
+from context_packer import ContextPacker, ContextAccounting, DEFAULT_CONTEXT_TOKENS, count_tokens
+from reranker import CrossEncoderReranker, DEFAULT_RERANK_CANDIDATES, DEFAULT_LATENCY_BUDGET_MS
+from doc_store import content_hash
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import threading
+import asyncio
 import logging
+import queue
+import os
 import re
 
 logger = logging.getLogger(__name__)
 
+# Streaming ingest defaults
+DEFAULT_EMBED_BATCH_SIZE = 256  # Chunks per embed/add step
+INGEST_QUEUE_BATCHES = 4  # Split batches buffered ahead of the embedder (bounds memory)
+
+_END_OF_STREAM = object()
+
+# Site crawls: ETag / Last-Modified per crawled page, kept beside the index
+CRAWL_STATE_FILE = "crawl_state.json"
+DEFAULT_CRAWL_DEPTH = 2
+
+# Bulk questions: concurrent LLM calls (keep at or below GroqLLM's connection pool size)
+DEFAULT_QUERY_CONCURRENCY = 8
+
+# Async path (aquery): threads for the blocking steps; the LLM wait itself holds none
+DEFAULT_ASYNC_WORKERS = 4
+
+# Conversation used when a caller doesn't pass a session id
+DEFAULT_SESSION_ID = "default"
+
 class RagEngine:
     """
     Retrieval-Augmented Generation (RAG) engine for orchestrating document ingestion, retrieval, and LLM-based answering.
     Enhanced with simple conversational context awareness.
     """
-    def __init__(self, db_path="faiss_index", enable_chat_history=True, max_history=10):
-        self.vector_store = VectorStore(db_path)
+    def __init__(self, db_path="faiss_index", enable_chat_history=True, max_history=10,
+                 max_sessions=DEFAULT_MAX_SESSIONS, session_ttl=DEFAULT_IDLE_TTL, chat_db_path=None,
+                 index_type="flat", search_mode="hybrid", retrieval_service=None,
+                 embedding_backend="torch", embedding_threads=None, encode_batch_size=None, embed_batch_size=DEFAULT_EMBED_BATCH_SIZE,
+                 embed_processes=0, pdf_processes=0,
+                 enable_answer_cache=True, answer_cache_threshold=DEFAULT_SIMILARITY_THRESHOLD,
+                 answer_cache_size=DEFAULT_MAX_ENTRIES, answer_cache_ttl=DEFAULT_TTL_SECONDS,
+                 context_tokens=DEFAULT_CONTEXT_TOKENS, rerank_model=None, rerank_candidates=DEFAULT_RERANK_CANDIDATES,
+                 rerank_budget_ms=DEFAULT_LATENCY_BUDGET_MS, async_workers=DEFAULT_ASYNC_WORKERS):
+        if retrieval_service:
+            # Model and index live in retrieval_service.py; this process only holds a client
+            from retrieval_client import RemoteVectorStore
+            self.vector_store = RemoteVectorStore(retrieval_service)
+        else:
+            from vector_store import VectorStore, DEFAULT_ENCODE_BATCH_SIZE
+            self.vector_store = VectorStore(
+                db_path, index_type=index_type, search_mode=search_mode,
+                embedding_backend=embedding_backend, embedding_threads=embedding_threads,
+                encode_batch_size=encode_batch_size or DEFAULT_ENCODE_BATCH_SIZE
+            )
         self.llm = GroqLLM()
         
-        # Simple chat history for conversational context
-        self.enable_chat_history = enable_chat_history
-        self.chat_history = SimpleLangChainHistory(max_history=max_history) if enable_chat_history else None
+        # Optional cross-encoder stage: rerank_candidates are retrieved and the best k kept
+        self.reranker = None
+        self.rerank_candidates = rerank_candidates
+        if rerank_model:
+            self.reranker = CrossEncoderReranker(rerank_model, latency_budget_ms=rerank_budget_ms,
+                                                 threads=embedding_threads)
+        
+        # Retrieved chunks are deduplicated and trimmed to fit context_tokens of prompt context
+        self.context_packer = ContextPacker(self.vector_store.embeddings, token_budget=context_tokens)
+        self.context_accounting = ContextAccounting()
         
+        # Bounded executor for aquery's embedding, search and prompt work, started on first use
+        self.async_workers = async_workers
+        self._cpu_executor = None
+        self._cpu_executor_lock = threading.Lock()
+        
+        # Semantic answer cache, invalidated whenever the sources an answer used change
+        self.answer_cache = None
+        if enable_answer_cache:
+            self.answer_cache = SemanticAnswerCache(answer_cache_threshold, answer_cache_size, answer_cache_ttl)
+            self.vector_store.add_listener(self.answer_cache.invalidate_sources)
+        
+        # Ingest pipeline tuning - embed_processes > 1 spreads encode over CPU worker processes
+        self.embed_batch_size = embed_batch_size
+        if embed_processes > 1:
+            self.vector_store.embeddings.start_pool(embed_processes)
+        self.pdf_processes = pdf_processes  # > 1 parses large PDFs by page range across processes
+        self.crawl_state_path = os.path.join(db_path, CRAWL_STATE_FILE)
+        
+        # Per-session chat history for conversational context (chat_db_path persists it)
+        self.enable_chat_history = enable_chat_history
+        self.chat_sessions = None
         if enable_chat_history:
-            logger.info(f"LangChain chat history enabled with max {max_history} exchanges")
+            self.chat_sessions = ChatSessionStore(
+                max_history=max_history, max_sessions=max_sessions, idle_ttl=session_ttl, db_path=chat_db_path
+            )
+            logger.info(f"Chat history enabled: max {max_history} exchanges per session, "
+                        f"{max_sessions} sessions in memory")
         
         # Enhanced prompt template with conversation context
         self.prompt_template = """
@@ -57,119 +133,502 @@ FORMATTING RULES:
 
 Answer:"""
 
-    def ingest_web(self, url):
+    def warm_up(self):
+        """
+        Loads what the first question would otherwise pay for: the embedding
+        model (plus one encode), the rerank model and the docstore / index pages.
+        """
+        if hasattr(self.vector_store.embeddings, "warm_up"):
+            self.vector_store.embeddings.warm_up()
+        if self.reranker is not None:
+            self.reranker.warm_up()
+        self.vector_store.is_empty()
+
+    def ingest_web(self, url, progress=None):
         """
         Ingests and indexes content from a web URL.
-        Returns a list of document chunks added to the vector store.
+        Re-ingesting a URL refreshes it: only changed chunks are embedded and
+        chunks that disappeared from the page are removed.
+        Returns the number of document chunks added to the vector store.
         """
+        from web_extractor import WebExtractor  # Loaders are only imported on first ingest
         extractor = WebExtractor(url)
-        docs = extractor.load_documents()
-        # Set the source metadata for web documents
-        for doc in docs:
-            doc.metadata.setdefault('source', url)
-        chunks = extractor.split_documents(docs)
-        self.vector_store.add_documents(chunks)
-        return chunks
+        return self._ingest_stream(extractor, url, progress, sync_sources=[url])
 
-    def ingest_pdf(self, file_path):
+    def ingest_site(self, url, progress=None, max_depth=DEFAULT_CRAWL_DEPTH):
+        """
+        Crawls url's site (same-host links, up to max_depth hops) and indexes its pages.
+        Re-crawls send conditional requests: only new or changed pages are
+        re-split and diffed against their stored chunks, and pages that now
+        return 404/410 are removed. Returns the number of chunks added.
+        """
+        from web_extractor import WebExtractor  # Loaders are only imported on first ingest
+        extractor = WebExtractor(
+            url, crawl=True, max_depth=max_depth, state_path=self.crawl_state_path,
+            known_urls=set(self.vector_store.list_sources())
+        )
+        failed_urls = set()
+        total = self._ingest_stream(extractor, url, progress, sync_sources=[], failed_sources=failed_urls)
+        
+        for gone_url in extractor.gone_urls:
+            self.vector_store.remove_by_source(gone_url)
+        # Pages that failed to add keep their old validators, so the next crawl fetches them again
+        extractor.save_crawl_state(failed_urls)
+        
+        logger.info(f"Crawl of {url}: {len(extractor.changed_urls)} pages new or changed, "
+                    f"{len(extractor.gone_urls)} removed" + (f", {len(failed_urls)} failed" if failed_urls else ""))
+        return total
+
+    def ingest_pdf(self, file_path, progress=None):
         """
         Ingests and indexes content from a PDF file.
-        Returns a list of document chunks added to the vector store.
+        Re-ingesting the same path refreshes it, like ingest_web.
+        Returns the number of document chunks added to the vector store.
         """
-        extractor = PdfExtractor(file_path)
-        docs = extractor.load_documents()
-        for doc in docs:
-            doc.metadata.setdefault('source', file_path)
-        chunks = extractor.split_documents(docs)
-        self.vector_store.add_documents(chunks)
-        return chunks
+        from pdf_extractor import PdfExtractor  # Loaders are only imported on first ingest
+        extractor = PdfExtractor(file_path, processes=self.pdf_processes)
+        if progress:
+            progress(total_pages=extractor.page_count())
+        return self._ingest_stream(extractor, file_path, progress, sync_sources=[file_path])
 
-    def query(self, question, k=5):
+    def _ingest_stream(self, extractor, source, progress=None, sync_sources=None, failed_sources=None):
         """
-        Answers a question using RAG with simple conversational context awareness.
+        Streams a source through load -> split -> embed -> add.
+        Pages are parsed and split on a background thread while the previous
+        batch is embedded, and each batch is added to the store as soon as its
+        vectors are ready, so only a few batches are ever held in memory.
+        progress, if given, is called with pages_parsed / chunks_embedded counts.
+        Chunks already in the store (from any source) are not embedded again.
+        With sync_sources, every source parsed in the stream - plus those listed,
+        even if they yielded nothing, and pages that now split into no chunks -
+        then drops the stored chunks whose content hash didn't come up again, so
+        a re-ingest only pays for what changed.
+        Sources with a batch the store failed to add are not pruned; they are
+        collected in failed_sources if given, else the ingest raises once the
+        stream has been drained.
         """
-        # Handle simple greetings first, regardless of document status
-        if self._is_simple_greeting(question):
-            greeting_response = "Hello! 👋 I'm your document assistant. I can help you find information from your uploaded documents. What would you like to know?"
-            return greeting_response
+        progress = progress or (lambda **counts: None)
+        batches = queue.Queue(maxsize=INGEST_QUEUE_BATCHES)
+        stop = threading.Event()
+        parsed_sources = set()  # Filled by the loader thread before it ends the stream
         
-        # Check if documents are available for actual questions
-        if self.vector_store.is_empty():
-            no_docs_response = "I don't have access to any documents yet. Please upload some PDFs or add web content first, and I'll be happy to help answer your questions!"
-            return no_docs_response
+        def put(item):
+            # Give up if the consumer has stopped, rather than blocking forever on a full queue
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+        
+        def produce():
+            try:
+                batch = []
+                for pages_parsed, doc in enumerate(extractor.iter_documents(), start=1):
+                    if stop.is_set():
+                        return
+                    progress(pages_parsed=pages_parsed)
+                    # Set the source metadata for every page
+                    doc.metadata.setdefault('source', source)
+                    parsed_sources.add(doc.metadata['source'])
+                    batch.extend(extractor.split_documents([doc]))
+                    while len(batch) >= self.embed_batch_size:
+                        put(batch[:self.embed_batch_size])
+                        batch = batch[self.embed_batch_size:]
+                if batch:
+                    put(batch)
+                put(_END_OF_STREAM)
+            except Exception as e:
+                put(e)
         
+        loader = threading.Thread(target=produce, name="ingest-loader", daemon=True)
+        loader.start()
+        
+        total = 0
+        seen_hashes = {src: set() for src in sync_sources or []}
+        failed = set()
         try:
-            # Search for relevant documents
-            relevant_docs = self.vector_store.search(question, k=k)
-            logger.info(f"Search for '{question}' returned {len(relevant_docs)} documents")
-            
-            if not relevant_docs:
-                no_context_response = "I couldn't find specific information related to your question in the uploaded documents. Could you try rephrasing your question or asking about a different topic?"
-                return no_context_response
+            while True:
+                item = batches.get()
+                if item is _END_OF_STREAM:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                
+                # Embeds only the chunks whose content isn't stored yet
+                try:
+                    total += self.vector_store.add_documents(item, raise_errors=True)
+                except Exception as e:
+                    # Keep going; the failed sources keep their stored chunks and are retried next time
+                    failed.update(chunk.metadata.get('source') for chunk in item)
+                    logger.error(f"Error adding {len(item)} chunks from {source}: {str(e)}")
+                    continue
+                if sync_sources is not None:
+                    for chunk in item:
+                        seen_hashes.setdefault(chunk.metadata.get('source'), set()).add(content_hash(chunk.page_content))
+                progress(chunks_embedded=total)
+                logger.debug(f"Ingested {total} chunks from {source}")
+        finally:
+            stop.set()
+        
+        if sync_sources is not None:
+            # A page whose new content splits into nothing still drops its old chunks
+            for parsed_source in parsed_sources:
+                seen_hashes.setdefault(parsed_source, set())
+        
+        pruned = 0
+        for seen_source, hashes in seen_hashes.items():
+            if seen_source not in failed:
+                pruned += self.vector_store.prune_source(seen_source, hashes)
+        
+        logger.info(f"Ingested {total} new chunks from {source}" + (f", pruned {pruned} stale ones" if pruned else ""))
+        if failed:
+            if failed_sources is None:
+                raise RuntimeError(f"Could not add all chunks from {source} to the vector store")
+            failed_sources.update(failed)
+        return total
+
+    def query(self, question, k=5, session_id=DEFAULT_SESSION_ID):
+        """
+        Answers a question using RAG with simple conversational context awareness.
+        session_id selects the conversation; None answers standalone.
+        """
+        early_response = self._early_response(question)
+        if early_response:
+            return early_response
+        
+        try:
+            answer, pending = self._prepare(question, k, session_id)
+            if pending is None:
+                return answer
             
-            # Log document content for debugging
-            for i, doc in enumerate(relevant_docs[:3]):
-                logger.info(f"Document {i+1} preview: {doc.page_content[:100]}...")
+            # Generate answer using GroqLLM
+            prompt, relevant_docs, query_vector, context_docs = pending
+            answer = self.llm.generate(prompt)
             
-            # Prepare context from top relevant documents
-            context = "\n\n".join([doc.page_content for doc in relevant_docs[:3]])
+            return self._finalize_answer(question, answer, relevant_docs, query_vector, session_id, context_docs)
             
-            # Get conversation context if chat history is enabled
-            conversation_context = ""
-            is_follow_up = False
+        except Exception as e:
+            return self._error_response(e, question)
+
+    async def aquery(self, question, k=5, session_id=DEFAULT_SESSION_ID):
+        """
+        Async variant of query() for ASGI servers.
+        Embedding, search and prompt packing run on the bounded CPU executor and
+        the LLM call is awaited, so a waiting question holds no thread.
+        """
+        early_response = await self._offload(self._early_response, question)
+        if early_response:
+            return early_response
+        
+        try:
+            answer, pending = await self._offload(self._prepare, question, k, session_id)
+            if pending is None:
+                return answer
             
-            if self.enable_chat_history and self.chat_history:
-                conversation_context = self.chat_history.get_conversation_context(include_last_n=3)
-                is_follow_up = self.chat_history.is_follow_up_question(question)
-                
-                if is_follow_up:
-                    recent_questions = self.chat_history.get_recent_questions(limit=2)
-                    if recent_questions:
-                        conversation_context += f"\nNote: This appears to be a follow-up question to: {recent_questions[-1]}"
+            prompt, relevant_docs, query_vector, context_docs = pending
+            answer = await self.llm.agenerate(prompt)
             
-            # Format the prompt with conversation context
-            formatted_prompt = self.prompt_template.format(
-                conversation_context=conversation_context,
-                context=context, 
-                question=question
+            return await self._offload(
+                self._finalize_answer, question, answer, relevant_docs, query_vector, session_id, context_docs
             )
             
-            # Generate answer using GroqLLM
-            answer = self.llm.generate(formatted_prompt)
+        except Exception as e:
+            return self._error_response(e, question)
+
+    def query_many(self, questions, k=5, max_concurrency=None):
+        """
+        Answers many independent questions (evaluation runs, FAQ imports).
+        Retrieval is batched into one encode and one FAISS search; LLM calls run
+        concurrently, at most max_concurrency at a time. Questions are answered
+        standalone - no conversation context, and nothing is added to chat history.
+        Returns answers in question order.
+        """
+        max_concurrency = max_concurrency or DEFAULT_QUERY_CONCURRENCY
+        answers = [self._early_response(question) for question in questions]
+        pending = [i for i, answer in enumerate(answers) if answer is None]
+        if not pending:
+            return answers
+        
+        try:
+            pending_questions = [questions[i] for i in pending]
+            query_vectors = self.vector_store.embeddings.embed_queries(pending_questions)
+            docs_per_question = self.vector_store.search_many(
+                pending_questions, k=self._fetch_k(k), query_vectors=query_vectors
+            )
+            if self.reranker is not None:
+                docs_per_question = self.reranker.rerank_many(pending_questions, docs_per_question, k)
+        except Exception as e:
+            error_response = self._error_response(e, "<batch>")
+            return [error_response if answer is None else answer for answer in answers]
+        
+        to_generate = []
+        for i, query_vector, relevant_docs in zip(pending, query_vectors, docs_per_question):
+            if not relevant_docs:
+                answers[i] = self._no_context_response()
+                continue
+            answers[i] = self._cached_answer(questions[i], query_vector, relevant_docs, session_id=None)
+            if answers[i] is None:
+                to_generate.append((i, query_vector, relevant_docs))
+        
+        def answer_one(item):
+            i, query_vector, relevant_docs = item
+            try:
+                prompt, context_docs = self._build_prompt(questions[i], relevant_docs, query_vector, session_id=None)
+                answer = self.llm.generate(prompt)
+                return self._finalize_answer(questions[i], answer, relevant_docs, query_vector, None, context_docs)
+            except Exception as e:
+                return self._error_response(e, questions[i])
+        
+        if to_generate:
+            logger.info(f"Generating {len(to_generate)} of {len(questions)} bulk answers "
+                        f"({len(questions) - len(to_generate)} answered without the LLM)")
+            with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(to_generate)))) as executor:
+                for (i, _, _), answer in zip(to_generate, executor.map(answer_one, to_generate)):
+                    answers[i] = answer
+        
+        return answers
+
+    def query_stream(self, question, k=5, session_id=DEFAULT_SESSION_ID):
+        """
+        Streaming variant of query().
+        Yields ("token", text) pieces as the LLM produces visible text, then
+        ("answer", html) with the final formatted answer, or ("error", message).
+        """
+        early_response = self._early_response(question)
+        if early_response:
+            yield "answer", early_response
+            return
+        
+        try:
+            answer, pending = self._prepare(question, k, session_id)
+            if pending is None:
+                yield "answer", answer
+                return
             
-            # Clean up the answer and ensure HTML formatting
-            answer = answer.strip()
+            # Stream answer tokens from GroqLLM (thinking blocks are already filtered)
+            prompt, relevant_docs, query_vector, context_docs = pending
+            parts = []
+            for text in self.llm.generate_stream(prompt):
+                parts.append(text)
+                yield "token", text
             
-            # Convert any markdown that slipped through to HTML (backup safety)
-            answer = self._convert_markdown_to_html(answer)
+            yield "answer", self._finalize_answer(
+                question, "".join(parts), relevant_docs, query_vector, session_id, context_docs
+            )
             
-            # Add sources in a clean format
-            sources = self._extract_sources(relevant_docs[:3])
-            if sources:
-                answer += f"\n---<em>Based on: {', '.join(sources)}</em>"
+        except Exception as e:
+            yield "error", self._error_response(e, question)
+
+    async def aquery_stream(self, question, k=5, session_id=DEFAULT_SESSION_ID):
+        """
+        Async variant of query_stream(): an async iterator of the same
+        ("token" | "answer" | "error", text) events.
+        """
+        early_response = await self._offload(self._early_response, question)
+        if early_response:
+            yield "answer", early_response
+            return
+        
+        try:
+            answer, pending = await self._offload(self._prepare, question, k, session_id)
+            if pending is None:
+                yield "answer", answer
+                return
             
-            # Add exchange to chat history
-            if self.enable_chat_history and self.chat_history:
-                self.chat_history.add_exchange(question, answer, sources)
+            prompt, relevant_docs, query_vector, context_docs = pending
+            parts = []
+            async for text in self.llm.agenerate_stream(prompt):
+                parts.append(text)
+                yield "token", text
             
-            return answer
+            yield "answer", await self._offload(
+                self._finalize_answer, question, "".join(parts), relevant_docs, query_vector, session_id, context_docs
+            )
             
         except Exception as e:
-            logger.error(f"Error in query processing: {str(e)}", exc_info=True)
-            logger.error(f"Error type: {type(e).__name__}")
-            logger.error(f"Question was: {question}")
-            
-            # Provide more specific error messages based on the error type
-            if "API" in str(e) or "requests" in str(e).lower():
-                error_response = "I'm having trouble connecting to the AI service. Please check your internet connection and API key, then try again."
-            elif "embedding" in str(e).lower() or "model" in str(e).lower():
-                error_response = "I'm having trouble processing your question with the embedding model. Please try again in a moment."
-            elif "vector" in str(e).lower() or "faiss" in str(e).lower():
-                error_response = "I'm having trouble searching through the documents. Please try rephrasing your question."
-            else:
-                error_response = f"I encountered an issue while processing your question: {str(e)}. Please try again or rephrase your question."
+            yield "error", self._error_response(e, question)
+
+    def _prepare(self, question, k, session_id):
+        """
+        Everything before the LLM call: retrieval, the answer cache and the prompt.
+        Returns (answer, None) when no LLM call is needed, else
+        (None, (prompt, relevant_docs, query_vector, context_docs)).
+        """
+        relevant_docs, query_vector = self._retrieve(question, k)
+        if not relevant_docs:
+            return self._no_context_response(), None
+        
+        cached_answer = self._cached_answer(question, query_vector, relevant_docs, session_id)
+        if cached_answer:
+            return cached_answer, None
+        
+        prompt, context_docs = self._build_prompt(question, relevant_docs, query_vector, session_id)
+        return None, (prompt, relevant_docs, query_vector, context_docs)
+
+    async def _offload(self, fn, *args):
+        """Run blocking work (model, FAISS, SQLite) on the bounded CPU executor."""
+        if self._cpu_executor is None:
+            with self._cpu_executor_lock:
+                if self._cpu_executor is None:
+                    self._cpu_executor = ThreadPoolExecutor(max_workers=self.async_workers,
+                                                            thread_name_prefix="rag-async")
+        return await asyncio.get_running_loop().run_in_executor(self._cpu_executor, functools.partial(fn, *args))
+
+    def _early_response(self, question):
+        """Return a canned response when the question doesn't need retrieval, else None."""
+        # Handle simple greetings first, regardless of document status
+        if self._is_simple_greeting(question):
+            greeting_response = "Hello! 👋 I'm your document assistant. I can help you find information from your uploaded documents. What would you like to know?"
+            return greeting_response
+        
+        # Check if documents are available for actual questions
+        if self.vector_store.is_empty():
+            no_docs_response = "I don't have access to any documents yet. Please upload some PDFs or add web content first, and I'll be happy to help answer your questions!"
+            return no_docs_response
+        
+        return None
+
+    @staticmethod
+    def _no_context_response():
+        no_context_response = "I couldn't find specific information related to your question in the uploaded documents. Could you try rephrasing your question or asking about a different topic?"
+        return no_context_response
+
+    def _retrieve(self, question, k):
+        """Embed the question once and search with it; returns (docs, query_vector)."""
+        query_vector = self.vector_store.embeddings.embed_query(question)
+        
+        # Search for relevant documents
+        relevant_docs = self.vector_store.search(question, k=self._fetch_k(k), query_vector=query_vector)
+        logger.info(f"Search for '{question}' returned {len(relevant_docs)} documents")
+        if self.reranker is not None:
+            relevant_docs = self.reranker.rerank(question, relevant_docs, k)
+        return relevant_docs, query_vector
+
+    def _fetch_k(self, k):
+        """Candidates to retrieve for k results - more when a reranker picks the best k."""
+        return max(k, self.rerank_candidates) if self.reranker is not None else k
+
+    def _history(self, session_id):
+        """The session's chat history, or None when answering standalone."""
+        if session_id is None or self.chat_sessions is None:
+            return None
+        return self.chat_sessions.get(session_id)
+
+    def _record_exchange(self, session_id, question, answer, sources):
+        if session_id is not None and self.chat_sessions is not None:
+            self.chat_sessions.add_exchange(session_id, question, answer, sources)
+
+    def _use_answer_cache(self, question, session_id=None):
+        """
+        Only answers built without conversation context are cached or reused - the prompt
+        carries the session's conversation, so anything else could leak into another session.
+        """
+        if self.answer_cache is None:
+            return False
+        history = self._history(session_id)
+        return history is None or not history.get_conversation_context(include_last_n=3)
+
+    def _cached_answer(self, question, query_vector, relevant_docs, session_id=None):
+        """Return a cached answer built from the same chunks for a similar question, if any."""
+        if not self._use_answer_cache(question, session_id):
+            return None
+        
+        entry = self.answer_cache.lookup(query_vector, [doc.metadata.get("chunk_id") for doc in relevant_docs])
+        if entry is None:
+            return None
+        
+        logger.info(f"Answer cache hit for '{question}' (cached question: '{entry.question}')")
+        self._record_exchange(session_id, question, entry.answer, entry.answer_sources)
+        return entry.answer
+
+    def _build_prompt(self, question, relevant_docs, query_vector, session_id=None):
+        """
+        Format the prompt from retrieved documents and conversation context.
+        Returns (prompt, documents the packed context draws on).
+        """
+        # Deduplicate, trim and fit the retrieved chunks to the context token budget
+        packed = self.context_packer.pack(query_vector, relevant_docs)
+        context = packed.text
+        
+        # Get conversation context if chat history is enabled
+        conversation_context = ""
+        is_follow_up = False
+        
+        history = self._history(session_id)
+        if history is not None:
+            conversation_context = history.get_conversation_context(include_last_n=3)
+            is_follow_up = history.is_follow_up_question(question)
             
-            return error_response
+            if is_follow_up:
+                recent_questions = history.get_recent_questions(limit=2)
+                if recent_questions:
+                    conversation_context += f"\nNote: This appears to be a follow-up question to: {recent_questions[-1]}"
+        
+        # Format the prompt with conversation context
+        formatted_prompt = self.prompt_template.format(
+            conversation_context=conversation_context,
+            context=context, 
+            question=question
+        )
+        
+        # Token accounting for tuning the budget
+        stats = dict(packed.stats)
+        stats["conversation_tokens"] = count_tokens(conversation_context)
+        stats["prompt_tokens"] = count_tokens(formatted_prompt)
+        self.context_accounting.record(stats)
+        logger.info(f"Prompt: {stats['prompt_tokens']} tokens, context {stats['context_tokens']}/{stats['token_budget']} "
+                    f"from {stats['used_chunks']} of {stats['retrieved_chunks']} chunks "
+                    f"({stats['duplicate_chunks']} duplicates, {stats['sentences_kept']}/{stats['sentences_total']} sentences)")
+        return formatted_prompt, packed.documents
+
+    def _finalize_answer(self, question, answer, relevant_docs, query_vector=None, session_id=None, context_docs=None):
+        """Format the raw LLM answer, attach sources, cache it and record the exchange."""
+        # Clean up the answer and ensure HTML formatting
+        answer = answer.strip()
+        
+        # Convert any markdown that slipped through to HTML (backup safety)
+        answer = self._convert_markdown_to_html(answer)
+        
+        # Add sources in a clean format
+        sources = self._extract_sources(relevant_docs[:3] if context_docs is None else context_docs)
+        if sources:
+            answer += f"\n---<em>Based on: {', '.join(sources)}</em>"
+        
+        # Cache before recording the exchange, which adds conversation context
+        if query_vector is not None and self._use_answer_cache(question, session_id):
+            self.answer_cache.store(
+                question,
+                query_vector,
+                [doc.metadata.get("chunk_id") for doc in relevant_docs],
+                {doc.metadata.get("source") for doc in relevant_docs},
+                sources,
+                answer
+            )
+        
+        # Add exchange to chat history
+        self._record_exchange(session_id, question, answer, sources)
+        
+        return answer
+
+    @staticmethod
+    def _error_response(e, question):
+        """Log a query failure and turn it into a user-facing message."""
+        logger.error(f"Error in query processing: {str(e)}", exc_info=True)
+        logger.error(f"Error type: {type(e).__name__}")
+        logger.error(f"Question was: {question}")
+        
+        # Provide more specific error messages based on the error type
+        if "API" in str(e) or "requests" in str(e).lower():
+            error_response = "I'm having trouble connecting to the AI service. Please check your internet connection and API key, then try again."
+        elif "embedding" in str(e).lower() or "model" in str(e).lower():
+            error_response = "I'm having trouble processing your question with the embedding model. Please try again in a moment."
+        elif "vector" in str(e).lower() or "faiss" in str(e).lower():
+            error_response = "I'm having trouble searching through the documents. Please try rephrasing your question."
+        else:
+            error_response = f"I encountered an issue while processing your question: {str(e)}. Please try again or rephrase your question."
+        
+        return error_response
 
     @staticmethod
     def _extract_sources(docs_or_context):
@@ -213,20 +672,46 @@ Answer:"""
 
     # Simple Chat History Methods
     
-    def get_chat_history(self):
-        """Get chat history for display"""
-        if not self.enable_chat_history or not self.chat_history:
+    def get_chat_history(self, session_id=DEFAULT_SESSION_ID):
+        """Get a session's chat history for display"""
+        history = self._history(session_id)
+        if history is None:
             return []
-        return self.chat_history.get_history()
+        return history.get_history()
     
-    def clear_chat_history(self):
-        """Clear chat history"""
-        if self.enable_chat_history and self.chat_history:
-            self.chat_history.clear_history()
+    def clear_chat_history(self, session_id=DEFAULT_SESSION_ID):
+        """Clear a session's chat history"""
+        if self.chat_sessions is not None:
+            self.chat_sessions.clear(session_id)
             logger.info("Chat history cleared")
     
-    def get_chat_stats(self):
-        """Get simple chat statistics"""
-        if not self.enable_chat_history or not self.chat_history:
+    def get_answer_cache_stats(self):
+        """Get semantic answer cache statistics"""
+        if self.answer_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.answer_cache.get_stats()}
+    
+    def get_llm_stats(self):
+        """Get LLM call latency and retry counters"""
+        return self.llm.get_metrics()
+    
+    def get_context_stats(self):
+        """Get per-query prompt token accounting (budget, context, conversation, total)"""
+        return {"token_budget": self.context_packer.token_budget, **self.context_accounting.snapshot()}
+    
+    def get_rerank_stats(self):
+        """Get cross-encoder rerank latency, skip and cache counters"""
+        if self.reranker is None:
+            return {"enabled": False}
+        return {"enabled": True, "candidates": self.rerank_candidates, **self.reranker.get_stats()}
+    
+    def get_embedding_stats(self):
+        """Get embedding cache hit/miss counters"""
+        return self.vector_store.embeddings.cache_stats()
+    
+    def get_chat_stats(self, session_id=DEFAULT_SESSION_ID):
+        """Get simple chat statistics for a session, plus the session store's"""
+        history = self._history(session_id)
+        if history is None:
             return {"total_exchanges": 0, "has_context": False}
-        return self.chat_history.get_stats()
\ No newline at end of file
+        return {**history.get_stats(), "sessions": self.chat_sessions.get_stats()}
\ No newline at end of file
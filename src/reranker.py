@@ -0,0 +1,179 @@
+"""
+Cross-Encoder Reranker - Second-Stage Ranking of Retrieved Chunks
+Scores every (question, chunk) pair in one CPU batch, with a pair-score cache and a latency budget
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+DEFAULT_RERANK_CANDIDATES = 20  # Retrieved per question and reordered; the best k are kept
+DEFAULT_LATENCY_BUDGET_MS = 150.0  # Per question; reranking is skipped when scoring would take longer
+DEFAULT_CACHE_ENTRIES = 20000  # (question, chunk) scores kept, least recently used dropped first
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_MAX_LENGTH = 320  # Tokens per pair - a question plus one ~1100-character chunk
+COST_SMOOTHING = 0.2  # Weight of the newest measurement in the per-pair cost estimate
+SKIP_DECAY = 0.9  # The estimate shrinks on every skip, so reranking resumes once a slow spell passes
+LATENCY_WINDOW = 1000
+
+# Loaded models, shared across instances, keyed by (model_name, max_length)
+_model_cache = {}
+_model_lock = threading.Lock()
+
+
+class CrossEncoderReranker:
+    """
+    Reorders retrieved chunks by a cross-encoder's relevance score
+
+    Scores are cached per (question, chunk text), so re-asked questions and
+    candidates shared between similar questions aren't scored twice. Cache
+    misses are scored in one predict call; when the running per-pair cost
+    says that call would exceed the latency budget, candidates keep their
+    retrieval order instead.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_RERANK_MODEL, latency_budget_ms: float = DEFAULT_LATENCY_BUDGET_MS,
+                 cache_entries: int = DEFAULT_CACHE_ENTRIES, batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_length: int = DEFAULT_MAX_LENGTH, threads: Optional[int] = None):
+        self.model_name = model_name
+        self.latency_budget_ms = latency_budget_ms
+        self.cache_entries = cache_entries
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.threads = threads
+
+        self._scores: "OrderedDict[bytes, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pair_seconds = None  # Smoothed cost of scoring one pair, once measured
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+        self.calls = 0
+        self.skipped = 0
+        self.failures = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def model(self):
+        """The CrossEncoder, imported and loaded on first use (shared across instances)."""
+        key = (self.model_name, self.max_length)
+        if key not in _model_cache:
+            with _model_lock:
+                if key not in _model_cache:
+                    logger.info(f"Loading rerank model: {self.model_name}")
+                    import torch
+                    from sentence_transformers import CrossEncoder
+                    if self.threads:
+                        torch.set_num_threads(self.threads)
+                    _model_cache[key] = CrossEncoder(self.model_name, device="cpu", max_length=self.max_length)
+        return _model_cache[key]
+
+    def warm_up(self):
+        """Load the model and measure the per-pair cost before the first real question."""
+        self._score([("warm-up", "warm-up")])
+
+    @staticmethod
+    def _key(question: str, text: str) -> bytes:
+        return hashlib.blake2b(f"{question}\0{text}".encode("utf-8"), digest_size=16).digest()
+
+    def _score(self, pairs: List[tuple]) -> np.ndarray:
+        started = time.perf_counter()
+        scores = np.asarray(self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False),
+                            dtype=np.float32).reshape(-1)
+        per_pair = (time.perf_counter() - started) / len(pairs)
+        with self._lock:
+            if self._pair_seconds is None:
+                self._pair_seconds = per_pair
+            else:
+                self._pair_seconds += COST_SMOOTHING * (per_pair - self._pair_seconds)
+        return scores
+
+    def rerank(self, question: str, documents: List[Any], k: int) -> List[Any]:
+        """The k best of documents for question, best first"""
+        return self.rerank_many([question], [documents], k)[0]
+
+    def rerank_many(self, questions: List[str], documents_per_question: List[List[Any]], k: int) -> List[List[Any]]:
+        """Rerank several questions' candidates with a single predict call for all uncached pairs"""
+        started = time.perf_counter()
+        keys = [[self._key(question, doc.page_content) for doc in docs]
+                for question, docs in zip(questions, documents_per_question)]
+
+        cached, missing = {}, {}
+        with self._lock:
+            self.calls += len(questions)
+            for question, docs, doc_keys in zip(questions, documents_per_question, keys):
+                for doc, key in zip(docs, doc_keys):
+                    if key in self._scores:
+                        self._scores.move_to_end(key)
+                        cached[key] = self._scores[key]
+                    elif key not in missing:
+                        missing[key] = (question, doc.page_content)
+            self.cache_hits += len(cached)
+            self.cache_misses += len(missing)
+
+            budget_seconds = self.latency_budget_ms / 1000 * len(questions)
+            estimate = len(missing) * (self._pair_seconds or 0.0)
+            if estimate > budget_seconds:
+                self.skipped += len(questions)
+                self._pair_seconds *= SKIP_DECAY
+                logger.info(f"Skipping rerank: {len(missing)} pairs would take ~{estimate * 1000:.0f} ms")
+                return [docs[:k] for docs in documents_per_question]
+
+        if missing:
+            try:
+                scores = self._score(list(missing.values()))
+            except Exception as e:
+                logger.error(f"Error reranking, keeping retrieval order: {str(e)}")
+                with self._lock:
+                    self.failures += len(questions)
+                return [docs[:k] for docs in documents_per_question]
+            fresh = dict(zip(missing, scores.tolist()))
+            cached.update(fresh)
+            with self._lock:
+                self._scores.update(fresh)
+                while len(self._scores) > self.cache_entries:
+                    self._scores.popitem(last=False)
+
+        results = []
+        for docs, doc_keys in zip(documents_per_question, keys):
+            ranked = sorted(zip(docs, doc_keys), key=lambda item: cached[item[1]], reverse=True)[:k]
+            for doc, key in ranked:
+                doc.metadata["rerank_score"] = cached[key]
+            results.append([doc for doc, _ in ranked])
+
+        with self._lock:
+            self._latencies.append((time.perf_counter() - started) / len(questions))
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            lookups = self.cache_hits + self.cache_misses
+            pair_ms = None if self._pair_seconds is None else round(self._pair_seconds * 1000, 3)
+            stats = {
+                "model": self.model_name,
+                "latency_budget_ms": self.latency_budget_ms,
+                "calls": self.calls,
+                "skipped": self.skipped,
+                "failures": self.failures,
+                "cache_entries": len(self._scores),
+                "cache_hit_rate": round(self.cache_hits / lookups, 3) if lookups else 0.0,
+                "pair_ms": pair_ms,
+            }
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(int(p * len(latencies)), len(latencies) - 1)] * 1000, 2)
+
+        stats["latency_ms_p50"] = percentile(0.50)
+        stats["latency_ms_p95"] = percentile(0.95)
+        return stats
@@ -0,0 +1,261 @@
+"""
+Retrieval Client - Thin VectorStore Stand-In for Web Workers
+Talks to retrieval_service.py, so workers never load the model or the index
+"""
+
+import logging
+import socket
+import threading
+
+import numpy as np
+from langchain_core.documents import Document
+
+from retrieval_protocol import parse_address, send_message, recv_message, document_to_dict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_REQUEST_TIMEOUT = 300.0  # add_documents / compact can take a while on large batches
+
+# Operations that change the store's contents; other changes seen through the version
+# counter came from another client and invalidate everything. They are never retried.
+MUTATING_OPS = {"add_documents", "remove_by_source", "prune_source", "clear_all"}
+
+
+class RetrievalServiceError(Exception):
+    """Raised when the retrieval service reports a failed operation."""
+
+
+class RetrievalConnection:
+    """One socket per calling thread, reconnecting once if the service restarted."""
+
+    def __init__(self, address, connect_timeout=DEFAULT_CONNECT_TIMEOUT, request_timeout=DEFAULT_REQUEST_TIMEOUT):
+        self.address = address
+        self.connect_timeout = connect_timeout
+        self.request_timeout = request_timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        family, address = parse_address(self.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(self.connect_timeout)
+        sock.connect(address)
+        sock.settimeout(self.request_timeout)
+        self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+
+    def call(self, op, args=None, vectors=None):
+        """Send one request; returns (header, vectors) of the response"""
+        for attempt in range(2):
+            sock = getattr(self._local, "sock", None) or self._connect()
+            try:
+                send_message(sock, {"op": op, "args": args or {}}, vectors)
+                header, result_vectors = recv_message(sock)
+                if header is None:
+                    raise ConnectionError("Retrieval service closed the connection")
+                return header, result_vectors
+            except (ConnectionError, OSError):
+                self._close()
+                # Only retry reads; a write may already have been applied
+                if attempt or op in MUTATING_OPS:
+                    raise
+
+
+class RemoteEmbeddings:
+    """CustomEmbeddings interface backed by the retrieval service."""
+
+    def __init__(self, store):
+        self._store = store
+
+    def embed_queries(self, texts, persist=True):
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        _, vectors = self._store._call("embed", {"texts": list(texts), "persist": persist})
+        return vectors
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        return self.embed_queries(texts).tolist()
+
+    def embed_query(self, text):
+        return self.embed_queries([text])[0].tolist()
+
+    def cache_stats(self):
+        result, _ = self._store._call("cache_stats")
+        return result
+
+    def start_pool(self, num_processes):
+        logger.info("Embedding processes are configured on the retrieval service (--embed-processes)")
+
+    def stop_pool(self):
+        pass
+
+    def __call__(self, text):
+        return self.embed_query(text)
+
+
+class RemoteVectorStore:
+    """
+    VectorStore method signatures over a connection to the retrieval service
+
+    Listeners are notified of this client's own changes with their sources, and
+    of changes made through other clients (seen via the service's version
+    counter) with None.
+    """
+
+    def __init__(self, address, connect_timeout=DEFAULT_CONNECT_TIMEOUT, request_timeout=DEFAULT_REQUEST_TIMEOUT):
+        self.address = address
+        self._connection = RetrievalConnection(address, connect_timeout, request_timeout)
+        self.embeddings = RemoteEmbeddings(self)
+        self._listeners = []
+        self._version = None
+        self._epoch = None
+        self._version_lock = threading.Lock()
+        logger.info(f"Using retrieval service at {address}")
+
+    def add_listener(self, listener):
+        """Register a callback notified with the affected sources whenever the store changes."""
+        self._listeners.append(listener)
+
+    def _notify(self, sources):
+        for listener in self._listeners:
+            try:
+                listener(sources)
+            except Exception as e:
+                logger.error(f"Vector store listener failed: {str(e)}")
+
+    def _call(self, op, args=None, vectors=None):
+        header, result_vectors = self._connection.call(op, args, vectors)
+        self._track_version(header.get("version"), header.get("epoch"), op in MUTATING_OPS)
+        if not header.get("ok"):
+            raise RetrievalServiceError(header.get("error", "Unknown retrieval service error"))
+        return header.get("result"), result_vectors
+
+    def _track_version(self, version, epoch, own_change):
+        if version is None:
+            return
+        with self._version_lock:
+            if self._version is None or epoch != self._epoch:
+                # First response, or the service restarted and counts from 0 again -
+                # whatever changed across the restart is unknown
+                changed = self._version is not None
+                self._version, self._epoch = version, epoch
+            else:
+                # A jump beyond our own change means another client changed the store
+                changed = version - self._version > (1 if own_change else 0)
+                self._version = max(version, self._version)
+        if changed:
+            self._notify(None)
+
+    @staticmethod
+    def _to_document(data):
+        return Document(page_content=data["page_content"], metadata=data["metadata"])
+
+    def add_documents(self, documents, metadatas=None, embeddings=None, raise_errors=False):
+        if not documents:
+            return 0
+        try:
+            vectors = None if embeddings is None else np.asarray(embeddings, dtype=np.float32)
+            added, _ = self._call(
+                "add_documents",
+                {"documents": [document_to_dict(doc) for doc in documents], "metadatas": metadatas},
+                vectors
+            )
+            self._notify({(metadata or {}).get("source") for metadata in (metadatas or [doc.metadata for doc in documents])})
+            return added
+        except Exception as e:
+            logger.error(f"Error adding documents: {str(e)}")
+            if raise_errors:
+                raise
+            return 0
+
+    def search(self, query, k=5, query_vector=None, nprobe=None, ef_search=None, mode=None):
+        query_vectors = None if query_vector is None else [query_vector]
+        return self.search_many([query], k, query_vectors, nprobe, ef_search, mode)[0]
+
+    def search_many(self, queries, k=5, query_vectors=None, nprobe=None, ef_search=None, mode=None):
+        if not queries:
+            return []
+        try:
+            vectors = None if query_vectors is None else np.asarray(query_vectors, dtype=np.float32)
+            result, _ = self._call(
+                "search_many",
+                {"queries": list(queries), "k": k, "nprobe": nprobe, "ef_search": ef_search, "mode": mode},
+                vectors
+            )
+            return [[self._to_document(doc) for doc in docs] for docs in result]
+        except Exception as e:
+            logger.error(f"Error in similarity search: {str(e)}")
+            return [[] for _ in queries]
+
+    def search_with_scores(self, query, k=5, query_vector=None, nprobe=None, ef_search=None):
+        try:
+            vectors = None if query_vector is None else np.asarray([query_vector], dtype=np.float32)
+            result, _ = self._call(
+                "search_with_scores", {"query": query, "k": k, "nprobe": nprobe, "ef_search": ef_search}, vectors
+            )
+            return [(self._to_document(doc), score) for doc, score in result]
+        except Exception as e:
+            logger.error(f"Error in search with scores: {str(e)}")
+            return []
+
+    def get_retriever(self, search_kwargs=None):
+        if self.is_empty():
+            return None
+        from vector_store import _StoreRetriever  # Only needed by LangChain chains
+        return _StoreRetriever(store=self, k=(search_kwargs or {}).get("k", 5))
+
+    def is_empty(self):
+        result, _ = self._call("is_empty")
+        return result
+
+    def list_sources(self):
+        try:
+            result, _ = self._call("list_sources")
+            return result
+        except Exception as e:
+            logger.error(f"Error listing sources: {str(e)}")
+            return []
+
+    def compact(self, rebuild=False):
+        self._call("compact", {"rebuild": rebuild})
+
+    def migrate_index(self, index_type):
+        self._call("migrate_index", {"index_type": index_type})
+
+    def save(self):
+        self.compact()
+
+    def clear_all(self):
+        self._call("clear_all")
+        self._notify(None)
+
+    def prune_source(self, source, keep_hashes):
+        try:
+            result, _ = self._call("prune_source", {"source": source, "keep_hashes": sorted(keep_hashes)})
+            if result:
+                self._notify({source})
+            return result
+        except Exception as e:
+            logger.error(f"Error pruning source: {str(e)}")
+            return 0
+
+    def remove_by_source(self, source_path):
+        try:
+            result, _ = self._call("remove_by_source", {"source_path": source_path})
+            if result:
+                self._notify({source_path})
+            return result
+        except Exception as e:
+            logger.error(f"Error removing documents by source: {str(e)}")
+            return 0
@@ -0,0 +1,70 @@
+"""
+Retrieval Service Protocol - Framing Shared by Server and Client
+Each message is a JSON header plus an optional raw float32 matrix
+"""
+
+import json
+import socket
+import struct
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+# Frame: !II (header bytes, payload bytes), UTF-8 JSON header, then the payload.
+# A payload is a C-ordered little-endian float32 matrix whose shape is header["shape"].
+FRAME_PREFIX = struct.Struct("!II")
+MAX_HEADER_BYTES = 64 * 1024 * 1024
+
+
+def parse_address(address: str):
+    """Return (family, address) for "tcp://host:port" or a Unix socket path"""
+    if address.startswith("tcp://"):
+        host, _, port = address[len("tcp://"):].rpartition(":")
+        return socket.AF_INET, (host or "127.0.0.1", int(port))
+    return socket.AF_UNIX, address
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:], size - received)
+        if not count:
+            raise ConnectionError("Connection closed mid-message")
+        received += count
+    return bytes(buffer)
+
+
+def send_message(sock: socket.socket, header: Dict[str, Any], vectors: Optional[np.ndarray] = None):
+    """Send one frame; vectors travel as raw float32 rather than JSON numbers"""
+    payload = b""
+    if vectors is not None:
+        vectors = np.ascontiguousarray(vectors, dtype="<f4")
+        header = {**header, "shape": list(vectors.shape)}
+        payload = vectors.tobytes()
+    header_bytes = json.dumps(header, default=str).encode("utf-8")
+    sock.sendall(FRAME_PREFIX.pack(len(header_bytes), len(payload)) + header_bytes + payload)
+
+
+def recv_message(sock: socket.socket) -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray]]:
+    """Receive one frame; returns (None, None) when the peer closed the connection cleanly"""
+    prefix = sock.recv(FRAME_PREFIX.size, socket.MSG_WAITALL)
+    if not prefix:
+        return None, None
+    if len(prefix) < FRAME_PREFIX.size:
+        prefix += _recv_exact(sock, FRAME_PREFIX.size - len(prefix))
+
+    header_size, payload_size = FRAME_PREFIX.unpack(prefix)
+    if header_size > MAX_HEADER_BYTES:
+        raise ValueError(f"Message header too large ({header_size} bytes)")
+
+    header = json.loads(_recv_exact(sock, header_size).decode("utf-8"))
+    vectors = None
+    if payload_size:
+        vectors = np.frombuffer(_recv_exact(sock, payload_size), dtype="<f4").reshape(header["shape"])
+    return header, vectors
+
+
+def document_to_dict(doc) -> Dict[str, Any]:
+    return {"page_content": doc.page_content, "metadata": doc.metadata}
@@ -0,0 +1,260 @@
+"""
+Retrieval Service - One Process Owning the Embedding Model and Index
+Web workers connect with RemoteVectorStore; concurrent requests are batched
+
+Usage:
+    python retrieval_service.py --socket /tmp/rag-retrieval.sock
+    python retrieval_service.py --socket tcp://127.0.0.1:7601
+"""
+
+import argparse
+import logging
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+import numpy as np
+from langchain_core.documents import Document
+
+from retrieval_protocol import parse_address, send_message, recv_message, document_to_dict
+from vector_store import VectorStore, DEFAULT_ENCODE_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Requests arriving within this window of each other share one encode / FAISS call
+BATCH_WINDOW_SECONDS = 0.002
+MAX_BATCH_REQUESTS = 256
+
+
+class RequestBatcher:
+    """
+    Collects requests from many connection threads and runs them through one call
+
+    run_batch(items) must return one result per item, in order.
+    """
+
+    def __init__(self, name, run_batch, window=BATCH_WINDOW_SECONDS, max_requests=MAX_BATCH_REQUESTS):
+        self.run_batch = run_batch
+        self.window = window
+        self.max_requests = max_requests
+        self._queue = queue.Queue()
+        threading.Thread(target=self._loop, name=f"batcher-{name}", daemon=True).start()
+
+    def submit(self, item):
+        """Queue one request and wait for its result"""
+        future = Future()
+        self._queue.put((item, future))
+        return future.result()
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_requests:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                results = self.run_batch([item for item, _ in batch])
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+
+class RetrievalService:
+    """Serves VectorStore and CustomEmbeddings operations to RemoteVectorStore clients."""
+
+    def __init__(self, db_path="faiss_index", index_type="flat", search_mode="hybrid", embed_processes=0,
+                 embedding_backend="torch", embedding_threads=None, encode_batch_size=DEFAULT_ENCODE_BATCH_SIZE):
+        self.store = VectorStore(
+            db_path, index_type=index_type, search_mode=search_mode,
+            embedding_backend=embedding_backend, embedding_threads=embedding_threads,
+            encode_batch_size=encode_batch_size
+        )
+        if embed_processes > 1:
+            self.store.embeddings.start_pool(embed_processes)
+
+        # The version counts changes since start; the epoch tells clients it restarted
+        self.version = 0
+        self.epoch = uuid.uuid4().hex
+        self._version_lock = threading.Lock()
+        self.store.add_listener(self._on_change)
+
+        self._embed_batcher = RequestBatcher("embed", self._embed_batch)
+        self._transient_embed_batcher = RequestBatcher("embed-transient", self._embed_transient_batch)
+        self._search_batcher = RequestBatcher("search", self._search_batch)
+
+    def _on_change(self, sources):
+        with self._version_lock:
+            self.version += 1
+
+    def _embed_batch(self, text_lists, persist=True):
+        """One encode call for every queued embed request"""
+        texts = [text for texts in text_lists for text in texts]
+        vectors = self.store.embeddings.embed_queries(texts, persist=persist)
+        results, start = [], 0
+        for texts in text_lists:
+            results.append(vectors[start:start + len(texts)])
+            start += len(texts)
+        return results
+
+    def _embed_transient_batch(self, text_lists):
+        """Like _embed_batch, but new vectors aren't written to the disk cache"""
+        return self._embed_batch(text_lists, persist=False)
+
+    def _search_batch(self, requests):
+        """One encode call for all queries without vectors, then one search_many per parameter set"""
+        missing = [query for queries, vectors, _ in requests if vectors is None for query in queries]
+        embedded = self.store.embeddings.embed_queries(missing) if missing else None
+
+        groups = {}
+        offset = 0
+        for index, (queries, vectors, params) in enumerate(requests):
+            if vectors is None:
+                vectors = embedded[offset:offset + len(queries)]
+                offset += len(queries)
+            groups.setdefault(params, []).append((index, queries, vectors))
+
+        results = [None] * len(requests)
+        for (k, nprobe, ef_search, mode), members in groups.items():
+            queries = [query for _, member_queries, _ in members for query in member_queries]
+            vectors = np.concatenate([member_vectors for _, _, member_vectors in members])
+            docs = self.store.search_many(queries, k, vectors, nprobe, ef_search, mode)
+            start = 0
+            for index, member_queries, _ in members:
+                results[index] = docs[start:start + len(member_queries)]
+                start += len(member_queries)
+        return results
+
+    def handle(self, header, vectors):
+        """Run one request; returns (result, result_vectors)"""
+        op = header.get("op")
+        args = header.get("args", {})
+
+        if op == "embed":
+            batcher = self._embed_batcher if args.get("persist", True) else self._transient_embed_batcher
+            return None, batcher.submit(args["texts"])
+        if op == "search_many":
+            params = (args.get("k", 5), args.get("nprobe"), args.get("ef_search"), args.get("mode"))
+            docs = self._search_batcher.submit((args["queries"], vectors, params))
+            return [[document_to_dict(doc) for doc in query_docs] for query_docs in docs], None
+        if op == "search_with_scores":
+            hits = self.store.search_with_scores(
+                args["query"], args.get("k", 5), None if vectors is None else vectors[0],
+                args.get("nprobe"), args.get("ef_search")
+            )
+            return [[document_to_dict(doc), score] for doc, score in hits], None
+        if op == "add_documents":
+            documents = [Document(page_content=d["page_content"], metadata=d["metadata"]) for d in args["documents"]]
+            return self.store.add_documents(documents, args.get("metadatas"), vectors, raise_errors=True), None
+        if op == "remove_by_source":
+            return self.store.remove_by_source(args["source_path"]), None
+        if op == "prune_source":
+            return self.store.prune_source(args["source"], args["keep_hashes"]), None
+        if op == "clear_all":
+            return self.store.clear_all(), None
+        if op == "compact":
+            return self.store.compact(rebuild=args.get("rebuild", False)), None
+        if op == "migrate_index":
+            return self.store.migrate_index(args["index_type"]), None
+        if op == "list_sources":
+            return self.store.list_sources(), None
+        if op == "is_empty":
+            return self.store.is_empty(), None
+        if op == "cache_stats":
+            return self.store.embeddings.cache_stats(), None
+        raise ValueError(f"Unknown operation '{op}'")
+
+
+class _ConnectionHandler(socketserver.BaseRequestHandler):
+    """Serves requests on one persistent client connection until it closes."""
+
+    def handle(self):
+        service = self.server.service
+        while True:
+            try:
+                header, vectors = recv_message(self.request)
+            except (ConnectionError, OSError):
+                return
+            if header is None:
+                return
+
+            try:
+                result, result_vectors = service.handle(header, vectors)
+                response = {"ok": True, "result": result, "version": service.version, "epoch": service.epoch}
+            except Exception as e:
+                logger.error(f"Retrieval service error in {header.get('op')}: {str(e)}")
+                response, result_vectors = {"ok": False, "error": str(e), "version": service.version,
+                                            "epoch": service.epoch}, None
+
+            try:
+                send_message(self.request, response, result_vectors)
+            except (ConnectionError, OSError):
+                return
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve(address, service):
+    """Serve until interrupted"""
+    family, bind_address = parse_address(address)
+    if family == socket.AF_UNIX:
+        if os.path.exists(bind_address):
+            os.remove(bind_address)  # Stale socket from a previous run
+        server = _UnixServer(bind_address, _ConnectionHandler)
+    else:
+        server = _TCPServer(bind_address, _ConnectionHandler)
+
+    server.service = service
+    logger.info(f"Retrieval service listening on {address}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if family == socket.AF_UNIX and os.path.exists(bind_address):
+            os.remove(bind_address)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", default=os.environ.get("RETRIEVAL_SOCKET", "/tmp/rag-retrieval.sock"),
+                        help="Unix socket path, or tcp://host:port")
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "faiss_index"))
+    parser.add_argument("--index-type", default=os.environ.get("INDEX_TYPE", "flat"))
+    parser.add_argument("--search-mode", default=os.environ.get("SEARCH_MODE", "hybrid"))
+    parser.add_argument("--embed-processes", type=int, default=int(os.environ.get("EMBED_PROCESSES", "0")))
+    parser.add_argument("--embed-backend", default=os.environ.get("EMBED_BACKEND", "torch"), help="torch, onnx or int8")
+    parser.add_argument("--embed-threads", type=int, default=int(os.environ.get("EMBED_THREADS", "0")))
+    parser.add_argument("--encode-batch-size", type=int,
+                        default=int(os.environ.get("ENCODE_BATCH_SIZE", str(DEFAULT_ENCODE_BATCH_SIZE))))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    service = RetrievalService(
+        args.db, args.index_type, args.search_mode, args.embed_processes,
+        args.embed_backend, args.embed_threads or None, args.encode_batch_size
+    )
+    serve(args.socket, service)
+
+
+if __name__ == "__main__":
+    main()
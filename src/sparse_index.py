@@ -0,0 +1,296 @@
+"""
+Sparse BM25 Index - Exact-Term Retrieval Alongside FAISS
+Postings live in compact arrays: a memory-mapped snapshot plus an in-memory delta
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Terms in more than this share of documents carry almost no signal and have the
+# longest postings, so they are skipped at query time
+MAX_DF_RATIO = 0.5
+
+# Snapshot once this many documents were indexed since the last one (or 10% of the corpus)
+SNAPSHOT_MIN_NEW_DOCS = 10000
+
+# Snapshots live in their own directories; this pointer file names the current one
+CURRENT_FILE = "current.json"
+SNAPSHOT_PREFIX = "snapshot_"
+
+# Keeps identifiers such as part numbers and error codes (e.g. "xr-200", "0x80070005") whole
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have he her his i if in into is it its
+of on or our she so that the their them then there these they this to was we were
+what when where which who will with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class SparseIndex:
+    """
+    BM25 inverted index keyed by docstore row id
+
+    The snapshot (ids.npy, tfs.npy, offsets.npy, doc_len.npy, terms.json) is
+    opened with mmap so startup doesn't read the postings; documents added
+    since go to per-term delta arrays. Deleted documents get a zero length
+    and are skipped at scoring time until the next snapshot drops them.
+
+    Each snapshot is written to a fresh directory and published by replacing
+    current.json, so processes sharing the index never see a half-written one.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._saves = 0
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self._terms: Dict[str, int] = {}  # term -> slot in offsets (snapshot)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._ids = np.zeros(0, dtype=np.int32)
+        self._tfs = np.zeros(0, dtype=np.uint16)
+        self._delta: Dict[str, Tuple[array, array]] = {}  # term -> (ids, tfs) since the snapshot
+        self._doc_len = np.zeros(1024, dtype=np.int32)  # Indexed by row id; 0 = absent or deleted
+        self._doc_count = 0
+        self._total_len = 0
+        self._max_id = 0  # Highest row id indexed
+        self._snapshot_dir = None
+        self._new_docs = 0
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, self._snapshot_dir, name)
+
+    def _snapshot_dirs(self) -> List[str]:
+        """Complete snapshot directories (meta.json is written last), oldest first"""
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(
+            name for name in os.listdir(self.path)
+            if name.startswith(SNAPSHOT_PREFIX) and os.path.exists(os.path.join(self.path, name, "meta.json"))
+        )
+
+    def _current_snapshot(self):
+        try:
+            with open(os.path.join(self.path, CURRENT_FILE), "r", encoding="utf-8") as f:
+                name = json.load(f)["snapshot"]
+            if os.path.exists(os.path.join(self.path, name, "meta.json")):
+                return name
+        except (OSError, ValueError, KeyError):
+            pass
+        # Missing pointer, or its snapshot was removed by a newer one - use the newest complete one
+        snapshots = self._snapshot_dirs()
+        return snapshots[-1] if snapshots else None
+
+    def _load(self):
+        """Open the current snapshot, if any"""
+        try:
+            self._snapshot_dir = self._current_snapshot()
+            if self._snapshot_dir is None:
+                return
+
+            with open(self._file("meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(self._file("terms.json"), "r", encoding="utf-8") as f:
+                self._terms = {term: slot for slot, term in enumerate(json.load(f))}
+
+            self._offsets = np.load(self._file("offsets.npy"))
+            self._ids = np.load(self._file("ids.npy"), mmap_mode="r")
+            self._tfs = np.load(self._file("tfs.npy"), mmap_mode="r")
+            self._doc_len = np.array(np.load(self._file("doc_len.npy")))
+            self._doc_count = meta["doc_count"]
+            self._total_len = meta["total_len"]
+            self._max_id = meta["max_id"]
+
+            logger.info(f"Sparse index loaded: {self._doc_count} documents, {len(self._terms)} terms")
+        except Exception as e:
+            logger.error(f"Failed to load sparse index, starting empty: {str(e)}")
+            self._reset()
+
+    @property
+    def max_id(self) -> int:
+        return self._max_id
+
+    @property
+    def doc_count(self) -> int:
+        return self._doc_count
+
+    def live_ids(self) -> np.ndarray:
+        """Ids of the indexed documents that aren't deleted"""
+        with self._lock:
+            return np.flatnonzero(self._doc_len)
+
+    def add(self, ids: Iterable[int], texts: Iterable[str]):
+        """Index new documents (ids must be new row ids)"""
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                if doc_id < len(self._doc_len) and self._doc_len[doc_id]:
+                    continue  # Already indexed (e.g. caught up from the docstore)
+                counts = Counter(tokenize(text))
+                length = sum(counts.values())
+
+                if doc_id >= len(self._doc_len):
+                    grown = np.zeros(max(doc_id + 1, 2 * len(self._doc_len)), dtype=np.int32)
+                    grown[:len(self._doc_len)] = self._doc_len
+                    self._doc_len = grown
+
+                for term, tf in counts.items():
+                    postings = self._delta.get(term)
+                    if postings is None:
+                        postings = self._delta[term] = (array("i"), array("H"))
+                    postings[0].append(doc_id)
+                    postings[1].append(min(tf, 65535))
+
+                # Empty chunks still count as present, with length 1
+                self._doc_len[doc_id] = max(length, 1)
+                self._doc_count += 1
+                self._total_len += length
+                self._max_id = max(self._max_id, doc_id)
+                self._new_docs += 1
+
+    def delete(self, ids: Iterable[int]):
+        """Mark documents deleted; their postings are dropped at the next snapshot"""
+        with self._lock:
+            for doc_id in ids:
+                if 0 < doc_id < len(self._doc_len) and self._doc_len[doc_id]:
+                    self._doc_count -= 1
+                    self._total_len -= int(self._doc_len[doc_id])
+                    self._doc_len[doc_id] = 0
+
+    def _postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Snapshot + delta postings for a term, without copying the snapshot"""
+        parts_ids, parts_tfs = [], []
+        slot = self._terms.get(term)
+        if slot is not None:
+            start, end = self._offsets[slot], self._offsets[slot + 1]
+            parts_ids.append(self._ids[start:end])
+            parts_tfs.append(self._tfs[start:end])
+        delta = self._delta.get(term)
+        if delta is not None:
+            parts_ids.append(np.frombuffer(delta[0], dtype=np.int32))
+            parts_tfs.append(np.frombuffer(delta[1], dtype=np.uint16))
+
+        if not parts_ids:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.uint16)
+        if len(parts_ids) == 1:
+            return parts_ids[0], parts_tfs[0]
+        return np.concatenate(parts_ids), np.concatenate(parts_tfs)
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Return [(id, bm25 score)] best-first"""
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        with self._lock:
+            if not self._doc_count:
+                return []
+            avg_len = max(self._total_len / self._doc_count, 1.0)
+            doc_len = self._doc_len
+
+            all_ids, all_scores = [], []
+            for term in terms:
+                ids, tfs = self._postings(term)
+                lengths = doc_len[ids]
+                df = int(np.count_nonzero(lengths))  # Deleted postings stay until the next snapshot
+                if not df or df > MAX_DF_RATIO * self._doc_count:
+                    continue
+
+                idf = math.log(1 + (self._doc_count - df + 0.5) / (df + 0.5))
+                tfs = tfs.astype(np.float32)
+                scores = idf * tfs * (BM25_K1 + 1) / (tfs + BM25_K1 * (1 - BM25_B + BM25_B * lengths / avg_len))
+                scores[lengths == 0] = 0.0  # Deleted documents
+                all_ids.append(ids)
+                all_scores.append(scores)
+
+        if not all_ids:
+            return []
+
+        ids = np.concatenate(all_ids)
+        unique_ids, inverse = np.unique(ids, return_inverse=True)
+        totals = np.bincount(inverse, weights=np.concatenate(all_scores))
+
+        top = np.argpartition(-totals, min(k, len(totals) - 1))[:k]
+        top = top[np.argsort(-totals[top])]
+        return [(int(unique_ids[i]), float(totals[i])) for i in top if totals[i] > 0]
+
+    def should_snapshot(self) -> bool:
+        return self._new_docs >= max(SNAPSHOT_MIN_NEW_DOCS, self._doc_count // 10)
+
+    def save(self):
+        """Write a new snapshot merging delta postings and dropping deleted documents"""
+        with self._lock:
+            terms = sorted(set(self._terms) | set(self._delta))
+            doc_len = self._doc_len.copy()
+            live = doc_len > 0
+
+            offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+            id_parts, tf_parts = [], []
+            for slot, term in enumerate(terms):
+                ids, tfs = self._postings(term)
+                keep = live[ids]
+                id_parts.append(np.asarray(ids[keep], dtype=np.int32))
+                tf_parts.append(np.asarray(tfs[keep], dtype=np.uint16))
+                offsets[slot + 1] = offsets[slot] + int(keep.sum())
+
+            kept_terms = [term for slot, term in enumerate(terms) if offsets[slot + 1] > offsets[slot]]
+            meta = {"doc_count": self._doc_count, "total_len": self._total_len, "max_id": self._max_id}
+
+            # Private directory first, then publish it by replacing the pointer
+            # Never rewrite a directory in place - this process may have it mapped
+            self._saves += 1
+            self._snapshot_dir = f"{SNAPSHOT_PREFIX}{self._max_id:012d}_{os.getpid()}_{self._saves:06d}"
+            os.makedirs(os.path.join(self.path, self._snapshot_dir), exist_ok=True)
+            arrays = {
+                "ids.npy": np.concatenate(id_parts) if id_parts else np.zeros(0, dtype=np.int32),
+                "tfs.npy": np.concatenate(tf_parts) if tf_parts else np.zeros(0, dtype=np.uint16),
+                "offsets.npy": np.concatenate([[0], offsets[1:][offsets[1:] > offsets[:-1]]]).astype(np.int64),
+                "doc_len.npy": doc_len[:self._max_id + 1],
+            }
+            for name, values in arrays.items():
+                np.save(self._file(name), values)
+            for name, payload in (("terms.json", kept_terms), ("meta.json", meta)):
+                with open(self._file(name), "w", encoding="utf-8") as f:
+                    json.dump(payload, f)
+
+            current_file = os.path.join(self.path, CURRENT_FILE)
+            with open(current_file + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"snapshot": self._snapshot_dir}, f)
+            os.replace(current_file + ".tmp", current_file)
+
+            # Older snapshots may still be mapped by other processes; unlinking them is safe
+            for name in self._snapshot_dirs():
+                if name < self._snapshot_dir:
+                    shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+            self._new_docs = 0
+            self._delta = {}
+            self._load()
+            logger.info(f"Saved sparse index snapshot with {len(kept_terms)} terms")
+
+    def clear(self):
+        with self._lock:
+            if os.path.isdir(self.path):
+                shutil.rmtree(self.path, ignore_errors=True)
+            self._reset()
@@ -0,0 +1,113 @@
+"""
+Store Locks - Reader/Writer Locking Within and Across Processes
+Lets several gunicorn workers share one index directory safely
+"""
+
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows - cross-process locking is unavailable
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class ReadWriteLock:
+    """
+    Many concurrent readers or one writer, with writers preferred
+
+    The writing thread may re-enter both sides (a write path can call read
+    helpers); read locks themselves must not be nested, since a queued writer
+    would block the inner acquire.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None  # Owning thread id
+        self._depth = 0
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._depth += 1
+            else:
+                while self._writer is not None or self._writers_waiting:
+                    self._cond.wait()
+                self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                if self._writer == me:
+                    self._depth -= 1
+                else:
+                    self._readers -= 1
+                    if not self._readers:
+                        self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._depth += 1
+            else:
+                self._writers_waiting += 1
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+                self._writers_waiting -= 1
+                self._writer = me
+                self._depth = 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._depth -= 1
+                if not self._depth:
+                    self._writer = None
+                    self._cond.notify_all()
+
+
+class FileLock:
+    """
+    flock-based lock shared by every process opening the same index directory
+
+    Re-entrant within the owning thread; the first acquire decides whether
+    the lock is shared or exclusive.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.RLock()  # flock doesn't exclude threads sharing the fd
+        self._fd = None
+        self._depth = 0
+
+    @contextmanager
+    def _locked(self, mode):
+        with self._thread_lock:
+            if not self._depth and fcntl is not None:
+                if self._fd is None:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, mode)
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if not self._depth and fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def exclusive(self):
+        return self._locked(fcntl.LOCK_EX if fcntl else None)
+
+    def shared(self):
+        return self._locked(fcntl.LOCK_SH if fcntl else None)
@@ -0,0 +1,91 @@
+"""
+Float Vector File - Full-Precision Embeddings on Disk
+Row (id - 1) holds the vector for docstore row id, read through a memory map
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class FloatVectorFile:
+    """
+    Append-mostly float32 matrix addressed by docstore row id
+
+    Row ids are never reused, so a vector's offset is fixed for its lifetime;
+    rows of deleted chunks are simply never read again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._meta_file = path + ".json"
+        self.dim: Optional[int] = None
+        self._matrix = None  # Memory map, reopened when the file grows
+        self._lock = threading.Lock()
+        self._load_dim()
+
+    def _load_dim(self) -> Optional[int]:
+        """Read dim once the file exists - another process may have created it after we opened"""
+        if self.dim is None and os.path.exists(self._meta_file):
+            try:
+                with open(self._meta_file, "r", encoding="utf-8") as f:
+                    self.dim = json.load(f)["dim"]
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read {self._meta_file}: {str(e)}")
+        return self.dim
+
+    @property
+    def exists(self) -> bool:
+        return self._load_dim() is not None and os.path.exists(self.path)
+
+    def _rows(self) -> int:
+        return os.path.getsize(self.path) // (self.dim * 4) if self.exists else 0
+
+    def write(self, ids: List[int], vectors):
+        """Store vectors at their ids' rows (contiguous ids become one write)"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        ids = [int(i) for i in ids]
+        if not ids:
+            return
+
+        with self._lock:
+            if self._load_dim() is None:
+                self.dim = int(vectors.shape[1])
+                tmp_file = self._meta_file + ".tmp"
+                with open(tmp_file, "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim}, f)
+                os.replace(tmp_file, self._meta_file)
+
+            mode = "r+b" if os.path.exists(self.path) else "w+b"
+            with open(self.path, mode) as f:
+                start = 0
+                for end in range(1, len(ids) + 1):
+                    if end == len(ids) or ids[end] != ids[end - 1] + 1:
+                        f.seek((ids[start] - 1) * self.dim * 4)
+                        f.write(vectors[start:end].tobytes())
+                        start = end
+
+    def read(self, ids) -> np.ndarray:
+        """Fetch vectors for ids (rows never written read back as zeros)"""
+        rows = np.asarray(ids, dtype=np.int64) - 1
+        with self._lock:
+            if self._load_dim() is None:
+                raise FileNotFoundError(f"{self.path} has not been written yet")
+            if self._matrix is None or (len(rows) and rows.max() >= self._matrix.shape[0]):
+                self._matrix = np.memmap(self.path, dtype=np.float32, mode="r", shape=(self._rows(), self.dim))
+            matrix = self._matrix
+        return np.array(matrix[rows])
+
+    def clear(self):
+        with self._lock:
+            self._matrix = None
+            for file_path in (self.path, self._meta_file):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+            self.dim = None
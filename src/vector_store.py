@@ -1,54 +1,211 @@
-from langchain_community.vectorstores import FAISS
-from sentence_transformers import SentenceTransformer
+from langchain_core.retrievers import BaseRetriever
+from embedding_cache import EmbeddingCache
+from embedding_backends import DEFAULT_COSINE_TOLERANCE, load_checked_model
+from doc_store import SQLiteDocStore, content_hash
+from vector_file import FloatVectorFile
+from sparse_index import SparseIndex
+from store_lock import ReadWriteLock, FileLock
+from index_factory import (
+    INDEX_TYPES, new_index, build_index, effective_index_type, supports_incremental, search_parameters,
+    RESCORE_FACTOR, needs_rescoring, is_binary, add_vectors, search_index, read_index, write_index
+)
+from contextlib import contextmanager
+from typing import Any
+import numpy as np
+import threading
 import logging
+import faiss
+import json
 import os
 
 logger = logging.getLogger(__name__)
 
-# Global model cache to prevent reloading
+# On-disk layout: a memory-mapped base index named by the manifest, chunk
+# text/metadata in SQLite, and a write-ahead log of segments that are folded
+# into a new base index in the background
+DOCSTORE_FILE = "docstore.sqlite"
+VECTORS_FILE = "vectors.f32"  # Full-precision vectors, the source for index rebuilds
+SEGMENTS_DIR = "segments"
+MANIFEST_FILE = "manifest.json"
+COMPACT_SEGMENT_THRESHOLD = 16  # Compact once this many segments are pending
+COMPACT_TOMBSTONE_THRESHOLD = 10000  # ...or once this many deleted ids are masked
+
+# Several processes (e.g. gunicorn workers) may share one index directory: writers
+# take an exclusive flock on LOCK_FILE and bump the stamp in VERSION_FILE, which
+# readers stat before each search to pick up other workers' changes
+LOCK_FILE = ".lock"
+VERSION_FILE = "version.json"
+
+# Files written by earlier versions (LangChain FAISS.save_local)
+LEGACY_INDEX_FILE = "index.faiss"
+LEGACY_PICKLE_FILE = "index.pkl"
+
+# BM25 postings for exact-term matches (part numbers, error codes), fused with dense hits
+SPARSE_DIR = "sparse"
+SEARCH_MODES = ("hybrid", "dense", "sparse")
+RRF_K = 60  # Reciprocal-rank fusion constant: score = sum(weight / (RRF_K + rank))
+DENSE_WEIGHT = 1.0
+SPARSE_WEIGHT = 1.0
+HYBRID_FETCH_FACTOR = 4  # Candidates per retriever = k * factor
+
+# Embedding cache lives next to the index and survives clear_all / remove_by_source
+EMBEDDING_CACHE_DIR = "embedding_cache"
+
+# Encoder batching - small calls (queries) always stay in-process
+DEFAULT_ENCODE_BATCH_SIZE = 32
+MIN_POOL_BATCH = 64
+
+# Global model cache to prevent reloading, keyed by (model_name, backend)
 _model_cache = {}
+_model_lock = threading.Lock()
 
 class CustomEmbeddings:
     """Custom embeddings wrapper using sentence-transformers with caching."""
     
-    def __init__(self, model_name="all-MiniLM-L6-v2"):
-        # Use cached model if available
-        if model_name not in _model_cache:
-            logger.info(f"Loading embedding model: {model_name}")
-            _model_cache[model_name] = SentenceTransformer(model_name)
-        else:
-            logger.info(f"Using cached embedding model: {model_name}")
-        
-        self.model = _model_cache[model_name]
+    def __init__(self, model_name="all-MiniLM-L6-v2", cache_dir=None, backend="torch", threads=None,
+                 batch_size=DEFAULT_ENCODE_BATCH_SIZE, tolerance=DEFAULT_COSINE_TOLERANCE):
+        # The model is loaded on first encode, so cache hits never pay for torch
         self.model_name = model_name
+        self.backend = backend  # torch, onnx or int8
+        self.active_backend = None  # Backend actually loaded (falls back to torch if the guard fails)
+        self.threads = threads
+        self.tolerance = tolerance
+        
+        # Persistent content-addressed cache - only misses reach the model. ONNX / int8
+        # vectors differ slightly from torch's, so they are cached under their own namespace
+        self.cache_dir = cache_dir
+        self.cache = EmbeddingCache(cache_dir, self._namespace(backend)) if cache_dir else None
+        
+        # Optional multi-process encode pool for large ingests
+        self.batch_size = batch_size
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        
+    def _namespace(self, backend):
+        return self.model_name if backend == "torch" else f"{self.model_name}:{backend}"
+    
+    @property
+    def model(self):
+        """The SentenceTransformer, imported and loaded on first use (shared across instances)."""
+        key = (self.model_name, self.backend)
+        if key not in _model_cache:
+            with _model_lock:
+                if key not in _model_cache:
+                    logger.info(f"Loading embedding model: {self.model_name} ({self.backend})")
+                    _model_cache[key] = load_checked_model(self.model_name, self.backend, self.threads, self.tolerance)
+        model, self.active_backend = _model_cache[key]
+        
+        # A backend that fell back to torch must read and write torch's cache, not its own
+        namespace = self._namespace(self.active_backend)
+        if self.cache is not None and self.cache.namespace != namespace:
+            logger.info(f"Embedding cache switched to {namespace} after falling back from {self.backend}")
+            self.cache = EmbeddingCache(self.cache_dir, namespace)
+        return model
+    
+    def warm_up(self):
+        """Load the model and run one encode so the first real query doesn't pay for it."""
+        self._encode(["warm-up"])
+    
+    def start_pool(self, num_processes):
+        """Start a pool of CPU worker processes that large encode calls are spread across."""
+        with self._pool_lock:
+            if self._pool is None and num_processes > 1:
+                logger.info(f"Starting embedding pool with {num_processes} CPU processes")
+                self._pool = self.model.start_multi_process_pool(target_devices=["cpu"] * num_processes)
+    
+    def stop_pool(self):
+        """Stop the worker processes started by start_pool."""
+        with self._pool_lock:
+            if self._pool is not None:
+                self.model.stop_multi_process_pool(self._pool)
+                self._pool = None
+        
+    def _encode(self, texts):
+        with self._pool_lock:
+            # The pool's queues are shared, so calls through it must not interleave
+            if self._pool is not None and len(texts) >= MIN_POOL_BATCH:
+                vectors = self.model.encode_multi_process(texts, self._pool, batch_size=self.batch_size)
+                return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        return self.model.encode(texts, batch_size=self.batch_size, normalize_embeddings=True)
+    
+    def _embed(self, texts, persist=True):
+        """Embed texts through the cache, batching all misses into one encode call."""
+        cache = self.cache
+        if cache is None:
+            return np.asarray(self._encode(texts), dtype=np.float32)
+        
+        vectors, keys = cache.get_many(texts)
+        
+        # Encode each distinct missing text once, even if it repeats within the batch
+        missing = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(keys[i], texts[i])
+        
+        if missing:
+            self.model  # Loaded before encoding - a backend that falls back to torch switches the cache
+            if self.cache is not cache:
+                # These hits came from the requested backend's namespace, so look up again
+                return self._embed(texts, persist)
+            encoded = self._encode(list(missing.values()))
+            cache.put_many(list(missing.keys()), encoded, persist=persist)
+            encoded_by_key = dict(zip(missing.keys(), encoded))
+            vectors = [encoded_by_key[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+        
+        return np.asarray(vectors, dtype=np.float32)
         
     def embed_documents(self, texts):
         """Embed a list of documents."""
-        return self.model.encode(texts, normalize_embeddings=True).tolist()
+        if not texts:
+            return []
+        return self._embed(texts).tolist()
     
     def embed_query(self, text):
         """Embed a single query."""
-        return self.model.encode([text], normalize_embeddings=True)[0].tolist()
+        return self._embed([text])[0].tolist()
+    
+    def embed_queries(self, texts, persist=True):
+        """Embed many queries as one matrix (a single encode call for all cache misses).
+        
+        With persist=False new vectors are only kept in the cache's memory
+        tier - for throwaway text such as the sentences of a prompt.
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return self._embed(texts, persist=persist)
+    
+    def cache_stats(self):
+        """Return embedding cache hit/miss counters."""
+        backend = {"backend": self.active_backend or self.backend, "batch_size": self.batch_size}
+        if self.cache is None:
+            return {"enabled": False, **backend}
+        return {"enabled": True, **backend, **self.cache.get_stats()}
     
     def __call__(self, text):
         """Make the object callable for FAISS compatibility."""
         return self.embed_query(text)
 
+class _StoreRetriever(BaseRetriever):
+    """Minimal LangChain retriever over VectorStore.search."""
+    
+    store: Any
+    k: int = 5
+    
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return self.store.search(query, k=self.k)
+
 class VectorStore:
     """Optimized FAISS-based vector store for better performance."""
     
     # Class-level cache for embeddings to prevent reinitialization
     _embeddings_instance = None
     
-    def __init__(self, db_path: str = "faiss_index"):
-        # Use class-level cached embeddings instance
-        if VectorStore._embeddings_instance is None:
-            logger.info("Creating new embeddings instance for VectorStore")
-            VectorStore._embeddings_instance = CustomEmbeddings("all-MiniLM-L6-v2")
-        else:
-            logger.info("Reusing cached embeddings instance for VectorStore")
-            
-        self.embeddings = VectorStore._embeddings_instance
+    def __init__(self, db_path: str = "faiss_index", index_type: str = "flat", search_mode: str = "hybrid",
+                 embedding_backend: str = "torch", embedding_threads=None, encode_batch_size=DEFAULT_ENCODE_BATCH_SIZE):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{search_mode}', expected one of {SEARCH_MODES}")
         
         # Adjust db_path based on current working directory
         # If we're in src/, look for faiss_index in parent directory
@@ -56,190 +213,876 @@ class VectorStore:
             self.db_path = os.path.join("..", db_path)
         else:
             self.db_path = db_path
+        
+        # Use class-level cached embeddings instance
+        if VectorStore._embeddings_instance is None:
+            logger.info("Creating new embeddings instance for VectorStore")
+            VectorStore._embeddings_instance = CustomEmbeddings(
+                "all-MiniLM-L6-v2",
+                cache_dir=os.path.join(self.db_path, EMBEDDING_CACHE_DIR),
+                backend=embedding_backend,
+                threads=embedding_threads,
+                batch_size=encode_batch_size
+            )
+        else:
+            logger.info("Reusing cached embeddings instance for VectorStore")
             
-        self.vector_store = None
+        self.embeddings = VectorStore._embeddings_instance
+        
+        self.index_type = index_type  # Requested base index type; IVF stays flat until trained
+        self.search_mode = search_mode
+        self.docstore = None
+        self._vector_file = FloatVectorFile(os.path.join(self.db_path, VECTORS_FILE))
+        self._sparse = SparseIndex(os.path.join(self.db_path, SPARSE_DIR))
+        self._lock = ReadWriteLock()  # Searches share it; changes and refreshes hold it exclusively
+        self._file_lock = FileLock(os.path.join(self.db_path, LOCK_FILE))  # Writers across processes
+        self._version = None  # Version stamp the in-memory state reflects
+        self._version_stat = None  # (inode, mtime, size) of the version file when last checked
+        self._compact_lock = threading.Lock()  # One compaction at a time
+        self._compacting = False
+        self._generation = 0  # Bumped whenever the base is replaced, so in-flight compactions can tell
+        self._reset_state()
+        self._listeners = []  # Called as listener(sources) after changes; None means everything
         self._load_or_create()
 
+    def add_listener(self, listener):
+        """Register a callback notified with the affected sources whenever the store changes."""
+        self._listeners.append(listener)
+
+    def _notify(self, sources):
+        for listener in self._listeners:
+            try:
+                listener(sources)
+            except Exception as e:
+                logger.error(f"Vector store listener failed: {str(e)}")
+
+    def _reset_state(self):
+        """Forget the in-memory index state (the files on disk are untouched)."""
+        self._base = None  # Compacted index, memory-mapped and never mutated
+        self._base_file = None
+        self._base_type = "flat"
+        self._delta = None  # In-memory index of vectors logged since the last compaction
+        self._tombstones = frozenset()  # Deleted ids still present in the base index
+        self._base_segment = 0  # Last segment folded into the base
+        self._last_segment = 0  # Last segment applied in memory
+        self._pending_segments = []
+        self._next_segment = 1
+        self._generation += 1
+
     def _load_or_create(self):
-        """Load existing FAISS index or create new one."""
+        """Open the docstore and base index, then replay logged segments."""
+        with self._lock.write(), self._file_lock.exclusive():
+            try:
+                os.makedirs(self.db_path, exist_ok=True)
+                self.docstore = SQLiteDocStore(os.path.join(self.db_path, DOCSTORE_FILE))
+                
+                if os.path.exists(os.path.join(self.db_path, LEGACY_PICKLE_FILE)):
+                    self._migrate_legacy_index()
+                
+                self._open_base(self._read_manifest())
+                if self._base is not None:
+                    logger.info(f"Opened {self._base_type} FAISS index from {self.db_path} ({self._base.ntotal} vectors)")
+                    
+                    if not self._vector_file.exists and self._base.ntotal:
+                        self._backfill_vector_file()
+                else:
+                    # No existing base index found
+                    logger.info("FAISS index will be created when first documents are added")
+                
+            except Exception as e:
+                logger.error(f"Failed to load FAISS index: {str(e)}")
+                self._base = None
+            
+            self._replay_segments(cleanup=True)
+            self._catch_up_sparse()
+            self._version = self._read_version()
+        
+        if self._base is not None and effective_index_type(self.index_type, self.docstore.count()) != self._base_type:
+            # Configured index type changed (or IVF is now large enough to train)
+            logger.info(f"Migrating {self._base_type} base index to {self.index_type} in the background")
+            self._start_compaction(rebuild=True)
+
+    def _open_base(self, manifest):
+        """Switch to the base index named by the manifest; its segments are replayed separately."""
+        self._reset_state()
+        if manifest.get("index_file"):
+            self._base_type = manifest.get("index_type", "flat")
+            self._base = self._read_base(os.path.join(self.db_path, manifest["index_file"]), self._base_type)
+            self._base_file = manifest["index_file"]
+        self._base_segment = self._last_segment = manifest.get("base_segment", 0)
+
+    # Cross-process versioning
+
+    def _version_path(self):
+        return os.path.join(self.db_path, VERSION_FILE)
+
+    def _read_version(self):
         try:
-            # Check for the FAISS index files directly in the db_path directory
-            # FAISS.load_local expects the directory path, and internally adds "index" to find index.faiss and index.pkl
-            faiss_file = os.path.join(self.db_path, "index.faiss")
-            pkl_file = os.path.join(self.db_path, "index.pkl")
-            
-            if os.path.exists(faiss_file) and os.path.exists(pkl_file):
-                # Pass just the db_path - FAISS will look for index.faiss and index.pkl in that directory
-                self.vector_store = FAISS.load_local(
-                    self.db_path, 
-                    self.embeddings,
-                    allow_dangerous_deserialization=True
-                )
-                logger.info(f"Loaded existing FAISS index from {self.db_path}")
-                return
+            with open(self._version_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"version": 0, "epoch": 0}
+
+    def _bump_version(self, new_epoch=False):
+        """Publish a change to other processes; the caller holds the exclusive file lock.
+        
+        new_epoch tells readers to drop everything (the store was cleared).
+        """
+        stamp = self._read_version()
+        stamp = {"version": stamp["version"] + 1, "epoch": stamp["epoch"] + (1 if new_epoch else 0)}
+        tmp_file = self._version_path() + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(stamp, f)
+        os.replace(tmp_file, self._version_path())
+        self._version = stamp
+        
+        # Our own change is already applied, so searches needn't re-check it
+        st = os.stat(self._version_path())
+        self._version_stat = (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _maybe_refresh(self):
+        """Pick up changes made by other processes; a single stat() when nothing changed."""
+        try:
+            st = os.stat(self._version_path())
+            version_stat = (st.st_ino, st.st_mtime_ns, st.st_size)
+        except OSError:
+            version_stat = None
+        if version_stat == self._version_stat:
+            return
+        
+        with self._lock.write(), self._file_lock.shared():
+            changed = self._refresh()
+            self._version_stat = version_stat
+        if changed:
+            self._notify(None)
+
+    def _refresh(self):
+        """Bring the in-memory state up to the on-disk version (caller holds both locks).
+        
+        New segments are applied incrementally; a new base index (another process
+        compacted) is memory-mapped in place of the old one. Returns True if anything changed.
+        """
+        stamp = self._read_version()
+        if stamp == self._version:
+            return False
+        
+        try:
+            if self._version is not None and stamp["epoch"] != self._version["epoch"]:
+                # Another process cleared the store
+                self._reset_state()
+                self._vector_file = FloatVectorFile(os.path.join(self.db_path, VECTORS_FILE))
+                self._sparse = SparseIndex(os.path.join(self.db_path, SPARSE_DIR))
             
-            # No existing index found
-            self.vector_store = None
-            logger.info("FAISS index will be created when first documents are added")
+            manifest = self._read_manifest()
+            if manifest.get("index_file") != self._base_file:
+                self._open_base(manifest)
+                logger.info(f"Reloaded {self._base_type} FAISS index {self._base_file} written by another process")
             
+            self._replay_segments()
+            self._catch_up_sparse()
+            self._version = stamp
         except Exception as e:
-            logger.error(f"Failed to load FAISS index: {str(e)}")
-            self.vector_store = None
+            logger.error(f"Failed to refresh FAISS index: {str(e)}")
+        return True
 
-    def add_documents(self, documents, metadatas=None):
-        """Add documents to the vector store with optimized batching."""
-        if not documents:
+    @contextmanager
+    def _writing(self):
+        """Exclusive access across threads and processes, starting from the latest on-disk state."""
+        with self._lock.write(), self._file_lock.exclusive():
+            if self._refresh():
+                self._notify(None)
+            yield
+
+    def _catch_up_sparse(self):
+        """Index chunks added after the last sparse snapshot (reads text from SQLite, no embedding).
+        
+        Deletes that a compaction folded into the base aren't replayed from segments,
+        so chunks the docstore no longer has are dropped from the BM25 statistics too.
+        """
+        try:
+            added = 0
+            for rows in self.docstore.iter_texts(after_id=self._sparse.max_id):
+                self._sparse.add([doc_id for doc_id, _ in rows], [text for _, text in rows])
+                added += len(rows)
+            if added:
+                logger.info(f"Indexed {added} chunks into the sparse index")
+            
+            # Every stored chunk is indexed by now, so any surplus is deleted chunks
+            if self._sparse.doc_count > self.docstore.count():
+                stale = set(self._sparse.live_ids().tolist()) - set(self.docstore.ids_up_to(self._sparse.max_id))
+                self._sparse.delete(stale)
+                logger.info(f"Dropped {len(stale)} deleted chunks from the sparse index")
+        except Exception as e:
+            logger.error(f"Failed to update sparse index: {str(e)}")
+
+    @staticmethod
+    def _read_base(index_file, index_type):
+        """Open the base index memory-mapped so cold start doesn't scale with the corpus."""
+        return read_index(index_file, index_type, mmap=True)
+
+    def _backfill_vector_file(self):
+        """Write the float vector file for indexes created before it existed (exact bases only)."""
+        if self._base_type != "flat":
+            logger.warning("Cannot backfill float vectors from an approximate index")
             return
         
+        index = read_index(os.path.join(self.db_path, self._read_manifest()["index_file"]), "flat")
+        ids = faiss.vector_to_array(index.id_map).astype(np.int64)
+        order = np.argsort(ids)
+        self._vector_file.write(ids[order], index.index.reconstruct_n(0, index.ntotal)[order])
+        logger.info(f"Backfilled {len(ids)} float vectors into {VECTORS_FILE}")
+
+    def _migrate_legacy_index(self):
+        """One-time conversion of a LangChain index.faiss/index.pkl pair to the native format."""
+        from langchain_community.vectorstores import FAISS
+        
+        logger.info(f"Migrating legacy pickled FAISS index in {self.db_path}")
+        legacy = FAISS.load_local(self.db_path, self.embeddings, allow_dangerous_deserialization=True)
+        
+        # Fold in any segments logged by the legacy layout before converting
+        legacy_base_segment = self._read_manifest().get("base_segment", 0)
+        for seq in self._list_segments():
+            if seq <= legacy_base_segment:
+                self._remove_segment(seq)
+                continue
+            vectors_file, records_file = self._segment_files(seq)
+            with open(records_file, "r", encoding="utf-8") as f:
+                records = json.load(f)
+            if "deleted" in records:
+                legacy.delete([i for i in records["deleted"] if i in legacy.docstore._dict])
+            elif "texts" in records:
+                legacy.add_embeddings(
+                    list(zip(records["texts"], np.load(vectors_file))),
+                    metadatas=records["metadatas"], ids=records["ids"]
+                )
+            self._remove_segment(seq)
+        
+        count = legacy.index.ntotal
+        vectors = legacy.index.reconstruct_n(0, count) if count else np.zeros((0, legacy.index.d), dtype=np.float32)
+        docs = [legacy.docstore.search(legacy.index_to_docstore_id[i]) for i in range(count)]
+        
+        ids = self.docstore.add([doc.page_content for doc in docs], [doc.metadata for doc in docs])
+        index = new_index("flat", legacy.index.d)
+        if count:
+            index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+            self._vector_file.write(ids, vectors)
+        
+        index_file = self._base_file_name(0)
+        write_index(index, os.path.join(self.db_path, index_file))
+        self._write_manifest(0, index_file, "flat")
+        
+        for name in (LEGACY_INDEX_FILE, LEGACY_PICKLE_FILE):
+            os.remove(os.path.join(self.db_path, name))
+        logger.info(f"Migrated {count} documents to {DOCSTORE_FILE} and {index_file}")
+
+    # Write-ahead log helpers
+
+    def _segments_path(self):
+        return os.path.join(self.db_path, SEGMENTS_DIR)
+
+    def _segment_files(self, seq):
+        """Return the (vectors, records) file paths for a segment number.
+        
+        Deletion segments only have a records file listing the removed ids.
+        """
+        base = os.path.join(self._segments_path(), f"segment_{seq:08d}")
+        return base + ".npy", base + ".json"
+
+    @staticmethod
+    def _base_file_name(seq):
+        """Base index files are named after the last segment they contain."""
+        return f"index_{seq:08d}.faiss"
+
+    def _list_segments(self):
+        """List committed segment numbers in log order."""
+        if not os.path.isdir(self._segments_path()):
+            return []
+        
+        seqs = []
+        for name in os.listdir(self._segments_path()):
+            # The .json records file is written last, so it marks a committed segment
+            if name.startswith("segment_") and name.endswith(".json"):
+                try:
+                    seqs.append(int(name[len("segment_"):-len(".json")]))
+                except ValueError:
+                    continue
+        return sorted(seqs)
+
+    def _read_manifest(self):
+        manifest_file = os.path.join(self.db_path, MANIFEST_FILE)
+        if not os.path.exists(manifest_file):
+            return {"base_segment": 0, "index_file": None, "index_type": "flat"}
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_manifest(self, base_segment, index_file, index_type):
+        """Atomically switch to a new base index - this is the compaction commit point."""
+        os.makedirs(self.db_path, exist_ok=True)
+        manifest_file = os.path.join(self.db_path, MANIFEST_FILE)
+        tmp_file = manifest_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"base_segment": base_segment, "index_file": index_file, "index_type": index_type}, f)
+        os.replace(tmp_file, manifest_file)
+
+    def _replay_segments(self, cleanup=False):
+        """Apply segments logged after the last applied one to the in-memory delta.
+        
+        cleanup removes segments already folded into the base (only safe under the exclusive lock).
+        """
+        replayed = 0
         try:
-            if self.vector_store is None:
-                # Create new FAISS index from first batch of documents
-                self.vector_store = FAISS.from_documents(documents, self.embeddings)
-                logger.info(f"Created new FAISS index with {len(documents)} documents")
+            segments = self._list_segments()
+            for seq in segments:
+                if seq <= self._base_segment:
+                    # Already folded into the base index by a compaction that didn't finish cleanup
+                    if cleanup:
+                        self._remove_segment(seq)
+                    continue
+                if seq <= self._last_segment:
+                    continue
+                
+                vectors_file, records_file = self._segment_files(seq)
+                with open(records_file, "r", encoding="utf-8") as f:
+                    records = json.load(f)
+                
+                if "deleted" in records:
+                    self._apply_delete(records["deleted"])
+                else:
+                    vectors = np.load(vectors_file)
+                    if cleanup:
+                        self._vector_file.write(records["ids"], vectors)  # Idempotent; covers older segments
+                    self._apply_vectors(records["ids"], vectors)
+                self._pending_segments.append(seq)
+                self._last_segment = seq
+                replayed += 1
+            
+            if replayed:
+                logger.info(f"Replayed {replayed} logged segments into FAISS index")
+        except Exception as e:
+            logger.error(f"Failed to replay FAISS segments: {str(e)}")
+            segments = []
+        
+        self._next_segment = max([self._last_segment] + segments) + 1
+
+    def _append_segment(self, records, vectors=None):
+        """Persist one ingest or delete batch as a new log segment (cost scales with the batch only)."""
+        seq = self._next_segment
+        self._next_segment += 1
+        
+        os.makedirs(self._segments_path(), exist_ok=True)
+        vectors_file, records_file = self._segment_files(seq)
+        
+        if vectors is not None:
+            np.save(vectors_file, np.asarray(vectors, dtype=np.float32))
+        
+        # Write the records file last and atomically - it commits the segment
+        tmp_file = records_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(records, f)
+        os.replace(tmp_file, records_file)
+        
+        self._pending_segments.append(seq)
+        self._last_segment = seq
+        logger.debug(f"Logged segment {seq}")
+
+    def _remove_segment(self, seq):
+        for file_path in self._segment_files(seq):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+    def _apply_vectors(self, ids, vectors):
+        """Add precomputed embeddings to the in-memory delta index without re-embedding."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self._delta is None:
+            self._delta = new_index("flat", vectors.shape[1])
+        self._delta.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+
+    def _apply_delete(self, ids):
+        """Drop ids from the delta and mask them in the read-only base - nothing is re-embedded."""
+        if self._delta is not None:
+            self._delta.remove_ids(np.asarray(ids, dtype=np.int64))
+        # Copy-on-write so searches can read the set without holding the lock
+        self._tombstones = self._tombstones | frozenset(ids)
+        self._sparse.delete(ids)
+
+    @staticmethod
+    def _first_unknown(hashes, known):
+        """Row of the first occurrence of each content hash not in known."""
+        rows, seen = [], set(known)
+        for row, text_hash in enumerate(hashes):
+            if text_hash not in seen:
+                seen.add(text_hash)
+                rows.append(row)
+        return rows
+
+    def add_documents(self, documents, metadatas=None, embeddings=None, raise_errors=False):
+        """Embed documents, append them to the live index and log them as a segment.
+        
+        Chunks whose content is already stored (under any source) are not
+        embedded or stored again - their source just gains a reference to the
+        existing chunk. Pass embeddings to add vectors that were already
+        computed. Returns the number of chunks newly stored; a failed add
+        returns 0 unless raise_errors is set.
+        """
+        if not documents:
+            return 0
+        
+        try:
+            texts = [doc.page_content for doc in documents]
+            metadatas = metadatas or [dict(doc.metadata) for doc in documents]
+            hashes = [content_hash(text) for text in texts]
+            
+            # Only chunks with unseen content are embedded - the existing index is never rebuilt
+            rows = self._first_unknown(hashes, self.docstore.find_hashes(hashes))
+            if embeddings is not None:
+                vectors = np.asarray(embeddings, dtype=np.float32)[rows]
+            elif rows:
+                vectors = np.asarray(self.embeddings.embed_documents([texts[row] for row in rows]), dtype=np.float32)
+            
+            with self._writing():
+                created = self.is_empty()
+                # Another writer may have stored some of these chunks since the check above
+                known = self.docstore.find_hashes(hashes)
+                new = [position for position, row in enumerate(rows) if hashes[row] not in known]
+                ids = []
+                if new:
+                    new_rows = [rows[position] for position in new]
+                    new_vectors = vectors[new]
+                    ids = self.docstore.add(
+                        [texts[row] for row in new_rows], [metadatas[row] for row in new_rows],
+                        [hashes[row] for row in new_rows]
+                    )
+                    try:
+                        self._vector_file.write(ids, new_vectors)
+                        self._append_segment({"ids": ids}, new_vectors)
+                    except Exception:
+                        # Don't leave rows behind that have no logged vectors
+                        self.docstore.delete(ids)
+                        raise
+                    self._apply_vectors(ids, new_vectors)
+                    self._sparse.add(ids, [texts[row] for row in new_rows])
+                    known.update(zip((hashes[row] for row in new_rows), ids))
+                    self._bump_version()
+                
+                refs = {}
+                for metadata, text_hash in zip(metadatas, hashes):
+                    if metadata.get("source") is not None:
+                        refs.setdefault(metadata["source"], {}).setdefault(known[text_hash], metadata)
+                for source, source_refs in refs.items():
+                    self.docstore.add_refs(source, source_refs)
+            
+            if created:
+                logger.info(f"Created new FAISS index with {len(ids)} documents")
             else:
-                # Add to existing index
-                new_vector_store = FAISS.from_documents(documents, self.embeddings)
-                self.vector_store.merge_from(new_vector_store)
-                logger.debug(f"Added {len(documents)} documents to existing FAISS index")  # Changed to debug
+                logger.debug(f"Added {len(ids)} of {len(documents)} documents to existing FAISS index "
+                             f"({len(documents) - len(ids)} already stored)")
             
-            self.save()
+            self._notify({metadata.get("source") for metadata in metadatas})
+            self._maybe_compact()
+            return len(ids)
         except Exception as e:
             logger.error(f"Error adding documents: {str(e)}")
+            if raise_errors:
+                raise
+            return 0
+
+    def prune_source(self, source, keep_hashes):
+        """Drop source's chunks whose content hash isn't in keep_hashes (changed or vanished text).
+        
+        Chunks still referenced by another source stay. Returns the number of
+        chunks source no longer refers to.
+        """
+        try:
+            with self._writing():
+                keep_hashes = set(keep_hashes)
+                stale = [doc_id for text_hash, doc_id in self.docstore.hashes_for_source(source).items()
+                         if text_hash not in keep_hashes]
+                if not stale:
+                    return 0
+                
+                deleted = self.docstore.release(source, stale)
+                if self.docstore.is_empty():
+                    self.clear_all()
+                elif deleted:
+                    self._apply_delete(deleted)
+                    self._append_segment({"deleted": deleted})
+                    self._bump_version()
+            
+            self._notify({source})
+            self._maybe_compact()
+            logger.info(f"Pruned {len(stale)} stale chunks from source: {source} ({len(deleted)} deleted)")
+            return len(stale)
+        except Exception as e:
+            logger.error(f"Error pruning source: {str(e)}")
+            return 0
+
+    def _maybe_compact(self):
+        """Start a background compaction once enough segments or tombstones have piled up."""
+        with self._lock.read():
+            if self._compacting:
+                return
+            if (len(self._pending_segments) < COMPACT_SEGMENT_THRESHOLD
+                    and len(self._tombstones) < COMPACT_TOMBSTONE_THRESHOLD):
+                return
+        
+        self._start_compaction()
+
+    def _start_compaction(self, rebuild=False):
+        self._compacting = True
+        threading.Thread(
+            target=self._compact_in_background, args=(rebuild,), name="faiss-compactor", daemon=True
+        ).start()
+
+    def _compact_in_background(self, rebuild=False):
+        try:
+            self.compact(rebuild=rebuild)
+        finally:
+            self._compacting = False
+
+    def _search_vector(self, vector, k, nprobe=None, ef_search=None):
+        """Return [(id, distance)] best-first across the base and delta indexes.
+        
+        nprobe (IVF) and ef_search (HNSW) tune the approximate base index per query.
+        """
+        return self._search_vectors([vector], k, nprobe, ef_search)[0]
+
+    def _search_vectors(self, vectors, k, nprobe=None, ef_search=None):
+        """Batched _search_vector: one FAISS call per index for the whole query matrix."""
+        queries = np.asarray(vectors, dtype=np.float32)
+        hits = [[] for _ in range(len(queries))]
+        
+        with self._lock.read():
+            base, base_type, tombstones = self._base, self._base_type, self._tombstones
+            if self._delta is not None and self._delta.ntotal:
+                distances, ids = self._delta.search(queries, min(k, self._delta.ntotal))
+                for row, (row_distances, row_ids) in enumerate(zip(distances, ids)):
+                    hits[row] += [(int(i), float(d)) for d, i in zip(row_distances, row_ids) if i != -1]
+        
+        # The base index is immutable, so it's searched outside the lock
+        if base is not None and base.ntotal:
+            rescore = needs_rescoring(base_type) and self._vector_file.exists
+            candidates = k * RESCORE_FACTOR if rescore else k
+            fetch_k = min(candidates + len(tombstones), base.ntotal)  # Over-fetch to cover masked ids
+            params = search_parameters(base_type, nprobe, ef_search)
+            distances, ids = search_index(base, base_type, queries, fetch_k, params)
+            base_hits = [
+                [(int(i), float(d)) for d, i in zip(row_distances, row_ids) if i != -1 and i not in tombstones][:candidates]
+                for row_distances, row_ids in zip(distances, ids)
+            ]
+            if rescore:
+                base_hits = self._rescore(queries, base_hits)
+            elif is_binary(base_type):
+                # Without vectors.f32 these are Hamming distances, which can't be compared
+                # with the delta's L2 distances - the two lists are fused by rank instead
+                return [self._fuse_hits(row_hits, delta_hits)[:k] for delta_hits, row_hits in zip(hits, base_hits)]
+            for row, row_hits in enumerate(base_hits):
+                hits[row] += row_hits
+        
+        for row_hits in hits:
+            row_hits.sort(key=lambda hit: hit[1])
+        return [row_hits[:k] for row_hits in hits]
+
+    def _fuse_hits(self, *hit_lists):
+        """Merge (id, distance) lists best-first by rank, for distances that can't be compared across lists."""
+        distances = {doc_id: distance for hits in hit_lists for doc_id, distance in hits}
+        fused = self._fuse([(1.0, [doc_id for doc_id, _ in hits]) for hits in hit_lists])
+        return [(doc_id, distances[doc_id]) for doc_id, _ in fused]
+
+    def _rescore(self, queries, candidates):
+        """Replace approximate base distances with exact L2 distances from the float vector file.
+        
+        One read covers every query's candidates; only those rows are paged in.
+        """
+        ids = np.fromiter({doc_id for row in candidates for doc_id, _ in row}, dtype=np.int64)
+        if not len(ids):
+            return candidates
+        vectors = self._vector_file.read(ids)
+        rows = {int(doc_id): position for position, doc_id in enumerate(ids)}
+        
+        rescored = []
+        for query, row in zip(queries, candidates):
+            if not row:
+                rescored.append([])
+                continue
+            row_vectors = vectors[[rows[doc_id] for doc_id, _ in row]]
+            distances = np.sum((row_vectors - query) ** 2, axis=1)
+            rescored.append([(doc_id, float(distance)) for (doc_id, _), distance in zip(row, distances)])
+        return rescored
+
+    def _fetch_with_scores(self, hits):
+        """Read only the hit rows from the docstore, keeping rank order.
+        
+        Each document carries its row id as metadata["chunk_id"].
+        """
+        docs = self.docstore.get([doc_id for doc_id, _ in hits])
+        return [(self._with_chunk_id(docs[doc_id], doc_id), score) for doc_id, score in hits if doc_id in docs]
+
+    @staticmethod
+    def _with_chunk_id(doc, doc_id):
+        doc.metadata["chunk_id"] = doc_id
+        return doc
+
+    @staticmethod
+    def _fuse(rankings):
+        """Reciprocal-rank fusion of [(weight, [id, ...])] rankings into ids best-first."""
+        scores = {}
+        for weight, ranking in rankings:
+            for rank, doc_id in enumerate(ranking, start=1):
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight / (RRF_K + rank)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+    def search(self, query, k=5, query_vector=None, nprobe=None, ef_search=None, mode=None):
+        """Hybrid search: dense FAISS and BM25 candidates fused with reciprocal-rank fusion.
+        
+        Pass query_vector to reuse an embedding the caller already computed; mode
+        overrides the store's search_mode ("hybrid", "dense" or "sparse").
+        """
+        query_vectors = None if query_vector is None else [query_vector]
+        return self.search_many([query], k, query_vectors, nprobe, ef_search, mode)[0]
 
-    def search(self, query, k=5):
-        """Optimized similarity search with score threshold."""
-        if self.vector_store is None:
+    def search_many(self, queries, k=5, query_vectors=None, nprobe=None, ef_search=None, mode=None):
+        """Batched search: queries are encoded as one matrix and run through one FAISS search.
+        
+        Returns one list of documents per query, in query order.
+        """
+        if not queries:
             return []
+        if self.is_empty():
+            return [[] for _ in queries]
         
         try:
-            # Use similarity_search_with_score for better ranking
-            docs_with_scores = self.vector_store.similarity_search_with_score(query, k=k*2)  # Get more, then filter
+            self._maybe_refresh()
+            mode = mode or self.search_mode
+            fetch_k = k * HYBRID_FETCH_FACTOR
+            
+            dense_hits = [[] for _ in queries]
+            if mode != "sparse":
+                if query_vectors is None:
+                    query_vectors = self.embeddings.embed_queries(list(queries))
+                dense_hits = self._search_vectors(query_vectors, fetch_k, nprobe, ef_search)
             
-            # Log scores for debugging
-            logger.info(f"Search scores: {[(score, doc.page_content[:50]) for doc, score in docs_with_scores[:3]]}")
+            fused = []
+            for query, hits in zip(queries, dense_hits):
+                rankings = []
+                if mode != "sparse":
+                    rankings.append((DENSE_WEIGHT, [doc_id for doc_id, _ in hits]))
+                if mode != "dense":
+                    sparse_hits = self._sparse.search(query, fetch_k)
+                    rankings.append((SPARSE_WEIGHT, [doc_id for doc_id, _ in sparse_hits]))
+                # A couple of spare candidates cover sparse postings whose rows are already gone
+                fused.append(self._fuse(rankings)[:k * 2])
             
-            # Filter by relevance score (lower is better for FAISS)
-            # Use a very lenient threshold for testing - accept almost anything
-            filtered_docs = [doc for doc, score in docs_with_scores if score < 10.0]
+            # One docstore read for every query's candidates
+            docs = self.docstore.get({doc_id for ranked in fused for doc_id, _ in ranked})
+            missing = {doc_id for ranked in fused for doc_id, _ in ranked if doc_id not in docs}
+            if missing:
+                self._sparse.delete(missing)
             
-            # If no docs pass the filter, return the best ones anyway
-            if not filtered_docs and docs_with_scores:
-                logger.info("No docs passed score filter, returning best matches anyway")
-                filtered_docs = [doc for doc, score in docs_with_scores[:k]]
+            results = []
+            for ranked in fused:
+                found = [(doc_id, score) for doc_id, score in ranked if doc_id in docs][:k]
+                results.append([self._with_chunk_id(docs[doc_id], doc_id) for doc_id, _ in found])
             
-            logger.info(f"Returning {len(filtered_docs)} documents after filtering")
-            return filtered_docs[:k]  # Return top k after filtering
+            if len(queries) == 1:
+                logger.info(f"Search ({mode}) returned: {[doc.page_content[:50] for doc in results[0][:3]]}")
+            else:
+                logger.info(f"Batched search ({mode}) over {len(queries)} queries")
+            return results
         except Exception as e:
             logger.error(f"Error in similarity search: {str(e)}")
-            return []
+            return [[] for _ in queries]
 
-    def search_with_scores(self, query, k=5):
+    def search_with_scores(self, query, k=5, query_vector=None, nprobe=None, ef_search=None):
         """Search with similarity scores for debugging/tuning."""
-        if self.vector_store is None:
+        if self.is_empty():
             return []
         
         try:
-            return self.vector_store.similarity_search_with_score(query, k=k)
+            self._maybe_refresh()
+            if query_vector is None:
+                query_vector = self.embeddings.embed_query(query)
+            hits = self._search_vector(query_vector, k, nprobe, ef_search)
+            return self._fetch_with_scores(hits)
         except Exception as e:
             logger.error(f"Error in search with scores: {str(e)}")
             return []
 
     def get_retriever(self, search_kwargs=None):
-        """Get optimized retriever with better search parameters."""
-        if self.vector_store is None:
+        """Get a LangChain retriever over this store."""
+        if self.is_empty():
             return None
         
-        if search_kwargs is None:
-            search_kwargs = {
-                "k": 5,
-                "fetch_k": 10,  # Fetch more candidates for better ranking
-            }
-        
-        return self.vector_store.as_retriever(
-            search_type="similarity",
-            search_kwargs=search_kwargs
-        )
+        search_kwargs = search_kwargs or {}
+        return _StoreRetriever(store=self, k=search_kwargs.get("k", 5))
 
     def is_empty(self):
         """Check if the vector store is empty."""
-        return self.vector_store is None
+        return self.docstore is None or self.docstore.is_empty()
 
     def list_sources(self):
-        """Return list of unique sources from metadata without triggering embedding."""
-        if self.vector_store is None:
-            return []
-        
+        """Return list of unique sources from the docstore without triggering embedding."""
         try:
-            # Access the FAISS index directly to get all document metadata
-            # This avoids triggering the embedding model
-            if hasattr(self.vector_store, 'docstore') and hasattr(self.vector_store.docstore, '_dict'):
-                # Get all documents from the docstore
-                all_docs = list(self.vector_store.docstore._dict.values())
-                sources = {doc.metadata.get("source") for doc in all_docs if doc.metadata.get("source")}
-                return list(sources)
-            else:
-                # Fallback: return empty list to avoid embedding calls
-                logger.warning("Cannot access docstore directly, returning empty sources list")
-                return []
+            return self.docstore.sources()
         except Exception as e:
             logger.error(f"Error listing sources: {str(e)}")
             return []
 
-    def save(self):
-        """Save FAISS index to disk."""
-        if self.vector_store is not None:
+    def _delta_contents(self):
+        """Return (ids, vectors) currently held in the delta index."""
+        if self._delta is None or not self._delta.ntotal:
+            return np.zeros(0, dtype=np.int64), None
+        ids = faiss.vector_to_array(self._delta.id_map).astype(np.int64)
+        return ids, self._delta.index.reconstruct_n(0, self._delta.ntotal)
+
+    def compact(self, rebuild=False):
+        """Fold pending segments into a new base index file and switch to it atomically.
+        
+        The base is updated in place when its type allows it; otherwise (HNSW, an
+        IVF index crossing its training threshold, or rebuild=True) it is rebuilt
+        from the float vector file.
+        """
+        with self._compact_lock:
+            with self._writing():
+                if not self._pending_segments and not rebuild:
+                    return
+                
+                generation = self._generation
+                folded = list(self._pending_segments)
+                folded_seq = self._next_segment - 1
+                tombstones = self._tombstones
+                delta_ids, delta_vectors = self._delta_contents()
+                old_index_file = self._base_file
+                old_type = self._base_type
+                max_id = self.docstore.max_id()
+            
             try:
-                # Ensure directory exists
-                os.makedirs(self.db_path, exist_ok=True)
+                target_type = effective_index_type(self.index_type, self.docstore.count())
+                
+                if old_index_file and not rebuild and target_type == old_type and supports_incremental(old_type):
+                    # Update a private writable copy; readers keep using the mapped one
+                    index = read_index(os.path.join(self.db_path, old_index_file), old_type)
+                    if tombstones:
+                        index.remove_ids(np.fromiter(tombstones, dtype=np.int64))
+                    if len(delta_ids):
+                        add_vectors(index, old_type, delta_vectors, delta_ids)
+                else:
+                    # Rows up to max_id are exactly the live chunks at snapshot time
+                    ids = np.asarray(self.docstore.ids_up_to(max_id), dtype=np.int64)
+                    index = None
+                    if len(ids):
+                        index, target_type = build_index(self.index_type, self._vector_file.read(ids), ids)
+                        logger.info(f"Rebuilt {target_type} base index over {len(ids)} vectors")
                 
-                # Save to the db_path directory - FAISS will create index.faiss and index.pkl
-                self.vector_store.save_local(self.db_path)
-                logger.info(f"Saved FAISS index to {self.db_path}")
+                index_file = None
+                if index is not None:
+                    index_file = self._base_file_name(folded_seq)
+                    # Write beside and rename, so a mapped file with the same name is never overwritten
+                    tmp_file = os.path.join(self.db_path, index_file + ".tmp")
+                    write_index(index, tmp_file)
+                    os.replace(tmp_file, os.path.join(self.db_path, index_file))
             except Exception as e:
                 logger.error(f"Error saving FAISS index: {str(e)}")
+                return
+            
+            with self._writing():
+                if self._generation != generation:
+                    # The store was cleared, or another process compacted, while this base was built
+                    if index_file:
+                        os.remove(os.path.join(self.db_path, index_file))
+                    return
+                
+                self._write_manifest(folded_seq, index_file, target_type)
+                self._base = self._read_base(os.path.join(self.db_path, index_file), target_type) if index_file else None
+                self._base_file = index_file
+                self._base_type = target_type
+                
+                # Anything logged or deleted while the new base was being built stays pending
+                if self._delta is not None and len(delta_ids):
+                    self._delta.remove_ids(delta_ids)
+                self._tombstones = self._tombstones - tombstones
+                self._base_segment = folded_seq
+                self._pending_segments = [seq for seq in self._pending_segments if seq not in folded]
+                
+                for seq in folded:
+                    self._remove_segment(seq)
+                if old_index_file and old_index_file != index_file:
+                    # Processes still mapping the old file keep a valid view until they refresh
+                    os.remove(os.path.join(self.db_path, old_index_file))
+                self._bump_version()
+            
+            logger.info(f"Compacted {len(folded)} segments into {target_type} FAISS index at {self.db_path}")
+        
+        if self._sparse.should_snapshot():
+            try:
+                self._sparse.save()
+            except Exception as e:
+                logger.error(f"Error saving sparse index: {str(e)}")
+
+    def migrate_index(self, index_type):
+        """Switch the base index to another type, rebuilding it from the stored float vectors."""
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+        
+        self.index_type = index_type
+        self.compact(rebuild=True)
+
+    def save(self):
+        """Save FAISS index to disk, folding in any pending segments."""
+        self.compact()
 
     def clear_all(self):
         """Clear all documents and remove index files."""
-        self.vector_store = None
-        
-        # Remove FAISS files from the db_path directory
-        try:
-            faiss_file = os.path.join(self.db_path, "index.faiss")
-            pkl_file = os.path.join(self.db_path, "index.pkl")
+        with self._writing():
+            self._reset_state()
             
-            for file_path in [faiss_file, pkl_file]:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                    logger.info(f"Removed {file_path}")
+            # Remove index files, the manifest and all log segments from the db_path directory
+            try:
+                if self.docstore is not None:
+                    self.docstore.clear()
+                self._vector_file.clear()
+                self._sparse.clear()
+                
+                for name in os.listdir(self.db_path):
+                    if (name.startswith("index_") and name.endswith(".faiss")) or name == MANIFEST_FILE:
+                        os.remove(os.path.join(self.db_path, name))
+                        logger.info(f"Removed {name}")
+                
+                for seq in self._list_segments():
+                    self._remove_segment(seq)
                         
-        except Exception as e:
-            logger.error(f"Error clearing FAISS files: {str(e)}")
+            except Exception as e:
+                logger.error(f"Error clearing FAISS files: {str(e)}")
+            
+            self._bump_version(new_epoch=True)
+        
+        self._notify(None)
 
     def remove_by_source(self, source_path):
-        """Remove documents by source (requires rebuilding index)."""
-        if self.vector_store is None:
+        """Remove documents by source using the docstore's source index (no re-embedding)."""
+        if self.is_empty():
             return 0
         
         try:
-            # Get all documents using a generic search
-            all_docs = self.vector_store.similarity_search("document", k=10000)
-            
-            # Filter out documents from the specified source
-            remaining_docs = [doc for doc in all_docs if doc.metadata.get("source") != source_path]
-            
-            if len(remaining_docs) == len(all_docs):
-                return 0  # No documents removed
-            
-            # Rebuild index with remaining documents
-            if remaining_docs:
-                self.vector_store = FAISS.from_documents(remaining_docs, self.embeddings)
-                self.save()
-            else:
-                self.clear_all()
+            with self._writing():
+                ids = self.docstore.ids_for_source(source_path)
+                if not ids:
+                    return 0  # No documents removed
+                
+                # Chunks another source also contains are kept
+                deleted = self.docstore.release(source_path, ids)
+                
+                if self.docstore.is_empty():
+                    # Last source removed - drop the index files entirely
+                    self.clear_all()
+                elif deleted:
+                    self._apply_delete(deleted)
+                    self._append_segment({"deleted": deleted})
+                    self._bump_version()
             
-            removed_count = len(all_docs) - len(remaining_docs)
-            logger.info(f"Removed {removed_count} documents from source: {source_path}")
-            return removed_count
+            self._notify({source_path})
+            self._maybe_compact()
+            logger.info(f"Removed {len(ids)} documents from source: {source_path}")
+            return len(ids)
             
         except Exception as e:
             logger.error(f"Error removing documents by source: {str(e)}")
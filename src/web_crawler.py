@@ -0,0 +1,271 @@
+"""
+Web Crawler - Same-Site Crawls with Conditional Re-Fetches
+Pooled, per-host-limited fetching that honours robots.txt and skips unchanged pages
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import urljoin, urldefrag, urlparse
+from urllib.robotparser import RobotFileParser
+
+import requests
+from bs4 import BeautifulSoup
+from langchain_core.documents import Document
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_DEPTH = 2  # Link hops followed from the seed pages
+DEFAULT_MAX_PAGES = 500  # Pages fetched per crawl at most
+DEFAULT_MAX_WORKERS = 16  # Concurrent fetches overall
+DEFAULT_PER_HOST = 4  # Concurrent fetches per host
+DEFAULT_HOST_DELAY = 0.0  # Seconds between request starts per host, unless robots.txt asks for more
+DEFAULT_TIMEOUT = (5.0, 30.0)  # (connect, read) seconds
+DEFAULT_USER_AGENT = "RAG-LangChain-App/1.0 (Document Processing Bot)"
+
+GONE_STATUS_CODES = {404, 410}
+SKIPPED_TAGS = ("script", "style", "noscript", "template")
+
+
+class CrawlPage:
+    """Outcome of one URL: changed (document set), unchanged, gone, or skipped"""
+
+    def __init__(self, url: str, status: str, depth: int, document: Optional[Document] = None):
+        self.url = url
+        self.status = status
+        self.depth = depth
+        self.document = document
+
+
+class _HostGate:
+    """Per-host concurrency limit and request spacing"""
+
+    def __init__(self, limit: int, delay: float):
+        self.slots = threading.BoundedSemaphore(limit)
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def __enter__(self):
+        self.slots.acquire()
+        if self.delay:
+            with self._lock:
+                wait = self._next_start - time.monotonic()
+                self._next_start = max(self._next_start, time.monotonic()) + self.delay
+            if wait > 0:
+                time.sleep(wait)
+        return self
+
+    def __exit__(self, *exc):
+        self.slots.release()
+
+
+class WebCrawler:
+    """
+    Breadth-first crawl of the seed URLs' sites
+
+    Validators (ETag / Last-Modified), a hash of each page's text and its
+    outgoing links are kept in state_path, so a re-crawl sends conditional
+    requests and still follows the links of pages that came back 304. Pass
+    known_urls (the sources still in the store) to re-fetch in full any page
+    that was removed from the store since it was last crawled.
+    """
+
+    def __init__(self, seeds: List[str], max_depth: int = DEFAULT_MAX_DEPTH, max_pages: int = DEFAULT_MAX_PAGES,
+                 max_workers: int = DEFAULT_MAX_WORKERS, per_host: int = DEFAULT_PER_HOST,
+                 host_delay: float = DEFAULT_HOST_DELAY, state_path: Optional[str] = None,
+                 timeout=DEFAULT_TIMEOUT, known_urls=None):
+        self.seeds = [urldefrag(seed)[0] for seed in seeds]
+        self.hosts = {urlparse(seed).netloc for seed in self.seeds}
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.host_delay = host_delay
+        self.state_path = state_path
+        self.timeout = timeout
+        self.user_agent = os.environ.get("USER_AGENT", DEFAULT_USER_AGENT)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max(len(self.hosts), 1), pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = self.user_agent
+
+        self._state = self._load_state()
+        if known_urls is not None:
+            self._state = {url: entry for url, entry in self._state.items() if url in known_urls}
+        self._new_state: Dict[str, dict] = {}
+        self._robots: Dict[str, Optional[RobotFileParser]] = {}
+        self._gates: Dict[str, _HostGate] = {}
+        self._lock = threading.Lock()
+
+    def _load_state(self) -> Dict[str, dict]:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("pages", {})
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable crawl state {self.state_path}: {str(e)}")
+            return {}
+
+    def save_state(self, failed_urls=()):
+        """Record this crawl's validators; call once its changed pages are ingested
+
+        Pages in failed_urls (not stored) keep the entry they had before this
+        crawl, so the next crawl doesn't skip them as unchanged.
+        """
+        if not self.state_path:
+            return
+        failed_urls = set(failed_urls)
+        with self._lock:
+            pages = dict(self._state)
+            for url, entry in self._new_state.items():
+                if url in failed_urls:
+                    continue
+                if entry is None:
+                    pages.pop(url, None)
+                else:
+                    pages[url] = entry
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"pages": pages}, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _robots_for(self, url: str) -> Optional[RobotFileParser]:
+        """robots.txt rules for url's host, fetched once per crawl (None = allow all)"""
+        parts = urlparse(url)
+        with self._lock:
+            if parts.netloc in self._robots:
+                return self._robots[parts.netloc]
+
+        robots_url = f"{parts.scheme}://{parts.netloc}/robots.txt"
+        parser = None
+        try:
+            response = self.session.get(robots_url, timeout=self.timeout)
+            if response.status_code in (401, 403):
+                parser = RobotFileParser()
+                parser.disallow_all = True
+            elif response.ok:
+                parser = RobotFileParser()
+                parser.parse(response.text.splitlines())
+        except requests.RequestException as e:
+            logger.warning(f"Could not fetch {robots_url}, crawling without it: {str(e)}")
+
+        with self._lock:
+            self._robots[parts.netloc] = parser
+        return parser
+
+    def _gate_for(self, url: str) -> _HostGate:
+        host = urlparse(url).netloc
+        robots = self._robots_for(url)
+        with self._lock:
+            if host not in self._gates:
+                crawl_delay = robots.crawl_delay(self.user_agent) if robots is not None else None
+                self._gates[host] = _HostGate(self.per_host, max(float(crawl_delay or 0), self.host_delay))
+            return self._gates[host]
+
+    def _allowed(self, url: str) -> bool:
+        robots = self._robots_for(url)
+        return robots is None or robots.can_fetch(self.user_agent, url)
+
+    def _in_scope(self, url: str) -> bool:
+        parts = urlparse(url)
+        return parts.scheme in ("http", "https") and parts.netloc in self.hosts
+
+    def _links(self, soup: BeautifulSoup, base_url: str) -> List[str]:
+        links = []
+        for anchor in soup.find_all("a", href=True):
+            link = urldefrag(urljoin(base_url, anchor["href"]))[0]
+            if self._in_scope(link):
+                links.append(link)
+        return list(dict.fromkeys(links))
+
+    def _fetch(self, url: str, depth: int):
+        """Fetch and parse one page; returns (CrawlPage, outgoing links)"""
+        if not self._allowed(url):
+            logger.info(f"robots.txt disallows {url}")
+            return CrawlPage(url, "skipped", depth), []
+
+        previous = self._state.get(url) or {}
+        headers = {}
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+
+        try:
+            with self._gate_for(url):
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            logger.warning(f"Crawl fetch failed for {url}: {str(e)}")
+            return CrawlPage(url, "skipped", depth), []
+
+        if response.status_code == 304:
+            self._remember(url, previous)
+            return CrawlPage(url, "unchanged", depth), previous.get("links", [])
+        if response.status_code in GONE_STATUS_CODES:
+            self._remember(url, None)
+            return CrawlPage(url, "gone" if previous else "skipped", depth), []
+        if not response.ok or "html" not in response.headers.get("Content-Type", "text/html"):
+            return CrawlPage(url, "skipped", depth), []
+
+        soup = BeautifulSoup(response.text, "html.parser")
+        links = self._links(soup, response.url)
+        title = soup.title.get_text(strip=True) if soup.title else ""
+        for tag in soup(SKIPPED_TAGS):
+            tag.decompose()
+        text = soup.get_text()
+
+        # Servers without validators: a page whose text hasn't changed is still skipped
+        content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        self._remember(url, {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content_hash": content_hash,
+            "links": links,
+        })
+        if previous.get("content_hash") == content_hash:
+            return CrawlPage(url, "unchanged", depth), links
+
+        document = Document(page_content=text, metadata={"source": url, "title": title})
+        return CrawlPage(url, "changed", depth, document), links
+
+    def _remember(self, url: str, entry: Optional[dict]):
+        with self._lock:
+            self._new_state[url] = entry
+
+    def crawl(self) -> Iterator[CrawlPage]:
+        """Yield every visited page as its fetch completes, one depth level at a time"""
+        seen = set(self.seeds)
+        frontier = list(self.seeds)
+        fetched = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="crawler") as executor:
+            for depth in range(self.max_depth + 1):
+                frontier = frontier[:max(self.max_pages - fetched, 0)]
+                if not frontier:
+                    break
+                fetched += len(frontier)
+
+                futures = [executor.submit(self._fetch, url, depth) for url in frontier]
+                next_frontier = []
+                for future in as_completed(futures):
+                    page, links = future.result()
+                    yield page
+                    if depth < self.max_depth:
+                        for link in links:
+                            if link not in seen:
+                                seen.add(link)
+                                next_frontier.append(link)
+                frontier = next_frontier
+
+        logger.info(f"Crawled {fetched} pages from {', '.join(self.seeds)}")
@@ -1,17 +1,34 @@
 from langchain_community.document_loaders import WebBaseLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from web_crawler import WebCrawler, DEFAULT_MAX_DEPTH, DEFAULT_MAX_PAGES
 
 class WebExtractor:
     """Handles extraction of text from web URLs and splitting into chunks."""
     
-    def __init__(self, url):
+    def __init__(self, url, crawl=False, max_depth=DEFAULT_MAX_DEPTH, max_pages=DEFAULT_MAX_PAGES,
+                 state_path=None, known_urls=None):
         """Initialize with the URL to extract content from.
         
         Args:
-            url: Web URL to extract content from
+            url: Web URL to extract content from (a list of seed URLs when crawling)
+            crawl: Follow same-site links from url instead of loading just that page
+            max_depth: Link hops followed when crawling
+            max_pages: Pages fetched per crawl at most
+            state_path: File keeping ETag/Last-Modified per page between crawls
+            known_urls: Pages still in the store; others are re-fetched in full
         """
         self.url = url
-        self.loader = WebBaseLoader(url)
+        self.crawler = None
+        self.loader = None
+        self.changed_urls = []  # Crawl mode: pages yielded by iter_documents
+        self.gone_urls = []  # Crawl mode: previously crawled pages that now return 404/410
+        if crawl:
+            seeds = [url] if isinstance(url, str) else list(url)
+            self.crawler = WebCrawler(
+                seeds, max_depth=max_depth, max_pages=max_pages, state_path=state_path, known_urls=known_urls
+            )
+        else:
+            self.loader = WebBaseLoader(url)
 
     def load_documents(self):
         """Load the web page and convert to LangChain documents.
@@ -19,7 +36,32 @@ class WebExtractor:
         Returns:
             List of Document objects
         """
-        return self.loader.load()
+        return list(self.iter_documents())
+
+    def iter_documents(self):
+        """Yield documents one at a time as the loader produces them.
+        
+        When crawling, only new or changed pages are yielded; unchanged ones
+        are answered with 304 (or match their stored text hash) and skipped.
+        
+        Yields:
+            Document objects as each page is loaded
+        """
+        if self.crawler is None:
+            yield from self.loader.lazy_load()
+            return
+        
+        for page in self.crawler.crawl():
+            if page.status == "changed":
+                self.changed_urls.append(page.url)
+                yield page.document
+            elif page.status == "gone":
+                self.gone_urls.append(page.url)
+
+    def save_crawl_state(self, failed_urls=()):
+        """Persist the crawl's validators once its pages have been ingested, except for failed_urls."""
+        if self.crawler is not None:
+            self.crawler.save_state(failed_urls)
 
     def split_documents(self, docs, chunk_size=1089, chunk_overlap=108):
         """Split documents into chunks for better processing.
@@ -0,0 +1,120 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from answer_cache import SemanticAnswerCache  # noqa: E402
+
+DIM = 16
+
+
+def _unit(seed):
+    vector = np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def _store(cache, seed, chunk_ids=(1, 2), sources=("a.pdf",), answer="Prime the pump."):
+    cache.store(f"question {seed}", _unit(seed), chunk_ids, sources, list(sources), answer)
+
+
+def test_similar_question_with_same_chunks_hits():
+    cache = SemanticAnswerCache(similarity_threshold=0.95)
+    _store(cache, 0)
+
+    nearby = _unit(0) + 0.01 * _unit(1)
+    entry = cache.lookup(nearby / np.linalg.norm(nearby), (1, 2))
+    assert entry is not None and entry.answer == "Prime the pump."
+    assert cache.get_stats()["hits"] == 1
+
+
+def test_miss_on_other_question_or_other_chunks():
+    cache = SemanticAnswerCache(similarity_threshold=0.95)
+    _store(cache, 0)
+
+    assert cache.lookup(_unit(1), (1, 2)) is None
+    assert cache.lookup(_unit(0), (1, 3)) is None  # Retrieval changed, so the answer's context is stale
+    assert cache.get_stats()["misses"] == 2
+
+
+def test_expired_and_evicted_entries_miss():
+    cache = SemanticAnswerCache(max_entries=1, ttl_seconds=0)
+    _store(cache, 0)
+    assert cache.lookup(_unit(0), (1, 2)) is None
+
+    cache = SemanticAnswerCache(max_entries=1)
+    _store(cache, 0)
+    _store(cache, 1)
+    assert cache.lookup(_unit(0), (1, 2)) is None
+    assert cache.lookup(_unit(1), (1, 2)) is not None
+
+
+def test_invalidating_a_source_drops_only_its_answers():
+    cache = SemanticAnswerCache()
+    _store(cache, 0, sources=("a.pdf",))
+    _store(cache, 1, sources=("b.pdf",))
+
+    cache.invalidate_sources({"a.pdf"})
+    assert cache.lookup(_unit(0), (1, 2)) is None
+    assert cache.lookup(_unit(1), (1, 2)) is not None
+
+    cache.invalidate_sources(None)
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_reingest_invalidates_through_store_listener(tmp_path):
+    pytest.importorskip("faiss")
+    documents = pytest.importorskip("langchain_core.documents")
+    vector_store = pytest.importorskip("vector_store")
+
+    store = vector_store.VectorStore(str(tmp_path / "index"))
+    cache = SemanticAnswerCache()
+    store.add_listener(cache.invalidate_sources)
+    _store(cache, 0, sources=("a.pdf",))
+    _store(cache, 1, sources=("b.pdf",))
+
+    chunk = documents.Document(page_content="Prime the pump before use.", metadata={"source": "a.pdf"})
+    vectors = np.stack([np.resize(_unit(2), 384)])
+    store.add_documents([chunk], embeddings=vectors / np.linalg.norm(vectors))
+
+    assert cache.lookup(_unit(0), (1, 2)) is None
+    assert cache.lookup(_unit(1), (1, 2)) is not None
+
+
+class _RecordingLLM:
+    """Stands in for GroqLLM: numbers its answers and keeps the prompts it was sent"""
+
+    def __init__(self):
+        self.prompts = []
+
+    def generate(self, prompt):
+        self.prompts.append(prompt)
+        return f"Answer {len(self.prompts)}"
+
+
+class _ConstantEmbeddings:
+    def embed_queries(self, texts, **kwargs):
+        return np.tile(_unit(0), (len(texts), 1))
+
+
+def test_answers_with_conversation_context_stay_in_their_session(tmp_path, monkeypatch):
+    pytest.importorskip("faiss")
+    documents = pytest.importorskip("langchain_core.documents")
+    rag_engine = pytest.importorskip("rag_engine")
+
+    engine = rag_engine.RagEngine(db_path=str(tmp_path / "index"))
+    chunk = documents.Document(page_content="Prime the pump with water.", metadata={"source": "a.pdf", "chunk_id": 1})
+    monkeypatch.setattr(engine.vector_store, "is_empty", lambda: False)
+    monkeypatch.setattr(engine, "_retrieve", lambda question, k: ([chunk], _unit(0)))
+    engine.context_packer.embeddings = _ConstantEmbeddings()
+    engine.llm = _RecordingLLM()
+
+    question = "Describe the correct pump priming procedure."
+    first = engine.query(question, session_id="alice")
+    assert engine.query(question, session_id="bob") == first  # No conversation yet, so the answer is shared
+
+    engine.query("Which warranty covers the motor?", session_id="alice")
+    alice_answer = engine.query(question, session_id="alice")
+    carol_answer = engine.query(question, session_id="carol")
+
+    assert len(engine.llm.prompts) == 3
+    assert "warranty" in engine.llm.prompts[-1]  # Alice's answer was built from her conversation...
+    assert carol_answer == first != alice_answer  # ...so Carol gets the context-free answer instead
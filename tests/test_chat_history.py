@@ -0,0 +1,39 @@
+from langchain_chat_history import CONTEXT_ANSWER_CHARS, SimpleLangChainHistory
+
+
+def test_ring_buffer_keeps_the_newest_exchanges_with_their_sources():
+    history = SimpleLangChainHistory(max_history=3)
+    for i in range(5):
+        history.add_exchange(f"question {i}", f"answer {i}", sources=[f"doc{i}.pdf"])
+
+    exchanges = history.get_history()
+    assert [exchange["question"] for exchange in exchanges] == ["question 2", "question 3", "question 4"]
+    assert [exchange["sources"] for exchange in exchanges] == [["doc2.pdf"], ["doc3.pdf"], ["doc4.pdf"]]
+    assert history.get_stats()["total_exchanges"] == 3
+    assert history.get_stats()["exchanges_added"] == 5
+    assert history.get_recent_questions(2) == ["question 3", "question 4"]
+
+
+def test_conversation_context_covers_recent_exchanges():
+    history = SimpleLangChainHistory()
+    assert history.get_conversation_context() == ""
+
+    for i in range(4):
+        history.add_exchange(f"question {i}", "x" * (CONTEXT_ANSWER_CHARS + 10) if i == 3 else f"answer {i}")
+
+    context = history.get_conversation_context()
+    assert context.startswith("Previous conversation:") and context.endswith("---")
+    assert "question 0" not in context and "Q: question 1\nA: answer 1" in context
+    assert "x" * CONTEXT_ANSWER_CHARS + "..." in context
+    assert history.get_conversation_context(1).count("Q: ") == 1
+    assert history.get_conversation_context(0).count("Q: ") == 4
+
+
+def test_clear_empties_the_buffer():
+    history = SimpleLangChainHistory()
+    history.add_exchange("question", "answer")
+    history.clear_history()
+
+    assert history.get_history() == []
+    assert history.get_conversation_context() == ""
+    assert not history.is_follow_up_question("what about it?")
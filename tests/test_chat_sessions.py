@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+chat_sessions = pytest.importorskip("chat_sessions")
+ChatSessionStore = chat_sessions.ChatSessionStore
+
+
+def _questions(store, session_id):
+    return [exchange["question"] for exchange in store.get(session_id).get_history()]
+
+
+def test_sessions_keep_separate_histories():
+    store = ChatSessionStore()
+    store.add_exchange("alice", "How do I prime the pump?", "Fill it first.")
+    store.add_exchange("bob", "Which filter fits?", "The xr-200.")
+
+    assert _questions(store, "alice") == ["How do I prime the pump?"]
+    assert _questions(store, "bob") == ["Which filter fits?"]
+
+
+def test_least_recently_used_session_is_evicted():
+    store = ChatSessionStore(max_sessions=2)
+    for session_id in ("a", "b"):
+        store.add_exchange(session_id, f"question from {session_id}", "answer")
+    store.get("a")  # Touch a, so b is now the least recently used
+    store.add_exchange("c", "question from c", "answer")
+
+    assert store.get_stats()["evictions"] == 1
+    assert _questions(store, "a") == ["question from a"]
+    assert _questions(store, "b") == []
+
+
+def test_idle_sessions_expire():
+    store = ChatSessionStore(idle_ttl=0.05)
+    store.add_exchange("a", "question", "answer")
+    time.sleep(0.1)
+
+    assert _questions(store, "a") == []
+    assert store.get_stats()["expirations"] == 1
+
+
+def test_history_is_bounded():
+    store = ChatSessionStore(max_history=3)
+    for i in range(5):
+        store.add_exchange("a", f"question {i}", f"answer {i}")
+
+    assert _questions(store, "a") == ["question 2", "question 3", "question 4"]
+
+
+def test_evicted_session_is_reloaded_from_sqlite(tmp_path):
+    db_path = str(tmp_path / "chat.sqlite")
+    store = ChatSessionStore(max_history=2, max_sessions=1, db_path=db_path)
+    for i in range(3):
+        store.add_exchange("a", f"question {i}", f"answer {i}", sources=[f"doc{i}.pdf"])
+    store.add_exchange("b", "other question", "other answer")  # Evicts a from memory
+
+    history = store.get("a").get_history()
+    assert [exchange["question"] for exchange in history] == ["question 1", "question 2"]
+    assert [exchange["sources"] for exchange in history] == [["doc1.pdf"], ["doc2.pdf"]]
+
+    store.flush()
+    restarted = ChatSessionStore(max_history=2, db_path=db_path)
+    assert _questions(restarted, "a") == ["question 1", "question 2"]
+    assert _questions(restarted, "b") == ["other question"]
+
+
+def test_cleared_session_stays_cleared_after_restart(tmp_path):
+    db_path = str(tmp_path / "chat.sqlite")
+    store = ChatSessionStore(db_path=db_path)
+    store.add_exchange("a", "question", "answer")
+    store.clear("a")
+    store.flush()
+
+    assert _questions(ChatSessionStore(db_path=db_path), "a") == []
@@ -0,0 +1,71 @@
+import re
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document  # noqa: E402
+
+from context_packer import ContextPacker, count_tokens, split_sentences  # noqa: E402
+
+VOCABULARY = ["pump", "prime", "water", "filter", "replace", "months", "warranty", "years", "paint"]
+
+
+class _BagOfWords:
+    """Stands in for the embedding model: normalized counts over a tiny vocabulary"""
+
+    def embed_queries(self, texts, **kwargs):
+        vectors = np.zeros((len(texts), len(VOCABULARY) + 1), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = re.findall(r"[a-z]+", text.lower())
+            for column, term in enumerate(VOCABULARY):
+                vectors[row, column] = sum(word.startswith(term) for word in words)
+            vectors[row, -1] = 0.1  # Keeps every vector non-zero
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+PUMP = "Prime the pump with water before first use. The paint is blue. Prime the pump again after draining."
+FILTER = "Replace the filter every six months. The warranty lasts two years."
+
+
+def _question(text):
+    return _BagOfWords().embed_queries([text])[0]
+
+
+def test_context_fits_the_budget_and_keeps_relevant_sentences():
+    packer = ContextPacker(_BagOfWords(), token_budget=20)
+    packed = packer.pack(_question("How do I prime the pump?"), [Document(page_content=PUMP), Document(page_content=FILTER)])
+
+    assert packed.stats["context_tokens"] <= 20
+    assert count_tokens(packed.text) == packed.stats["context_tokens"]
+    assert "Prime the pump with water" in packed.text
+    assert "paint" not in packed.text and "warranty" not in packed.text
+    assert packed.stats["sentences_kept"] < packed.stats["sentences_total"]
+
+
+def test_near_duplicate_chunks_are_dropped():
+    packer = ContextPacker(_BagOfWords(), token_budget=200)
+    documents = [Document(page_content=PUMP), Document(page_content=PUMP + " "), Document(page_content=FILTER)]
+    packed = packer.pack(_question("How do I prime the pump and replace the filter?"), documents)
+
+    assert packed.stats["duplicate_chunks"] == 1
+    assert packed.text.count("Prime the pump with water") == 1
+    assert "Replace the filter" in packed.text
+
+
+def test_scoring_failure_falls_back_to_retrieval_order():
+    class _Broken:
+        def embed_queries(self, texts, **kwargs):
+            raise RuntimeError("model unavailable")
+
+    packer = ContextPacker(_Broken(), token_budget=1000)
+    packed = packer.pack(np.zeros(4), [Document(page_content=FILTER), Document(page_content=PUMP)])
+
+    assert packed.text.index("Replace the filter") < packed.text.index("Prime the pump")
+    assert packed.stats["used_chunks"] == 2
+
+
+def test_long_runs_are_split_into_sentences():
+    assert split_sentences("One. Two!\n\nThree") == ["One.", "Two!", "Three"]
+    assert all(len(sentence) <= 400 for sentence in split_sentences("word " * 300))
@@ -0,0 +1,50 @@
+import json
+import sqlite3
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from doc_store import SQLiteDocStore, content_hash  # noqa: E402
+
+
+def test_shared_chunk_takes_over_remaining_source_metadata(tmp_path):
+    store = SQLiteDocStore(str(tmp_path / "docstore.sqlite"))
+    text = "The pump must be primed before first use."
+    [chunk_id] = store.add([text], [{"source": "a.pdf", "page": 3}])
+    store.add_refs("b.pdf", {chunk_id: {"source": "b.pdf", "page": 7}})
+
+    assert store.release("a.pdf") == []
+    doc = store.get([chunk_id])[chunk_id]
+    assert doc.metadata == {"source": "b.pdf", "page": 7}
+    assert store.sources() == ["b.pdf"]
+
+    assert store.release("b.pdf") == [chunk_id]
+    assert store.is_empty()
+
+
+def test_releasing_another_source_keeps_owner_metadata(tmp_path):
+    store = SQLiteDocStore(str(tmp_path / "docstore.sqlite"))
+    [chunk_id] = store.add(["shared text"], [{"source": "a.pdf", "page": 1}])
+    store.add_refs("b.pdf", {chunk_id: {"source": "b.pdf", "page": 2}})
+
+    store.release("b.pdf")
+    assert store.get([chunk_id])[chunk_id].metadata == {"source": "a.pdf", "page": 1}
+
+
+def test_refs_from_before_ref_metadata_swap_source_only(tmp_path):
+    path = str(tmp_path / "docstore.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE chunks (id INTEGER PRIMARY KEY AUTOINCREMENT, source TEXT, text TEXT NOT NULL, "
+                 "metadata TEXT NOT NULL, content_hash TEXT)")
+    conn.execute("CREATE TABLE chunk_refs (source TEXT NOT NULL, chunk_id INTEGER NOT NULL, "
+                 "PRIMARY KEY (source, chunk_id))")
+    conn.execute("INSERT INTO chunks VALUES (1, 'a.pdf', 'text', ?, ?)",
+                 (json.dumps({"source": "a.pdf", "title": "T"}), content_hash("text")))
+    conn.executemany("INSERT INTO chunk_refs VALUES (?, 1)", [("a.pdf",), ("b.pdf",)])
+    conn.commit()
+    conn.close()
+
+    store = SQLiteDocStore(path)
+    store.release("a.pdf")
+    assert store.get([1])[1].metadata == {"source": "b.pdf", "title": "T"}
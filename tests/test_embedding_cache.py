@@ -0,0 +1,72 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from embedding_cache import EmbeddingCache  # noqa: E402
+from vector_file import FloatVectorFile  # noqa: E402
+
+DIM = 8
+
+
+def _vector(seed):
+    return np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+
+
+def test_interleaved_writers_keep_keys_and_rows_aligned(tmp_path):
+    # Two instances on one directory stand in for two gunicorn workers
+    first = EmbeddingCache(str(tmp_path), "model")
+    second = EmbeddingCache(str(tmp_path), "model")
+
+    texts = [f"text {i}" for i in range(6)]
+    for i, text in enumerate(texts):
+        writer = first if i % 2 else second
+        writer.put_many([writer.key(text)], _vector(i)[None, :])
+
+    for cache in (first, second, EmbeddingCache(str(tmp_path), "model", lru_size=0)):
+        cache._lru.clear()
+        vectors, _ = cache.get_many(texts)
+        for i, vector in enumerate(vectors):
+            if vector is not None:  # Rows another instance wrote are a miss until its next sync
+                np.testing.assert_array_equal(vector, _vector(i))
+
+    reopened = EmbeddingCache(str(tmp_path), "model", lru_size=0)
+    vectors, _ = reopened.get_many(texts)
+    for i, vector in enumerate(vectors):
+        np.testing.assert_array_equal(vector, _vector(i))
+
+
+def test_partial_trailing_row_is_cut_before_appending(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model")
+    cache.put_many([cache.key("a")], _vector(0)[None, :])
+    with open(cache._vectors_file, "ab") as f:
+        f.write(b"\0" * 5)  # A crash mid-append
+
+    cache.put_many([cache.key("b")], _vector(1)[None, :])
+    reopened = EmbeddingCache(str(tmp_path), "model", lru_size=0)
+    vectors, _ = reopened.get_many(["a", "b"])
+    np.testing.assert_array_equal(vectors[0], _vector(0))
+    np.testing.assert_array_equal(vectors[1], _vector(1))
+
+
+def test_vector_file_picks_up_dim_written_by_another_process(tmp_path):
+    path = str(tmp_path / "vectors.f32")
+    reader = FloatVectorFile(path)
+    assert not reader.exists
+
+    FloatVectorFile(path).write([1, 2], np.stack([_vector(0), _vector(1)]))
+    assert reader.exists
+    np.testing.assert_array_equal(reader.read([2])[0], _vector(1))
+
+
+def test_unpersisted_vectors_stay_in_memory(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model")
+    cache.put_many([cache.key("kept")], _vector(0)[None, :])
+    cache.put_many([cache.key("sentence")], _vector(1)[None, :], persist=False)
+
+    vectors, _ = cache.get_many(["sentence"])
+    np.testing.assert_array_equal(vectors[0], _vector(1))
+
+    reopened = EmbeddingCache(str(tmp_path), "model")
+    kept, sentence = reopened.get_many(["kept", "sentence"])[0]
+    np.testing.assert_array_equal(kept, _vector(0))
+    assert sentence is None
@@ -0,0 +1,71 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("dotenv")
+
+from groq_llm import GroqLLM  # noqa: E402
+
+# A reasoning-model completion whose <think> tags are split across chunk boundaries
+DELTAS = ["\n<th", "ink>Let me reason", " about pumps.</thi", "nk>\n\nPrime the ", "pump <", "b>first</b>",
+          " <", "think>again</think", ">before use", "."]
+FULL_TEXT = "".join(DELTAS)
+
+
+@pytest.fixture
+def stub_api():
+    """Local OpenAI-compatible endpoint streaming DELTAS as server-sent events"""
+    payloads = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            payloads.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for delta in DELTAS:
+                event = {"choices": [{"index": 0, "delta": {"content": delta}}]}
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions", payloads
+    server.shutdown()
+    server.server_close()
+
+
+def test_generate_stream_drops_split_think_tags(stub_api):
+    url, payloads = stub_api
+    llm = GroqLLM(api_key="test", api_url=url, max_retries=0)
+
+    pieces = list(llm.generate_stream("How do I start the pump?"))
+
+    assert "".join(pieces) == "Prime the pump <b>first</b> before use."
+    assert "".join(pieces) == llm._remove_thinking_tags(FULL_TEXT)
+    assert not any("think" in piece for piece in pieces)
+    assert payloads[0]["stream"] is True
+    assert llm.get_metrics()["calls"] == 1
+
+
+def test_agenerate_stream_matches_generate_stream(stub_api):
+    pytest.importorskip("httpx")
+    url, _ = stub_api
+    llm = GroqLLM(api_key="test", api_url=url, max_retries=0)
+
+    async def collect():
+        try:
+            return [piece async for piece in llm.agenerate_stream("How do I start the pump?")]
+        finally:
+            await llm.aclose()
+
+    assert "".join(asyncio.run(collect())) == "".join(llm.generate_stream("How do I start the pump?"))
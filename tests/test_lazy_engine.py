@@ -0,0 +1,126 @@
+import importlib
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import types
+
+import pytest
+
+from lazy_engine import EngineNotReady, LazyRagEngine
+
+
+class _SlowEngine:
+    """Stands in for RagEngine: construction blocks until the test releases it"""
+
+    release = threading.Event()
+    fail = False
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        _SlowEngine.release.wait(10)
+        if _SlowEngine.fail:
+            raise RuntimeError("index is corrupt")
+
+    def warm_up(self):
+        pass
+
+    def answer(self):
+        return "ready"
+
+
+@pytest.fixture
+def slow_engine(monkeypatch):
+    _SlowEngine.release = threading.Event()
+    _SlowEngine.fail = False
+    monkeypatch.setitem(sys.modules, "rag_engine", types.SimpleNamespace(RagEngine=_SlowEngine))
+    yield _SlowEngine
+    _SlowEngine.release.set()
+
+
+def test_requests_wait_for_warm_up(slow_engine):
+    engine = LazyRagEngine(wait_timeout=0.05, db_path="unused")
+    assert engine.status()["state"] == "not_started"
+
+    engine.start()
+    assert engine.status()["state"] == "loading"
+    assert not engine.ready
+    with pytest.raises(EngineNotReady):
+        engine.answer()
+
+    slow_engine.release.set()
+    assert engine.get(timeout=5).kwargs == {"db_path": "unused"}
+    assert engine.answer() == "ready"
+    assert engine.status()["state"] == "ready"
+
+
+def test_failed_load_is_reported(slow_engine):
+    slow_engine.fail = True
+    slow_engine.release.set()
+    engine = LazyRagEngine(wait_timeout=5)
+    engine.start(background=False)
+
+    status = engine.status()
+    assert status["state"] == "failed" and "index is corrupt" in status["error"]
+    with pytest.raises(EngineNotReady, match="failed to load"):
+        engine.get()
+
+
+def test_health_checks_during_warm_up(slow_engine, monkeypatch):
+    pytest.importorskip("flask")
+    monkeypatch.delitem(sys.modules, "app", raising=False)
+    app = importlib.import_module("app")
+    client = app.app.test_client()
+
+    assert client.get("/healthz").status_code == 200
+    response = client.get("/readyz")
+    assert response.status_code == 503 and response.get_json()["state"] == "loading"
+
+    slow_engine.release.set()
+    app.rag_engine.get(timeout=5)
+    response = client.get("/readyz")
+    assert response.status_code == 200 and response.get_json()["ready"] is True
+
+
+SPAWN_DRIVER = """
+import sys
+import types
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+
+class RagEngine:
+    def __init__(self, **kwargs):
+        pass
+
+    def warm_up(self):
+        pass
+
+
+sys.path.insert(0, {src!r})
+sys.modules["rag_engine"] = types.SimpleNamespace(RagEngine=RagEngine)
+import app
+
+
+def engine_state(_):
+    return app.rag_engine.status()["state"]
+
+
+if __name__ == "__main__":
+    app.rag_engine.get(timeout=10)
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        print(engine_state(None), pool.submit(engine_state, None).result())
+"""
+
+
+def test_spawned_workers_do_not_start_the_engine(tmp_path):
+    pytest.importorskip("flask")
+    src = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+    driver = tmp_path / "driver.py"
+    driver.write_text(textwrap.dedent(SPAWN_DRIVER.format(src=src)))
+
+    # The spawned worker re-imports the driver as __mp_main__, and app with it
+    result = subprocess.run([sys.executable, str(driver)], cwd=tmp_path, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ["ready", "not_started"]
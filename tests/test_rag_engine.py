@@ -0,0 +1,46 @@
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document  # noqa: E402
+
+from rag_engine import RagEngine  # noqa: E402
+
+
+class _Pages:
+    """Stands in for WebExtractor in crawl mode: yields the given pages, one chunk per non-empty page"""
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    def iter_documents(self):
+        for url, text in self.pages.items():
+            yield Document(page_content=text, metadata={"source": url})
+
+    def split_documents(self, docs):
+        return [doc for doc in docs if doc.page_content]
+
+
+class _RecordingStore:
+    def __init__(self):
+        self.pruned = {}
+
+    def add_documents(self, documents, raise_errors=False):
+        return len(documents)
+
+    def prune_source(self, source, keep_hashes):
+        self.pruned[source] = keep_hashes
+        return 0
+
+
+def test_changed_page_without_chunks_is_pruned(tmp_path):
+    engine = RagEngine(db_path=str(tmp_path / "index"), enable_chat_history=False)
+    engine.vector_store = _RecordingStore()
+
+    extractor = _Pages({"https://example.com/a": "Page A", "https://example.com/b": ""})
+    assert engine._ingest_stream(extractor, "https://example.com/", sync_sources=[]) == 1
+
+    # The emptied page keeps none of its stored chunks
+    assert engine.vector_store.pruned["https://example.com/b"] == set()
+    assert len(engine.vector_store.pruned["https://example.com/a"]) == 1
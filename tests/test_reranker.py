@@ -0,0 +1,70 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document  # noqa: E402
+
+import reranker  # noqa: E402
+from reranker import CrossEncoderReranker  # noqa: E402
+
+
+class _OverlapModel:
+    """Stands in for the CrossEncoder: scores a pair by the words it shares"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.pairs_scored = 0
+
+    def predict(self, pairs, batch_size=None, show_progress_bar=False):
+        if self.fail:
+            raise RuntimeError("model unavailable")
+        self.pairs_scored += len(pairs)
+        return [len(set(question.lower().split()) & set(text.lower().split())) for question, text in pairs]
+
+
+@pytest.fixture
+def model(monkeypatch):
+    stub = _OverlapModel()
+    monkeypatch.setitem(reranker._model_cache, ("stub", reranker.DEFAULT_MAX_LENGTH), stub)
+    return stub
+
+
+def _documents():
+    return [Document(page_content=text) for text in (
+        "the warranty lasts two years",
+        "replace the filter every six months",
+        "prime the pump before first use",
+    )]
+
+
+def test_best_scored_candidates_come_first(model):
+    scorer = CrossEncoderReranker("stub", latency_budget_ms=float("inf"))
+    ranked = scorer.rerank("prime the pump and its filter", _documents(), 2)
+
+    assert [doc.page_content for doc in ranked] == ["prime the pump before first use",
+                                                   "replace the filter every six months"]
+    assert ranked[0].metadata["rerank_score"] == 3
+
+
+def test_repeated_pairs_come_from_the_cache(model):
+    scorer = CrossEncoderReranker("stub", latency_budget_ms=float("inf"))
+    scorer.rerank("how to prime the pump", _documents(), 2)
+    scorer.rerank_many(["how to prime the pump", "filter"], [_documents(), _documents()[1:]], 1)
+
+    assert model.pairs_scored == 5
+    assert scorer.get_stats()["cache_hit_rate"] == pytest.approx(3 / 8)
+
+
+def test_over_budget_or_failed_scoring_keeps_retrieval_order(model, monkeypatch):
+    scorer = CrossEncoderReranker("stub", latency_budget_ms=1.0)
+    scorer._pair_seconds = 1.0  # Each pair is expected to take a second
+    assert [doc.page_content for doc in scorer.rerank("prime the pump", _documents(), 2)] == \
+        [doc.page_content for doc in _documents()[:2]]
+    assert scorer.get_stats()["skipped"] == 1
+
+    model.fail = True
+    scorer = CrossEncoderReranker("stub", latency_budget_ms=float("inf"))
+    assert [doc.page_content for doc in scorer.rerank("prime the pump", _documents(), 2)] == \
+        [doc.page_content for doc in _documents()[:2]]
+    assert scorer.get_stats()["failures"] == 1
@@ -0,0 +1,48 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("langchain_core")
+
+from retrieval_client import RemoteVectorStore  # noqa: E402
+
+
+class _Responses:
+    """Stands in for RetrievalConnection: replies with the queued (version, epoch) pairs"""
+
+    def __init__(self, *stamps):
+        self.stamps = list(stamps)
+
+    def call(self, op, args=None, vectors=None):
+        version, epoch = self.stamps.pop(0)
+        return {"ok": True, "result": None, "version": version, "epoch": epoch}, None
+
+
+def _store(*stamps):
+    store = RemoteVectorStore("/tmp/unused.sock")
+    store._connection = _Responses(*stamps)
+    notified = []
+    store.add_listener(notified.append)
+    return store, notified
+
+
+def test_changes_by_other_clients_are_noticed():
+    store, notified = _store((3, "a"), (3, "a"), (4, "a"), (6, "a"))
+    store._call("stats")
+    store._call("stats")
+    store._call("remove_by_source")  # Our own change
+    assert notified == []
+
+    store._call("stats")
+    assert notified == [None]
+
+
+def test_service_restart_is_noticed_though_its_version_is_lower():
+    store, notified = _store((40, "a"), (2, "b"), (2, "b"), (3, "b"))
+    store._call("stats")
+    store._call("stats")
+    assert notified == [None]
+
+    store._call("stats")
+    assert notified == [None]
+    store._call("stats")
+    assert notified == [None, None]
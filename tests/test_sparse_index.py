@@ -0,0 +1,66 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from sparse_index import SparseIndex, tokenize  # noqa: E402
+
+TEXTS = {
+    1: "Error code 0x80070005 means access denied",
+    2: "Replace the xr-200 filter every six months",
+    3: "The pump must be primed before first use",
+    4: "Prime the pump again after draining the tank",
+    5: "Store spare valves in a dry cabinet",
+    6: "Check the pressure gauge weekly",
+    7: "Tighten loose fittings by hand",
+    8: "Log every service visit",
+}
+
+
+def _index(path):
+    index = SparseIndex(str(path))
+    index.add(list(TEXTS), list(TEXTS.values()))
+    return index
+
+
+def test_tokenize_keeps_identifiers_whole():
+    assert tokenize("Replace the XR-200 filter (code 0x80070005).") == ["replace", "xr-200", "filter", "code", "0x80070005"]
+
+
+def test_exact_terms_rank_first(tmp_path):
+    index = _index(tmp_path / "sparse")
+    assert index.search("xr-200", k=3)[0][0] == 2
+    assert index.search("0x80070005 error", k=3)[0][0] == 1
+    assert index.search("the of and", k=3) == []
+
+
+def test_deleted_documents_leave_results_and_statistics(tmp_path):
+    index = _index(tmp_path / "sparse")
+    index.delete([3])
+
+    assert [doc_id for doc_id, _ in index.search("pump primed", k=5)] == [4]
+    assert index._doc_count == len(TEXTS) - 1
+    assert index._total_len == sum(len(tokenize(text)) for doc_id, text in TEXTS.items() if doc_id != 3)
+
+
+def test_snapshot_drops_deleted_postings(tmp_path):
+    index = _index(tmp_path / "sparse")
+    index.delete([3])
+    index.save()
+
+    reopened = SparseIndex(str(tmp_path / "sparse"))
+    assert reopened.max_id == len(TEXTS)
+    assert reopened._doc_count == len(TEXTS) - 1
+    assert [doc_id for doc_id, _ in reopened.search("pump primed", k=5)] == [4]
+    reopened.add([9], ["Primed pumps run quietly"])
+    assert {doc_id for doc_id, _ in reopened.search("primed", k=5)} == {9}
+
+
+def test_rrf_rewards_agreement_between_rankings():
+    vector_store = pytest.importorskip("vector_store")
+
+    fused = vector_store.VectorStore._fuse([(1.0, [1, 2, 3]), (1.0, [3, 4, 1])])
+    assert [doc_id for doc_id, _ in fused][:2] == [1, 3]
+    assert [doc_id for doc_id, _ in fused][-1] in (2, 4)
+
+    weighted = vector_store.VectorStore._fuse([(2.0, [5, 6]), (1.0, [6, 5])])
+    assert weighted[0][0] == 5
@@ -0,0 +1,125 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document  # noqa: E402
+
+VectorStore = pytest.importorskip("vector_store").VectorStore
+
+DIM = 384
+
+
+def _documents(count, source="a.pdf"):
+    return [Document(page_content=f"chunk number {i} about pumps and valves", metadata={"source": source})
+            for i in range(count)]
+
+
+def _vectors(count, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_opens_empty_directory(tmp_path):
+    store = VectorStore(str(tmp_path / "index"))
+    assert store.is_empty()
+    assert store.list_sources() == []
+
+
+def test_reopens_existing_directory(tmp_path):
+    path = str(tmp_path / "index")
+    vectors = _vectors(5)
+    VectorStore(path).add_documents(_documents(5), embeddings=vectors)
+
+    reopened = VectorStore(path)
+    assert not reopened.is_empty()
+    assert reopened.list_sources() == ["a.pdf"]
+    hits = reopened.search("chunk number 3", k=1, query_vector=vectors[3].tolist(), mode="dense")
+    assert hits[0].page_content == "chunk number 3 about pumps and valves"
+    # The sparse index is caught up from the docstore on open
+    assert reopened.search("chunk number 3", k=5, mode="sparse")
+
+
+def test_removing_first_source_of_a_shared_chunk_cites_the_other(tmp_path):
+    store = VectorStore(str(tmp_path / "index"))
+    vectors = _vectors(1)
+    shared = "The pump must be primed before first use."
+    assert store.add_documents([Document(page_content=shared, metadata={"source": "a.pdf"})], embeddings=vectors) == 1
+    assert store.add_documents([Document(page_content=shared, metadata={"source": "b.pdf"})], embeddings=vectors) == 0
+
+    store.remove_by_source("a.pdf")
+    hits = store.search(shared, k=1, query_vector=vectors[0].tolist())
+    assert [doc.metadata["source"] for doc in hits] == ["b.pdf"]
+    assert store.list_sources() == ["b.pdf"]
+
+
+def test_failed_add_can_be_told_from_nothing_new(tmp_path):
+    store = VectorStore(str(tmp_path / "index"))
+    store.add_documents(_documents(1), embeddings=_vectors(1))
+    documents = _documents(3, source="b.pdf")[1:]
+    bad_vectors = _vectors(1)  # One vector short
+    assert store.add_documents(documents, embeddings=bad_vectors) == 0
+    with pytest.raises(Exception):
+        store.add_documents(documents, embeddings=bad_vectors, raise_errors=True)
+    assert store.list_sources() == ["a.pdf"]
+
+
+class _FakeModel:
+    """Stands in for the SentenceTransformer: one fixed vector per text"""
+
+    def encode(self, texts, batch_size=None, normalize_embeddings=True):
+        return np.stack([_vectors(1, seed=len(text))[0] for text in texts])
+
+
+def test_backend_fallback_caches_under_torch_namespace(tmp_path, monkeypatch):
+    import vector_store
+    from embedding_cache import EmbeddingCache
+
+    # An earlier onnx run left a vector for this text under the onnx namespace
+    stale = EmbeddingCache(str(tmp_path), "test-model:onnx")
+    stale.put_many([stale.key("pumps")], np.zeros((1, DIM), dtype=np.float32))
+
+    # This time the onnx guard fails and torch is loaded instead
+    monkeypatch.setitem(vector_store._model_cache, ("test-model", "onnx"), (_FakeModel(), "torch"))
+    embeddings = vector_store.CustomEmbeddings("test-model", cache_dir=str(tmp_path), backend="onnx")
+
+    vectors = embeddings.embed_queries(["pumps", "valves"])
+    assert embeddings.cache.namespace == "test-model"
+    np.testing.assert_allclose(vectors, np.stack([_vectors(1, seed=5)[0], _vectors(1, seed=6)[0]]))
+    assert embeddings.cache_stats()["backend"] == "torch"
+
+    torch_cache = EmbeddingCache(str(tmp_path), "test-model")
+    assert all(vector is not None for vector in torch_cache.get_many(["pumps", "valves"])[0])
+
+
+def test_binary_base_without_float_vectors_is_fused_with_delta_by_rank(tmp_path):
+    path = str(tmp_path / "index")
+    store = VectorStore(path, index_type="binary")
+    base_vectors = _vectors(20)
+    store.add_documents(_documents(20), embeddings=base_vectors)
+    store.compact()
+    store.add_documents([Document(page_content=f"delta chunk {i}", metadata={"source": "b.pdf"}) for i in range(4)],
+                        embeddings=_vectors(4, seed=1))
+    os.remove(os.path.join(path, "vectors.f32"))  # Nothing to rescore the base's Hamming distances with
+
+    hits = store.search_with_scores("chunk number 3", k=4, query_vector=base_vectors[3].tolist())
+    assert hits[0][0].page_content == "chunk number 3 about pumps and valves"
+    assert [doc.metadata["source"] for doc, _ in hits] == ["a.pdf", "b.pdf", "a.pdf", "b.pdf"]
+
+
+def test_reopen_drops_compacted_deletes_from_sparse_statistics(tmp_path):
+    path = str(tmp_path / "index")
+    store = VectorStore(path)
+    store.add_documents(_documents(5), embeddings=_vectors(5))
+    store.add_documents([Document(page_content=f"valve manual page {i} " * 20, metadata={"source": "b.pdf"})
+                         for i in range(5)], embeddings=_vectors(5, seed=1))
+    store._sparse.save()
+    store.remove_by_source("b.pdf")
+    store.compact()  # The delete is folded into the base, so reopening won't replay it
+
+    reopened = VectorStore(path)
+    assert reopened._sparse.doc_count == 5
+    assert reopened._sparse._total_len == store._sparse._total_len
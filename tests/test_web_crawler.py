@@ -0,0 +1,119 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("bs4")
+pytest.importorskip("langchain_core")
+
+from web_crawler import WebCrawler  # noqa: E402
+
+ROBOTS = "User-agent: *\nDisallow: /private\n"
+
+
+class _Site:
+    """Pages served by the fixture server: path -> (etag, html)"""
+
+    def __init__(self):
+        self.pages = {
+            "/": ("root-1", '<a href="/a">A</a> <a href="/b">B</a> <a href="/private">P</a>'),
+            "/a": ("a-1", "<title>A</title><p>Page A</p>"),
+            "/b": ("b-1", "<title>B</title><p>Page B, first version</p>"),
+            "/private": ("p-1", "<p>Not for crawlers</p>"),
+        }
+        self.requests = []  # (path, status)
+
+
+@pytest.fixture
+def site():
+    site = _Site()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/robots.txt":
+                self._send(200, ROBOTS, "text/plain")
+                return
+            if self.path not in site.pages:
+                self._send(404, "")
+                return
+            etag, html = site.pages[self.path]
+            if self.headers.get("If-None-Match") == etag:
+                self._send(304, None)
+            else:
+                self._send(200, html, etag=etag)
+
+        def _send(self, status, body, content_type="text/html", etag=None):
+            site.requests.append((self.path, status))
+            self.send_response(status)
+            if etag:
+                self.send_header("ETag", etag)
+            if body is not None:
+                data = body.encode("utf-8")
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            else:
+                self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    site.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield site
+    server.shutdown()
+    server.server_close()
+
+
+def _crawl(site, state_path):
+    crawler = WebCrawler([site.url + "/"], max_depth=1, state_path=state_path)
+    pages = {page.url[len(site.url):]: page for page in crawler.crawl()}
+    return crawler, pages
+
+
+def test_robots_txt_is_honoured(site, tmp_path):
+    _, pages = _crawl(site, str(tmp_path / "crawl_state.json"))
+
+    assert pages["/private"].status == "skipped"
+    assert "/private" not in [path for path, _ in site.requests]
+    assert {pages[path].status for path in ("/", "/a", "/b")} == {"changed"}
+    assert pages["/a"].document.metadata["title"] == "A"
+
+
+def test_recrawl_uses_304_and_refetches_changed_page(site, tmp_path):
+    state_path = str(tmp_path / "crawl_state.json")
+    crawler, _ = _crawl(site, state_path)
+    crawler.save_state()
+
+    site.requests.clear()
+    site.pages["/b"] = ("b-2", "<title>B</title><p>Page B, second version</p>")
+    _, pages = _crawl(site, state_path)
+
+    # The root came back 304, yet its stored links were still followed
+    assert ("/", 304) in site.requests and ("/a", 304) in site.requests
+    assert pages["/"].status == "unchanged"
+    assert pages["/a"].status == "unchanged"
+    assert pages["/b"].status == "changed"
+    assert "second version" in pages["/b"].document.page_content
+
+
+def test_failed_page_is_fetched_again(site, tmp_path):
+    state_path = str(tmp_path / "crawl_state.json")
+    crawler, _ = _crawl(site, state_path)
+    crawler.save_state()
+
+    site.pages["/b"] = ("b-2", "<title>B</title><p>Page B, second version</p>")
+    crawler, pages = _crawl(site, state_path)
+    assert pages["/b"].status == "changed"
+    # The store failed to add the new version, so its new validators aren't kept
+    crawler.save_state(failed_urls=[site.url + "/b"])
+
+    site.requests.clear()
+    _, pages = _crawl(site, state_path)
+    assert pages["/a"].status == "unchanged"
+    assert pages["/b"].status == "changed"
+    assert ("/b", 200) in site.requests